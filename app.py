@@ -1,15 +1,57 @@
 import streamlit as st
-import pdfplumber
 import io
-# Importação dos Mappers específicos
-from services.fatura_mapper import extrair_fatura as extrair_B
-from services.fatura_mapperA import extrair_fatura as extrair_A
-# Importação dos Writers específicos
-from services.excel_writer import preparar_planilha as prep_B, salvar_dados_multiplos as salvar_B
-from services.excel_writterA import preparar_planilha as prep_A, salvar_dados_A as salvar_A
+import os
+import tempfile
+import uuid
+# Leitura, mapeamento e gravação (mesmas etapas usadas pela linha de comando)
+# (openpyxl, pandas e pdfplumber só são importados quando a etapa que os usa roda)
+from services.pipeline import (MAPPERS, mesclar_com_banco, gerar_planilha, salvar_planilha, calcular,
+                               separar_por_grupo, quantidades_de_abas)
+# Grupo de cada fatura lido do próprio PDF (lote com Grupo A e Grupo B)
+from services.classificacao import GRUPO_AUTO, GRUPOS
+# Leitura em segundo plano de cada PDF enviado (sobrevive aos reruns)
+from services.pdf_extractor import pool_do_processo
+from services.processamento_incremental import ProcessamentoIncremental
+# Tempos e memória por etapa (painel de diagnóstico)
+from utils.instrumentacao import Instrumentacao, medir
+# Cache de texto extraído e registros mapeados
+from services.fatura_cache import CacheFaturas
+# Banco local (SQLite) com todas as faturas já processadas
+from services.banco_faturas import BancoFaturas
+# Fila de processamento em segundo plano (SQLite + processos próprios)
+from services.fila_jobs import FilaJobs, ESTADOS_FINAIS, executor_do_processo
 
 st.set_page_config(page_title="Balanço Multi-UC", layout="wide")
 
+@st.cache_resource
+def obter_cache():
+    # Compartilhado entre reruns e sessões do mesmo servidor
+    return CacheFaturas()
+
+cache = obter_cache()
+
+@st.cache_resource
+def obter_banco():
+    return BancoFaturas()
+
+banco = obter_banco()
+
+@st.cache_resource
+def obter_fila():
+    fila = FilaJobs()
+    # Com FILA_EXTERNA=1 os jobs são executados por processar_fila.py
+    if not os.environ.get("FILA_EXTERNA"):
+        # Um executor por processo: "Clear cache" recria a fila, mas não outro executor
+        executor_do_processo(fila, max_jobs=2, limite_por_dono=1)
+    return fila
+
+fila = obter_fila()
+
+# Identifica o usuário na fila; fica na URL para os jobs continuarem acessíveis depois
+if "usuario" not in st.query_params:
+    st.query_params["usuario"] = uuid.uuid4().hex[:8]
+usuario = st.query_params["usuario"]
+
 st.title("⚡ Sistema de Balanço Energético")
 st.subheader("Essencial Energia Eficiente")
 
@@ -18,104 +60,310 @@ with st.sidebar:
     st.header("⚙️ Configuração")
     
     # 1. Input crucial: Define qual lógica de código o sistema seguirá
-    grupo_selecionado = st.radio(
+    opcao_grupo = st.radio(
         "Selecione o Grupo Tarifário:", 
-        ["A", "B"], 
-        help="Grupo A: Alta Tensão (Demanda e Postos Tarifários). Grupo B: Baixa Tensão (Consumo Único)."
+        ["Automático", "A", "B"], 
+        help="Grupo A: Alta Tensão (Demanda e Postos Tarifários). Grupo B: Baixa Tensão (Consumo Único). "
+             "Automático: o grupo de cada fatura é lido do PDF (medidores / classificação) e o lote "
+             "pode misturar UCs dos dois grupos, com uma planilha por grupo."
     )
+    grupo_selecionado = GRUPO_AUTO if opcao_grupo == "Automático" else opcao_grupo
     
     st.markdown("---")
     qtd_geradoras = st.number_input("Qtd. de UC Geradoras", min_value=1, value=1, step=1)
     qtd_beneficiarias = st.number_input("Qtd. de UC Beneficiárias", min_value=0, value=0, step=1)
 
+    with st.expander("🧮 Desempenho"):
+        max_workers = st.number_input("Processos de extração", min_value=1, value=os.cpu_count() or 1, step=1)
+        max_memoria_mb = st.number_input("Memória máxima do pool (MB)", min_value=0, value=0, step=256,
+                                         help="0 = sem limite. O orçamento é dividido entre os processos.")
+        aquecer_pool = st.checkbox("Pré-aquecer processos de extração", value=True,
+                                   help="Sobe os processos ao abrir o app, já com o leitor de PDF carregado, "
+                                        "para a primeira leitura ser tão rápida quanto as seguintes.")
+        leitura_lazy = st.checkbox("Leitura parcial das faturas", value=False,
+                                   help="Lê página a página e para assim que todos os campos necessários forem encontrados.")
+        baixa_memoria = st.checkbox("Modo de pouca memória", value=False,
+                                    help="Guarda os PDFs em arquivos temporários e mantém só os dados mapeados "
+                                         "entre as etapas. A planilha é gravada em disco e só lida para o "
+                                         "download depois de liberada da memória; o download em si ainda "
+                                         "guarda uma cópia do arquivo. Para lotes grandes.")
+        leitura_layout = st.checkbox("Leitura por layout", value=False,
+                                     help="Lê os campos pela posição das palavras na página: cada valor só é "
+                                          "buscado na linha do seu rótulo. Lê o PDF inteiro.")
+        motor_saida = st.radio("Motor de gravação do Excel", ["openpyxl", "xml"], horizontal=True,
+                               help="xml: altera só as abas do modelo que mudam e copia o resto do arquivo intacto (mais rápido).")
+
+    with st.expander("💾 Banco de faturas"):
+        salvar_no_banco = st.checkbox("Salvar faturas no banco local", value=True)
+        completar_com_banco = st.checkbox("Completar com faturas já salvas da UC", value=False,
+                                          help="Usa os meses já processados da mesma UC, então basta enviar a fatura nova.")
+
+# Um só pool no processo: mudar a configuração encerra o anterior
+executor = pool_do_processo(max_workers, max_memoria_mb or None, aquecer_pool)
+if "incremental" not in st.session_state:
+    st.session_state["incremental"] = ProcessamentoIncremental()
+incremental = st.session_state["incremental"]
+incremental.baixa_memoria = baixa_memoria
+incremental.leitura_layout = leitura_layout
+
 # --- 2. UPLOAD DA PLANILHA BASE ---
 st.subheader("1. Planilha Modelo")
 tipo_template = "BALANÇO_A.xlsx" if grupo_selecionado == "A" else "BALANÇO_B.xlsx"
-arquivo_excel = st.file_uploader(f"Envie o arquivo Excel para o Grupo {grupo_selecionado}", type=["xlsx"])
+if grupo_selecionado == GRUPO_AUTO:
+    # Um modelo por grupo; basta o dos grupos que aparecerem nas faturas
+    colunas_modelo = dict(zip(GRUPOS, st.columns(len(GRUPOS))))
+    modelos = {grupo: colunas_modelo[grupo].file_uploader(f"Modelo do Grupo {grupo}", type=["xlsx"],
+                                                          key=f"modelo_{grupo}")
+               for grupo in GRUPOS}
+else:
+    modelos = {grupo_selecionado: st.file_uploader(f"Envie o arquivo Excel para o Grupo {grupo_selecionado}",
+                                                   type=["xlsx"])}
+modelos = {grupo: arquivo for grupo, arquivo in modelos.items() if arquivo}
 
-if arquivo_excel:
+if modelos:
     dados_processamento = []
     
     # --- 3. UPLOAD DAS FATURAS ---
-    st.subheader(f"2. Upload das Faturas (Grupo {grupo_selecionado})")
+    st.subheader("2. Upload das Faturas" + (" (grupo lido de cada fatura)" if grupo_selecionado == GRUPO_AUTO
+                                           else f" (Grupo {grupo_selecionado})"))
     
     abas_titulos = [f"Geradora {i+1}" for i in range(qtd_geradoras)] + \
                    [f"Beneficiária {i+1}" for i in range(qtd_beneficiarias)]
     tabs = st.tabs(abas_titulos)
+
+    def registrar_uploader(tipo, indice, chave, rotulo):
+        pdfs = st.file_uploader(rotulo, type=["pdf"], accept_multiple_files=True, key=chave)
+        # Cada PDF novo já vai para a leitura em segundo plano
+        incremental.sincronizar(chave, pdfs, grupo_selecionado, leitura_lazy, executor, cache)
+        incremental.coletar(cache)
+        if pdfs:
+            lidos, pendentes, com_erro = incremental.situacao(chave)
+            st.caption(f"✅ {lidos} lidas" + (f" | ⏳ {pendentes} em leitura" if pendentes else "")
+                       + (f" | ⚠️ {com_erro} com erro" if com_erro else ""))
+            dados_processamento.append({'tipo': tipo, 'indice': indice, 'slot': chave, 'arquivos': pdfs})
     
     idx_tab = 0
     # Interface dinâmica para Geradoras
     for i in range(qtd_geradoras):
         with tabs[idx_tab]:
-            pdfs = st.file_uploader(f"Faturas - Geradora {i+1}", type=["pdf"], accept_multiple_files=True, key=f"ger_{i}")
-            if pdfs:
-                dados_processamento.append({'tipo': 'geradora', 'indice': i + 1, 'arquivos': pdfs})
+            registrar_uploader('geradora', i + 1, f"ger_{i}", f"Faturas - Geradora {i+1}")
             idx_tab += 1
 
     # Interface dinâmica para Beneficiárias
     for i in range(qtd_beneficiarias):
         with tabs[idx_tab]:
-            pdfs = st.file_uploader(f"Faturas - Beneficiária {i+1}", type=["pdf"], accept_multiple_files=True, key=f"ben_{i}")
-            if pdfs:
-                dados_processamento.append({'tipo': 'beneficiaria', 'indice': i + 1, 'arquivos': pdfs})
+            registrar_uploader('beneficiaria', i + 1, f"ben_{i}", f"Faturas - Beneficiária {i+1}")
             idx_tab += 1
 
+    # Arquivos removidos (ou de abas que deixaram de existir) liberam seus resultados
+    incremental.descartar_nao_usados({item['slot'] for item in dados_processamento})
+
     # --- 4. PROCESSAMENTO ---
     st.markdown("---")
-    if st.button(f"🚀 Processar Balanço Grupo {grupo_selecionado}"):
+    col_processar, col_fila = st.columns(2)
+    descricao_job = col_fila.text_input("Nome do cliente (fila)", value="cliente")
+    if col_fila.button("📨 Enviar para a fila", help="Processa em segundo plano; a planilha fica disponível "
+                                                   "na fila abaixo, mesmo depois de fechar a página."):
+        if not dados_processamento:
+            st.warning("Envie PDFs para pelo menos uma UC.")
+        else:
+            itens_job = [{'tipo': item['tipo'], 'indice': item['indice'],
+                          'arquivos': [(arquivo.name, arquivo.getvalue()) for arquivo in item['arquivos']]}
+                         for item in dados_processamento]
+            opcoes_job = {
+                "grupo": grupo_selecionado, "motor": motor_saida, "leitura_lazy": leitura_lazy,
+                "leitura_layout": leitura_layout, "cache": cache.pasta or "",
+                "banco": banco.caminho if salvar_no_banco or completar_com_banco else "",
+                "completar_com_banco": completar_com_banco,
+            }
+            # No automático vai um modelo por grupo; o job gera uma planilha para cada grupo encontrado
+            modelo_job = ({grupo: arquivo.getvalue() for grupo, arquivo in modelos.items()}
+                          if grupo_selecionado == GRUPO_AUTO else modelos[grupo_selecionado].getvalue())
+            job_id = fila.submeter(usuario, modelo_job, itens_job, opcoes_job, descricao=descricao_job)
+            st.success(f"Job #{job_id} enviado para a fila.")
+
+    rotulo_grupo = "" if grupo_selecionado == GRUPO_AUTO else f" Grupo {grupo_selecionado}"
+    if col_processar.button(f"🚀 Processar Balanço{rotulo_grupo}"):
         if not dados_processamento:
             st.warning("Envie PDFs para pelo menos uma UC.")
         else:
             progresso = st.progress(0)
             status = st.empty()
-            lista_dados_finais = []
+            instr = Instrumentacao()
             
-            # ESCOLHA DO MAPPER (LÓGICA DE LEITURA)
-            mapper_func = extrair_A if grupo_selecionado == "A" else extrair_B
-            
-            # Fase 1: Extração
-            for idx, item in enumerate(dados_processamento):
-                status.text(f"Lendo faturas da {item['tipo']} {item['indice']}...")
-                faturas_extraidas = []
-                
-                for pdf_file in item['arquivos']:
-                    with pdfplumber.open(pdf_file) as pdf:
-                        texto = "".join([p.extract_text() or "" for p in pdf.pages])
+            # Fase 1: só espera as leituras que ainda estão em andamento
+            def ao_concluir(concluidos, total):
+                progresso.progress(concluidos / (total + 1))
+                status.text(f"Lendo faturas... {concluidos}/{total}")
+
+            status.text("Lendo faturas...")
+            with medir(instr, "aguardar_leitura"):
+                incremental.aguardar(cache=cache, ao_concluir=ao_concluir)
+            for chave, medicoes in incremental.medicoes.items():
+                instr.incorporar(medicoes, pdf=incremental.nomes.get(chave))
+
+            for chave, erro in incremental.erros.items():
+                st.warning(f"Não foi possível ler {incremental.nomes.get(chave)}: {erro}")
+
+            # Cada registro vai para o grupo dele: o escolhido ou, no automático, o classificado
+            lidos = [{'tipo': item['tipo'], 'indice': item['indice'], 'dados': incremental.registros(item['slot'])}
+                     for item in dados_processamento]
+            grupos_lidos = [incremental.grupos_de(item['slot']) for item in dados_processamento]
+
+            if salvar_no_banco:
+                with medir(instr, "banco"):
+                    for item, grupos in zip(dados_processamento, grupos_lidos):
+                        registros, hashes = incremental.registros(item['slot']), incremental.hashes_de(item['slot'])
+                        for grupo in sorted(set(grupos)):
+                            do_grupo = [k for k, g in enumerate(grupos) if g == grupo]
+                            banco.salvar_varias([registros[k] for k in do_grupo], grupo,
+                                                [hashes[k] for k in do_grupo], MAPPERS[grupo][1])
+
+            if grupo_selecionado == GRUPO_AUTO:
+                por_grupo = separar_por_grupo(lidos, grupos_lidos)
+                quantidades = {grupo: quantidades_de_abas(itens) for grupo, itens in por_grupo.items()}
+            else:
+                por_grupo = {grupo_selecionado: lidos}
+                quantidades = {grupo_selecionado: (qtd_geradoras, qtd_beneficiarias)}
+
+            if completar_com_banco:
+                for grupo, itens in por_grupo.items():
+                    for item in itens:
+                        item['dados'] = mesclar_com_banco(item['dados'], banco, grupo)
+
+            stats = cache.estatisticas()
+            st.caption(f"🗃️ Cache acumulado: {stats['acertos_memoria']} acertos em memória, "
+                       f"{stats['acertos_disco']} em disco, {stats['faltas']} faltas")
+
+            sem_modelo = [grupo for grupo in por_grupo if grupo not in modelos]
+            if sem_modelo:
+                st.warning("Faltou a planilha modelo do Grupo " + " e do Grupo ".join(sem_modelo) + ": "
+                           + ", ".join(f"{len(por_grupo[g])} UC(s) do Grupo {g}" for g in sem_modelo)
+                           + " ficaram de fora.")
+            balancos = {}
+            dados_por_grupo = {}
+            for grupo, lista_dados_finais in por_grupo.items():
+                if grupo not in modelos:
+                    continue
+                # Balanço calculado em memória (pandas); o writer do Grupo A reaproveita os totais
+                balanco = calcular(lista_dados_finais, grupo, instrumentacao=instr)
+                balancos[grupo] = balanco
+                dados_por_grupo[grupo] = lista_dados_finais
+
+                # Fase 2: Escrita no Excel (LÓGICA DE GRAVAÇÃO)
+                status.text(f"Gravando dados no Excel (Grupo {grupo})...")
+                try:
+                    # Grupo A: writer de Alta Tensão (Colunas B, C, D, L, M, N)
+                    # Grupo B: writer original de Baixa Tensão (Consumo Único)
+                    wb_final = gerar_planilha(modelos[grupo], grupo, lista_dados_finais,
+                                              *quantidades[grupo], motor=motor_saida,
+                                              instrumentacao=instr, balanco=balanco)
                     
-                    # Chama o mapper correto baseado na seleção do radio button
-                    faturas_extraidas.append(mapper_func(texto))
-                
-                lista_dados_finais.append({
-                    'tipo': item['tipo'],
-                    'indice': item['indice'],
-                    'dados': faturas_extraidas
-                })
-                progresso.progress((idx + 1) / (len(dados_processamento) + 1))
-
-            # Fase 2: Escrita no Excel (LÓGICA DE GRAVAÇÃO)
-            status.text("Gravando dados no Excel...")
-            try:
-                if grupo_selecionado == "A":
-                    # Usa o Writer exclusivo para Alta Tensão (Colunas B, C, D, L, M, N)
-                    wb = prep_A(arquivo_excel, qtd_geradoras, qtd_beneficiarias)
-                    wb_final = salvar_A(wb, lista_dados_finais)
-                else:
-                    # Usa o Writer original para Baixa Tensão (Consumo Único)
-                    wb = prep_B(arquivo_excel, qtd_geradoras, qtd_beneficiarias)
-                    wb_final = salvar_B(wb, lista_dados_finais)
-                
-                # Download em memória
-                output = io.BytesIO()
-                wb_final.save(output)
-                
-                progresso.progress(1.0)
-                status.success(f"Planilha Grupo {grupo_selecionado} concluída!")
-                
-                st.download_button(
-                    label="📥 Baixar Resultado Final",
-                    data=output.getvalue(),
-                    file_name=f"BALANCO_CONSOLIDADO_GRUPO_{grupo_selecionado}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
-            except Exception as e:
-                st.error(f"Erro no processamento do Excel: {e}")
\ No newline at end of file
+                    if baixa_memoria:
+                        # O save grava direto num arquivo temporário, sem o buffer do xlsx em memória ao
+                        # lado do workbook; o arquivo só é lido depois de o workbook ser liberado e é
+                        # apagado em seguida (o botão de download guarda essa cópia, como no modo normal)
+                        with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False) as temporario:
+                            caminho_saida = temporario.name
+                        try:
+                            salvar_planilha(wb_final, caminho_saida, instrumentacao=instr)
+                            del wb_final
+                            with open(caminho_saida, "rb") as arquivo_saida:
+                                dados_download = arquivo_saida.read()
+                        finally:
+                            os.remove(caminho_saida)
+                    else:
+                        # Download em memória
+                        dados_download = salvar_planilha(wb_final, io.BytesIO(), instrumentacao=instr).getvalue()
+                        del wb_final
+
+                    status.success(f"Planilha Grupo {grupo} concluída!")
+
+                    st.download_button(
+                        label=f"📥 Baixar Resultado Final (Grupo {grupo})",
+                        data=dados_download,
+                        file_name=f"BALANCO_CONSOLIDADO_GRUPO_{grupo}.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        key=f"baixar_grupo_{grupo}"
+                    )
+                    del dados_download
+                except Exception as e:
+                    st.error(f"Erro no processamento do Excel (Grupo {grupo}): {e}")
+            progresso.progress(1.0)
+            st.session_state["balancos"] = balancos
+            # Registros da última execução, por grupo, para as outras páginas (ex.: rateio)
+            st.session_state["dados_estruturados"] = dados_por_grupo
+            # Guardado na sessão para o painel continuar visível depois do download
+            st.session_state["diagnostico"] = instr
+
+    # --- 5. BALANÇO CALCULADO ---
+    for grupo, balanco in st.session_state.get("balancos", {}).items():
+        if balanco is None or balanco.empty:
+            continue
+        from services.balanco import totais_anuais, totais_postos
+        with st.expander(f"📊 Balanço calculado (Grupo {grupo})"):
+            st.markdown("**Totais por UC e ano**")
+            st.dataframe(totais_anuais(balanco), use_container_width=True)
+            if balanco.attrs.get("grupo") == "A":
+                st.markdown("**Postos tarifários (todas as UCs)**")
+                st.dataframe(totais_postos(balanco), use_container_width=True)
+            st.markdown("**Mês a mês**")
+            st.dataframe(balanco.drop(columns=["item", "posicao"]), use_container_width=True)
+            st.download_button("Baixar CSV", balanco.drop(columns=["item", "posicao"]).to_csv(index=False),
+                               file_name=f"balanco_grupo_{grupo}.csv", mime="text/csv", key=f"csv_grupo_{grupo}")
+
+    # --- 6. DIAGNÓSTICO DA ÚLTIMA EXECUÇÃO ---
+    diagnostico = st.session_state.get("diagnostico")
+    if diagnostico and diagnostico.registros:
+        with st.expander("⏱️ Diagnóstico da última execução"):
+            st.markdown("**Por etapa**")
+            st.dataframe(diagnostico.resumo_por_etapa(), use_container_width=True)
+            st.markdown("**Por PDF / chamada**")
+            st.dataframe(diagnostico.registros, use_container_width=True)
+            col_json, col_csv = st.columns(2)
+            col_json.download_button("Baixar JSON", diagnostico.como_json(),
+                                     file_name="diagnostico.json", mime="application/json")
+            col_csv.download_button("Baixar CSV", diagnostico.como_csv(),
+                                    file_name="diagnostico.csv", mime="text/csv")
+# --- 7. FILA DE PROCESSAMENTO ---
+def painel_fila():
+    jobs = fila.jobs_do_dono(usuario)
+    if not jobs:
+        return
+    st.subheader("📨 Fila de processamento")
+    st.caption(f"Usuário: {usuario} (guarde a URL desta página para voltar aos seus jobs)")
+    for job in jobs:
+        with st.container(border=True):
+            col_info, col_acao = st.columns([4, 1])
+            col_info.markdown(f"**#{job['id']} {job['descricao'] or ''}** | {job['opcoes']['grupo']} | "
+                              f"{job['estado']} | enviado em {job['criado_em']}")
+            if job['estado'] == "pendente":
+                col_info.caption(f"{fila.posicao_na_fila(job['id'])} jobs na frente")
+                if col_acao.button("Cancelar", key=f"cancelar_{job['id']}"):
+                    fila.cancelar(job['id'], usuario)
+                    st.rerun()
+            elif job['estado'] == "executando":
+                col_info.progress(job['progresso'], text=job['mensagem'] or "")
+            else:
+                if job['mensagem']:
+                    col_info.caption(job['mensagem'])
+                resultado = job['resultado'] or {}
+                # Grupo automático: uma planilha por grupo encontrado
+                arquivos = resultado.get("arquivos") or [resultado.get("arquivo")]
+                for arquivo in arquivos:
+                    if job['estado'] == "concluido" and arquivo and os.path.exists(arquivo):
+                        with open(arquivo, "rb") as f:
+                            rotulo = "📥 Baixar" + (f" ({os.path.basename(arquivo)})" if len(arquivos) > 1 else "")
+                            col_acao.download_button(rotulo, f, file_name=os.path.basename(arquivo),
+                                                     key=f"baixar_{job['id']}_{os.path.basename(arquivo)}",
+                                                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+                if col_acao.button("Remover", key=f"remover_{job['id']}"):
+                    fila.remover(job['id'], usuario)
+                    st.rerun()
+    if any(job['estado'] not in ESTADOS_FINAIS for job in jobs) and not hasattr(st, "fragment"):
+        st.button("🔄 Atualizar fila")
+
+# Versões com st.fragment atualizam só o painel, a cada 3 s
+if hasattr(st, "fragment"):
+    painel_fila = st.fragment(run_every=3)(painel_fila)
+painel_fila()
@@ -0,0 +1,356 @@
+"""
+Benchmarks do balanço com faturas sintéticas (ver gerador_faturas.py).
+
+Uso (na raiz do projeto):
+    python -m benchmarks.executar                   # todas as medições
+    python -m benchmarks.executar --rapido          # sem os casos de 100 UCs
+    python -m benchmarks.executar --comparar benchmarks/resultados/<anterior>.json
+
+Cada execução grava benchmarks/resultados/<data>_<commit>.json; com --comparar,
+mostra a razão novo/anterior de cada medição para achar regressões entre commits.
+A pasta resultados/ fica fora do git: os tempos só valem na máquina que os mediu, então a
+referência é uma execução do commit base feita na mesma máquina, antes da mudança.
+"""
+import argparse
+import copy
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import openpyxl
+
+from benchmarks.gerador_faturas import MODELO, textos_carteira, pdf_de_texto, modelo_grupo_a
+from services.pipeline import MAPPERS, MAPPERS_LAYOUT, obter_writers, obter_planejador, mapear_pdfs, gerar_planilha
+from services.plano_escrita import PlanoEscrita, diferencas
+from services.classificacao import classificar_texto
+from services.pdf_extractor import extrair_textos
+from services.indice_espacial import IndiceEspacial
+from services.rateio import ProblemaRateio, montar_problema, otimizar
+from services.atualizacao import atualizar_planilha
+from services.banco_faturas import BancoFaturas
+
+PASTA_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados")
+
+
+def medir(funcao, repeticoes=5, aquecimento=1):
+    """Tempo de parede de cada repetição (s), descartando as de aquecimento."""
+    for _ in range(aquecimento):
+        funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return _estatisticas(tempos)
+
+
+def _estatisticas(tempos):
+    return {
+        "mediana_s": round(statistics.median(tempos), 6),
+        "min_s": round(min(tempos), 6),
+        "max_s": round(max(tempos), 6),
+        "repeticoes": len(tempos),
+    }
+
+
+def _abrir_modelo(modelo):
+    """O modelo do Grupo A é gerado em memória (bytes); o do B é o arquivo do repositório."""
+    return io.BytesIO(modelo) if isinstance(modelo, bytes) else modelo
+
+
+def _estrutura(registros_por_uc):
+    """1 geradora + as demais como beneficiárias, no formato entregue aos writers."""
+    return [{'tipo': 'geradora' if i == 0 else 'beneficiaria', 'indice': 1 if i == 0 else i,
+             'dados': registros} for i, registros in enumerate(registros_por_uc)]
+
+
+def _salvar_em_memoria(wb):
+    saida = io.BytesIO()
+    wb.save(saida)
+    return saida
+
+
+def _preparar_copy_worksheet(modelo, qtd_beneficiarias):
+    """Referência: o preparo anterior, com um wb.copy_worksheet por beneficiária extra."""
+    wb = openpyxl.load_workbook(_abrir_modelo(modelo))
+    ws_modelo = wb[next(s for s in wb.sheetnames if "UC BENEF" in s.upper())]
+    for i in range(1, qtd_beneficiarias):
+        wb.copy_worksheet(ws_modelo).title = f"UC BENEF. {i + 1}"
+    return wb
+
+
+def bench_mappers(resultados, repeticoes):
+    for grupo in ("B", "A"):
+        textos = [t for uc in textos_carteira(grupo, 10, semente=1) for t in uc]  # 120 faturas
+        mapper = MAPPERS[grupo][0]
+        r = medir(lambda: [mapper(t) for t in textos], repeticoes)
+        r["faturas"] = len(textos)
+        resultados[f"extrair_fatura_{grupo}"] = r
+
+        # Leitura por layout a partir do texto: inclui montar o índice de cada fatura
+        mapper_layout = MAPPERS_LAYOUT[grupo]
+        r = medir(lambda: [mapper_layout(IndiceEspacial.de_texto(t)) for t in textos], repeticoes)
+        r["faturas"] = len(textos)
+        resultados[f"extrair_fatura_layout_{grupo}"] = r
+
+        # Grupo automático: custo da classificação somado ao mapper
+        r = medir(lambda: [classificar_texto(t) for t in textos], repeticoes)
+        r["faturas"] = len(textos)
+        resultados[f"classificar_texto_{grupo}"] = r
+
+
+def bench_planilhas(resultados, repeticoes, tamanhos):
+    modelos = {"B": MODELO, "A": modelo_grupo_a()}
+    for grupo in ("B", "A"):
+        preparar, salvar = obter_writers(grupo)
+        mapper = MAPPERS[grupo][0]
+        modelo = modelos[grupo]
+        # No motor xml a cópia das abas só acontece no save (ver ponta_a_ponta)
+        for qtd_ucs in tamanhos:
+            for motor in ("openpyxl", "xml"):
+                nome = f"preparar_planilha_{grupo}_{qtd_ucs}uc_{motor}"
+                resultados[nome] = medir(lambda: preparar(_abrir_modelo(modelo), 1, qtd_ucs - 1, motor=motor),
+                                         max(1, repeticoes // (1 + qtd_ucs // 20)))
+                resultados[nome]["bytes"] = len(_salvar_em_memoria(
+                    preparar(_abrir_modelo(modelo), 1, qtd_ucs - 1, motor=motor)).getvalue())
+            # Antes da cópia em lote (services/clonagem_abas.py), para comparar na mesma execução
+            nome = f"preparar_planilha_{grupo}_{qtd_ucs}uc_copy_worksheet"
+            resultados[nome] = medir(lambda: _preparar_copy_worksheet(modelo, qtd_ucs - 1),
+                                     max(1, repeticoes // (1 + qtd_ucs // 20)))
+            resultados[nome]["bytes"] = len(_salvar_em_memoria(_preparar_copy_worksheet(modelo, qtd_ucs - 1)).getvalue())
+
+        # Escrita isolada: 10 UCs x 12 meses, sem contar o preparo do modelo
+        registros = [[mapper(t) for t in uc] for uc in textos_carteira(grupo, 10, semente=2)]
+        estrutura = _estrutura(registros)
+        for motor in ("openpyxl", "xml"):
+            tempos = []
+            for _ in range(repeticoes):
+                wb = preparar(_abrir_modelo(modelo), 1, 9, motor=motor)
+                dados = copy.deepcopy(estrutura)
+                inicio = time.perf_counter()
+                salvar(wb, dados)
+                tempos.append(time.perf_counter() - inicio)
+            nome = "salvar_dados_multiplos" if grupo == "B" else "salvar_dados_A"
+            resultados[f"{nome}_10uc_{motor}"] = _estatisticas(tempos)
+
+        # Simulação: plano de escrita comparado com o de uma execução anterior, sem abrir planilha
+        _, planejar = obter_planejador(grupo)
+        plano = planejar(preparar(_abrir_modelo(modelo), 1, 9, motor="xml"), copy.deepcopy(estrutura))
+        anterior = PlanoEscrita.de_dict(json.loads(json.dumps(plano.para_dict())))
+        resultados[f"plano_diferencas_{grupo}_10uc"] = medir(lambda: diferencas(plano, anterior), repeticoes)
+
+
+def bench_atualizacao(resultados, repeticoes, tamanhos):
+    """Mês novo numa planilha com 11 meses: atualização x geração completa a partir do modelo."""
+    modelos = {"B": MODELO, "A": modelo_grupo_a()}
+    for grupo in ("B", "A"):
+        mapper = MAPPERS[grupo][0]
+        for qtd_ucs in tamanhos:
+            registros = [[mapper(t) for t in uc] for uc in textos_carteira(grupo, qtd_ucs, semente=4)]
+            novas = [uc[-1] for uc in registros]
+            reps = max(1, repeticoes // (1 + qtd_ucs // 20))
+            for motor in ("openpyxl", "xml"):
+                anterior = _salvar_em_memoria(gerar_planilha(
+                    _abrir_modelo(modelos[grupo]), grupo, _estrutura([uc[:-1] for uc in registros]),
+                    1, qtd_ucs - 1, motor=motor)).getvalue()
+                resultados[f"gerar_completo_{grupo}_{qtd_ucs}uc_{motor}"] = medir(
+                    lambda: _salvar_em_memoria(gerar_planilha(_abrir_modelo(modelos[grupo]), grupo,
+                                                              _estrutura(registros), 1, qtd_ucs - 1, motor=motor)),
+                    reps)
+                resultados[f"atualizar_planilha_{grupo}_{qtd_ucs}uc_{motor}"] = medir(
+                    lambda: _salvar_em_memoria(atualizar_planilha(anterior, grupo, novas, motor=motor)[0]), reps)
+                # Só 1 em cada 10 UCs com fatura nova: as outras abas nem são lidas (motor xml)
+                poucas = novas[::10]
+                resultados[f"atualizar_planilha_{grupo}_{qtd_ucs}uc_{len(poucas)}novas_{motor}"] = medir(
+                    lambda: _salvar_em_memoria(atualizar_planilha(anterior, grupo, poucas, motor=motor)[0]), reps)
+
+
+def bench_ponta_a_ponta(resultados, repeticoes):
+    """PDFs -> texto -> registros -> planilha salva, sem cache, 3 UCs x 12 meses."""
+    modelos = {"B": MODELO, "A": modelo_grupo_a()}
+    for grupo in ("B", "A"):
+        textos = textos_carteira(grupo, 3, semente=3)
+        pdfs = [pdf_de_texto(t) for uc in textos for t in uc]
+        modelo = modelos[grupo]
+
+        resultados[f"extrair_textos_{grupo}_{len(pdfs)}pdfs"] = medir(
+            lambda: extrair_textos(pdfs, max_workers=1), max(1, repeticoes // 2))
+
+        def executar(motor):
+            registros, _, _, _ = mapear_pdfs(pdfs, grupo, max_workers=1)
+            por_uc = [registros[i:i + 12] for i in range(0, len(registros), 12)]
+            wb = gerar_planilha(_abrir_modelo(modelo), grupo, _estrutura(por_uc), 1, len(por_uc) - 1, motor=motor)
+            _salvar_em_memoria(wb)
+
+        for motor in ("openpyxl", "xml"):
+            r = medir(lambda: executar(motor), max(1, repeticoes // 2))
+            r["pdfs"] = len(pdfs)
+            resultados[f"ponta_a_ponta_{grupo}_{motor}"] = r
+
+
+# Cada medição roda num interpretador novo: no processo do benchmark tudo já está importado
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CODIGO_IMPORTACAO = """
+import sys, time
+inicio = time.perf_counter()
+for nome in sys.argv[1].split(","):
+    __import__(nome)
+print(time.perf_counter() - inicio)
+"""
+CODIGO_PRIMEIRA_LEITURA = """
+import os, sys, time
+from services.pdf_extractor import criar_pool, extrair_texto_pdf
+with open(sys.argv[1], "rb") as f:
+    pdf = f.read()
+with criar_pool(1, aquecer=sys.argv[2] == "1") as pool:
+    pool.submit(os.getpid).result()  # processo no ar (e aquecido, se for o caso)
+    inicio = time.perf_counter()
+    pool.submit(extrair_texto_pdf, pdf).result()
+    print(time.perf_counter() - inicio)
+"""
+# Módulos que o app importa ao abrir, e as pilhas pesadas de cada etapa
+IMPORTACOES = {
+    "app": "streamlit,services.pipeline,services.pdf_extractor,services.processamento_incremental,"
+           "utils.instrumentacao,services.fatura_cache,services.banco_faturas,services.fila_jobs",
+    "app_sem_streamlit": "services.pipeline,services.pdf_extractor,services.processamento_incremental,"
+                         "utils.instrumentacao,services.fatura_cache,services.banco_faturas,services.fila_jobs",
+    "leitura_pdfplumber": "pdfplumber",
+    "writer_B": "services.excel_writer",
+    "writer_A": "services.excel_writterA",
+    "balanco_pandas": "services.balanco",
+}
+
+
+def _interpretador_novo(codigo, *argumentos):
+    saida = subprocess.run([sys.executable, "-c", codigo, *argumentos], cwd=RAIZ, capture_output=True,
+                           text=True, check=True, env={**os.environ, "PYTHONPATH": RAIZ})
+    return float(saida.stdout.strip().splitlines()[-1])
+
+
+def bench_inicializacao(resultados, repeticoes):
+    """Tempo de importação (interpretador novo) e da primeira leitura num pool frio x pré-aquecido."""
+    for nome, modulos in IMPORTACOES.items():
+        resultados[f"importar_{nome}"] = _estatisticas(
+            [_interpretador_novo(CODIGO_IMPORTACAO, modulos) for _ in range(repeticoes)])
+
+    texto = textos_carteira("B", 1, meses=1, semente=4)[0][0]
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(pdf_de_texto(texto))
+    try:
+        for aquecer, nome in ((False, "frio"), (True, "aquecido")):
+            resultados[f"primeira_leitura_pool_{nome}"] = _estatisticas(
+                [_interpretador_novo(CODIGO_PRIMEIRA_LEITURA, f.name, "1" if aquecer else "0")
+                 for _ in range(repeticoes)])
+    finally:
+        os.remove(f.name)
+
+
+def bench_rateio(resultados, repeticoes, tamanhos):
+    """Solver do rateio em carteiras sintéticas (UCs x meses) e montagem a partir dos registros."""
+    rng = np.random.default_rng(4)
+    for qtd_ucs, meses in tamanhos:
+        problema = ProblemaRateio(range(meses), rng.gamma(2.0, 40.0 * qtd_ucs, meses),
+                                  rng.gamma(2.0, 60.0, (qtd_ucs, meses)), range(qtd_ucs), range(qtd_ucs))
+        resultados[f"rateio_otimizar_{qtd_ucs}uc_{meses}meses"] = medir(lambda: otimizar(problema), repeticoes)
+
+    mapper = MAPPERS["B"][0]
+    estrutura = _estrutura([[mapper(t) for t in uc] for uc in textos_carteira("B", 20, semente=6)])
+    resultados["rateio_montar_problema_B_20uc"] = medir(lambda: montar_problema(estrutura, "B"), repeticoes)
+
+
+def bench_titularidade(resultados, repeticoes, tamanhos):
+    """Trocas de titular no banco local: gravação das faturas e consulta (LAG por UC) sobre o índice."""
+    mapper = MAPPERS["B"][0]
+    modelo = [mapper(t).para_dict() for t in textos_carteira("B", 1, semente=7)[0]]
+    for qtd_ucs in tamanhos:
+        registros = []
+        for uc in range(qtd_ucs):
+            for k, dados in enumerate(modelo):
+                # Uma UC a cada dez troca de titular no meio do ano
+                documento = f"{uc:03d}.{uc % 10 == 0 and k >= 6:03d}.000-00"
+                registros.append(dict(dados, uc=str(10000000 + uc), documento=documento))
+        with tempfile.TemporaryDirectory() as pasta:
+            banco = BancoFaturas(os.path.join(pasta, "faturas.db"))
+            n = len(registros)
+            resultados[f"titularidade_salvar_{n}faturas"] = medir(lambda: banco.salvar_varias(registros, "B"), repeticoes)
+            resultados[f"titularidade_trocas_{n}faturas"] = medir(banco.trocas_de_titularidade, repeticoes)
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecido"
+
+
+def comparar(atual, anterior):
+    print(f"{'medição':<45} {'anterior':>10} {'atual':>10} {'razão':>7}")
+    for nome, r in atual.items():
+        antes = anterior.get(nome)
+        if not antes:
+            print(f"{nome:<45} {'-':>10} {r['mediana_s']:>10.4f} {'novo':>7}")
+            continue
+        razao = r["mediana_s"] / antes["mediana_s"] if antes["mediana_s"] else float("inf")
+        alerta = "  <- mais lento" if razao > 1.10 else ""
+        print(f"{nome:<45} {antes['mediana_s']:>10.4f} {r['mediana_s']:>10.4f} {razao:>7.2f}{alerta}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do balanço energético")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--rapido", action="store_true", help="Pula os casos de 100 UCs")
+    parser.add_argument("--saida", default=None, help="Arquivo JSON (padrão: benchmarks/resultados/<data>_<commit>.json)")
+    parser.add_argument("--comparar", default=None, help="JSON de uma execução anterior")
+    args = parser.parse_args(argv)
+
+    resultados = {}
+    etapas = [
+        ("inicialização", lambda: bench_inicializacao(resultados, args.repeticoes)),
+        ("mappers", lambda: bench_mappers(resultados, args.repeticoes)),
+        ("planilhas", lambda: bench_planilhas(resultados, args.repeticoes, (1, 10) if args.rapido else (1, 10, 100))),
+        ("ponta a ponta", lambda: bench_ponta_a_ponta(resultados, args.repeticoes)),
+        ("atualização", lambda: bench_atualizacao(resultados, args.repeticoes, (10,) if args.rapido else (10, 100))),
+        ("rateio", lambda: bench_rateio(resultados, args.repeticoes,
+                                        ((10, 12), (100, 12)) if args.rapido else ((10, 12), (100, 12), (500, 12), (500, 36)))),
+        ("titularidade", lambda: bench_titularidade(resultados, args.repeticoes, (100,) if args.rapido else (100, 1000))),
+    ]
+    for nome, etapa in etapas:
+        print(f"-> {nome}...", file=sys.stderr)
+        etapa()
+
+    commit = _commit_atual()
+    relatorio = {
+        "commit": commit,
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "resultados": resultados,
+    }
+    caminho = args.saida
+    if not caminho:
+        os.makedirs(PASTA_RESULTADOS, exist_ok=True)
+        caminho = os.path.join(PASTA_RESULTADOS, f"{datetime.now():%Y%m%d-%H%M%S}_{commit}.json")
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    print(f"Resultados em {caminho}", file=sys.stderr)
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            comparar(resultados, json.load(f)["resultados"])
+    else:
+        for nome, r in resultados.items():
+            print(f"{nome:<45} {r['mediana_s']:>10.4f}s")
+
+
+if __name__ == "__main__":
+    main()
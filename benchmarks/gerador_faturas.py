@@ -0,0 +1,157 @@
+"""
+Faturas sintéticas da Equatorial para os benchmarks, montadas a partir do layout de texto.txt.
+- texto_fatura_b / texto_fatura_a: texto como o pdfplumber entrega (o que os mappers recebem);
+- pdf_de_texto: PDF mínimo (Helvetica, uma linha por linha do texto) para medir a extração;
+- modelo_grupo_a: modelo com datas na coluna A, como o writer do Grupo A espera.
+"""
+import datetime
+import io
+import os
+import random
+import re
+
+import openpyxl
+
+MESES = ["JAN", "FEV", "MAR", "ABR", "MAI", "JUN", "JUL", "AGO", "SET", "OUT", "NOV", "DEZ"]
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELO = os.path.join(RAIZ, "BALANÇO E COMPENSAÇÃO.xlsx")
+
+with open(os.path.join(RAIZ, "texto.txt"), "r", encoding="utf-8") as f:
+    TEXTO_BASE = f.read()
+
+
+def _br(valor, casas=2):
+    """1234.5 -> '1.234,50'"""
+    return f"{valor:,.{casas}f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def _datas(mes_idx, ano):
+    atual = datetime.date(ano, mes_idx + 1, 22)
+    anterior = atual - datetime.timedelta(days=31)
+    vencimento = atual + datetime.timedelta(days=30)
+    return [d.strftime("%d/%m/%Y") for d in (anterior, atual, vencimento)]
+
+
+def texto_fatura_b(uc: str, mes_idx: int, ano: int, rng: random.Random) -> str:
+    """Fatura do Grupo B (consumo único) com UC, competência e leituras sorteadas."""
+    consumo = rng.randint(80, 2000)
+    geracao = rng.randint(0, 2500)
+    credito = rng.randint(0, consumo)
+    leitura_ant = rng.randint(1000, 90000)
+    total = rng.uniform(30, 2500)
+    anterior, atual, vencimento = _datas(mes_idx, ano)
+    competencia = f"{MESES[mes_idx]}/{ano}"
+
+    texto = TEXTO_BASE.replace("16676257", uc).replace("DEZ/2025", competencia)
+    texto = texto.replace("21/11/2025 22/12/2025 31 21/01/2026", f"{anterior} {atual} 31 {vencimento}")
+    texto = re.sub(r"ENERGIA ATIVA - KWH ÚNICO 020940 021458 1,000000 518",
+                   f"ENERGIA ATIVA - KWH ÚNICO {leitura_ant:06d} {leitura_ant + consumo:06d} 1,000000 {consumo}", texto)
+    texto = re.sub(r"ENERGIA GERAÇÃO - KWH ÚNICO 019819 020427 1,000000 608",
+                   f"ENERGIA GERAÇÃO - KWH ÚNICO 019819 {19819 + geracao:06d} 1,000000 {geracao}", texto)
+    texto = texto.replace(f"UC {uc} : 608,00", f"UC {uc} : {_br(geracao)}")
+    texto = texto.replace("CRÉDITO RECEBIDO KWH 418,00", f"CRÉDITO RECEBIDO KWH {_br(credito)}")
+    texto = texto.replace("TOTAL 141,32", f"TOTAL {_br(total)}")
+    # Histórico de consumo dos 12 meses anteriores
+    historico = []
+    for k in range(1, 13):
+        idx = (mes_idx - k) % 12
+        ano_hist = ano - 1 if mes_idx - k < 0 else ano
+        historico.append(f"{MESES[idx]}/{ano_hist % 100:02d} {rng.randint(80, 2000)} 30")
+    return texto + "\n" + "\n".join(historico) + "\n"
+
+
+def texto_fatura_a(uc: str, mes_idx: int, ano: int, rng: random.Random) -> str:
+    """Fatura do Grupo A (postos tarifários): cabeçalho de texto.txt + bloco de medição e histórico."""
+    anterior, atual, vencimento = _datas(mes_idx, ano)
+    competencia = f"{MESES[mes_idx]}/{ano}"
+    cabecalho = TEXTO_BASE.split("PERDAS DE TRANSFORMAÇÃO")[0]
+    cabecalho = cabecalho.replace("21/11/2025 22/12/2025 31 21/01/2026", f"{anterior} {atual} 31 {vencimento}")
+    cabecalho = cabecalho.replace("Classificação: B B1 RESIDENCIAL - RESIDENCIAL NORMAL CONVENCIONAL",
+                                  "Classificação: A A4 COMERCIAL - OUTROS SERVIÇOS HOROSSAZONAL VERDE")
+
+    def linha(rotulo, valor):
+        # Medições saem sem separador de milhar, como nas faturas (os padrões usam [\d,]+)
+        leitura = rng.randint(1000, 90000)
+        return f"{rotulo} {leitura:06d} {leitura + int(valor):06d} 1,000000 {_br(valor).replace('.', '')}"
+
+    c_p, c_fp, c_hr = rng.uniform(100, 3000), rng.uniform(1000, 30000), rng.uniform(0, 500)
+    d_p, d_fp, d_hr = rng.uniform(10, 200), rng.uniform(20, 300), rng.uniform(0, 50)
+    linhas = [
+        linha("ENERGIA ATIVA - KWH PONTA", c_p),
+        linha("ENERGIA ATIVA - KWH FORA PONTA", c_fp),
+        linha("ENERGIA ATIVA - KWH RESERVADO", c_hr),
+        linha("DEMANDA - KW PONTA", d_p),
+        linha("DEMANDA - KW FORA PONTA", d_fp),
+        linha("DEMANDA - KW RESERVADO", d_hr),
+        linha("ENERGIA GERAÇÃO-KWH PONTA", rng.uniform(0, 100)),
+        linha("ENERGIA GERAÇÃO-KWH FORA PONTA", rng.uniform(0, 8000)),
+        f"CREDITO RECEBIDO KWH {_br(rng.uniform(0, 8000))}",
+        f"SALDO KWH P-{_br(rng.uniform(0, 10))}, FP-{_br(rng.uniform(0, 3000))}, HR-{_br(rng.uniform(0, 10))}",
+        f"TOTAL A PAGAR R$ {_br(rng.uniform(1000, 60000))}",
+    ]
+    for k in range(1, 13):
+        idx = (mes_idx - k) % 12
+        ano_hist = ano - 1 if mes_idx - k < 0 else ano
+        valores = " ".join(_br(rng.uniform(0, 30000)) for _ in range(8))
+        linhas.append(f"{MESES[idx]}/{ano_hist % 100:02d} {valores}")
+    rodape = f"EQUATORIAL GOIAS DISTRIBUIDORA DE ENERGIA S/A {uc} {competencia}"
+    return cabecalho + "\n".join(linhas) + "\n" + rodape + "\n"
+
+
+def textos_carteira(grupo: str, qtd_ucs: int, meses: int = 12, semente: int = 0) -> list:
+    """[[texto do mês 1, ..., mês N] por UC], reprodutível pela semente."""
+    rng = random.Random(semente)
+    gerar = texto_fatura_a if grupo == "A" else texto_fatura_b
+    return [[gerar(str(10000000 + uc), m % 12, 2025, rng) for m in range(meses)] for uc in range(qtd_ucs)]
+
+
+def pdf_de_texto(texto: str, linhas_por_pagina: int = 60) -> bytes:
+    """PDF mínimo com o texto em Helvetica; o pdfplumber devolve as mesmas linhas."""
+    paginas = [linhas for linhas in _fatiar(texto.splitlines(), linhas_por_pagina)] or [[]]
+    objetos = []
+
+    def adicionar(conteudo: bytes) -> int:
+        objetos.append(conteudo)
+        return len(objetos)
+
+    fonte = adicionar(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    id_paginas = len(objetos) + 1 + 2 * len(paginas)
+    filhos = []
+    for linhas in paginas:
+        comandos = " ".join("(%s) '" % l.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+                            for l in linhas)
+        fluxo = f"BT /F1 9 Tf 40 800 Td 11 TL {comandos} ET".encode("latin-1", errors="replace")
+        conteudo = adicionar(b"<< /Length %d >>\nstream\n" % len(fluxo) + fluxo + b"\nendstream")
+        filhos.append(adicionar(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (id_paginas, conteudo, fonte)))
+    adicionar(b"<< /Type /Pages /Kids [%s] /Count %d >>"
+              % (" ".join("%d 0 R" % k for k in filhos).encode(), len(filhos)))
+    catalogo = adicionar(b"<< /Type /Catalog /Pages %d 0 R >>" % id_paginas)
+
+    saida = b"%PDF-1.4\n"
+    posicoes = []
+    for i, obj in enumerate(objetos, start=1):
+        posicoes.append(len(saida))
+        saida += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+    xref = len(saida)
+    saida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    saida += b"".join(b"%010d 00000 n \n" % p for p in posicoes)
+    saida += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, catalogo, xref)
+    return saida
+
+
+def _fatiar(lista, tamanho):
+    for i in range(0, len(lista), tamanho):
+        yield lista[i:i + tamanho]
+
+
+def modelo_grupo_a(ano: int = 2025) -> bytes:
+    """Modelo do Grupo A: o mesmo arquivo base, com datas (1º de cada mês) na coluna A das abas de UC."""
+    wb = openpyxl.load_workbook(MODELO)
+    for ws in wb.worksheets[1:]:
+        for i in range(12):
+            ws[f"A{5 + i}"] = datetime.datetime(ano, i + 1, 1)
+    saida = io.BytesIO()
+    wb.save(saida)
+    return saida.getvalue()
@@ -0,0 +1,89 @@
+import io
+import os
+
+import streamlit as st
+
+# Leitura dos PDFs (com cache) e gravação só das faturas novas (ver services/atualizacao.py)
+from services.pipeline import MAPPERS, mapear_pdfs_auto
+from services.atualizacao import atualizar_planilha
+from services.fatura_cache import CacheFaturas
+from services.banco_faturas import BancoFaturas
+
+st.set_page_config(page_title="Atualizar Balanço", layout="wide")
+
+
+@st.cache_resource
+def obter_cache():
+    return CacheFaturas()
+
+
+@st.cache_resource
+def obter_banco():
+    return BancoFaturas()
+
+
+st.title("🔁 Atualizar um Balanço Existente")
+st.caption("Envie a planilha do mês passado e só as faturas novas: as UCs são localizadas pelo RESUMO, "
+           "UCs novas ganham uma aba e só as linhas dos meses enviados são gravadas.")
+
+# --- 1. CONFIGURAÇÃO ---
+with st.sidebar:
+    st.header("⚙️ Configuração")
+    grupo = st.radio("Grupo Tarifário:", ["A", "B"])
+    motor = st.radio("Motor de gravação do Excel", ["xml", "openpyxl"], horizontal=True,
+                     help="xml: só as abas das UCs com fatura nova são lidas e reescritas.")
+    max_workers = st.number_input("Processos de extração", min_value=1, value=os.cpu_count() or 1, step=1)
+    leitura_lazy = st.checkbox("Leitura parcial das faturas", value=False)
+    leitura_layout = st.checkbox("Leitura por layout", value=False)
+    salvar_no_banco = st.checkbox("Salvar faturas no banco local", value=True)
+
+planilha = st.file_uploader("Planilha já gerada (BALANCO_CONSOLIDADO_GRUPO_X.xlsx)", type=["xlsx"])
+pdfs = st.file_uploader("Faturas novas (de qualquer UC)", type=["pdf"], accept_multiple_files=True)
+
+if planilha and pdfs and st.button(f"🚀 Atualizar com {len(pdfs)} faturas"):
+    progresso = st.progress(0.0)
+    status = st.empty()
+
+    def ao_concluir(_, concluidos, total):
+        progresso.progress(concluidos / (total + 1))
+        status.text(f"Lendo faturas... {concluidos}/{total}")
+
+    cache = obter_cache()
+    # Cada PDF é classificado: fatura de outro grupo não passa pelo mapper deste (viraria zeros)
+    registros, grupos, hashes, _, _ = mapear_pdfs_auto([pdf.getvalue() for pdf in pdfs], cache=cache,
+                                                       leitura_lazy=leitura_lazy, layout=leitura_layout,
+                                                       ao_concluir=ao_concluir, max_workers=max_workers,
+                                                       nomes=[pdf.name for pdf in pdfs])
+    fora = [f"{pdf.name} ({g or 'sem grupo'})" for pdf, g in zip(pdfs, grupos) if g != grupo]
+    if fora:
+        st.warning(f"{len(fora)} faturas não são do Grupo {grupo} e ficaram de fora: " + ", ".join(fora))
+    do_grupo = [k for k, g in enumerate(grupos) if g == grupo]
+    registros, hashes = [registros[k] for k in do_grupo], [hashes[k] for k in do_grupo]
+    if salvar_no_banco:
+        obter_banco().salvar_varias(registros, grupo, hashes, MAPPERS[grupo][1])
+
+    status.text("Gravando dados no Excel...")
+    try:
+        wb, relatorio = atualizar_planilha(planilha.getvalue(), grupo, registros, motor=motor)
+        saida = io.BytesIO()
+        wb.save(saida)
+        del wb
+        st.session_state["atualizacao"] = (planilha.name, saida.getvalue(), relatorio)
+        progresso.progress(1.0)
+        status.success("Planilha atualizada!")
+    except Exception as e:
+        st.error(f"Erro ao atualizar a planilha: {e}")
+
+# --- 2. RESULTADO ---
+if "atualizacao" in st.session_state:
+    nome, conteudo, relatorio = st.session_state["atualizacao"]
+    st.dataframe([{"UC": uc, "situação": "atualizada"} for uc in relatorio["atualizadas"]] +
+                 [{"UC": uc, "situação": f"nova ({aba})"} for uc, aba in relatorio["novas"]] +
+                 [{"UC": uc, "situação": "sem aba livre"} for uc in relatorio["sem_aba"]],
+                 use_container_width=True)
+    if relatorio["sem_aba"]:
+        st.warning("Não há aba de beneficiária para copiar: as UCs sem aba livre ficaram de fora.")
+    if relatorio["sem_uc"]:
+        st.warning(f"{relatorio['sem_uc']} faturas sem número de UC foram ignoradas.")
+    st.download_button("📥 Baixar planilha atualizada", conteudo, file_name=nome,
+                       mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
@@ -0,0 +1,118 @@
+import os
+import shutil
+import tempfile
+import zipfile
+
+import streamlit as st
+
+# Um processo por cliente; as planilhas vão para um único ZIP em disco (ver services/lote.py)
+from services.lote import localizar_raiz, listar_clientes, modelo_do_cliente, processar_carteira
+from services.classificacao import GRUPO_AUTO, GRUPOS
+
+st.set_page_config(page_title="Carteira de Clientes", layout="wide")
+
+st.title("🗂️ Balanço de uma Carteira")
+st.caption("Vários clientes de uma vez: cada um gera a sua planilha, em paralelo, e tudo sai num único ZIP.")
+
+with st.expander("Como montar o ZIP da carteira"):
+    st.code("carteira.zip\n"
+            "    CLIENTE_X/\n"
+            "        modelo.xlsx          (opcional: modelo próprio do cliente)\n"
+            "        geradora_1/*.pdf\n"
+            "        beneficiaria_1/*.pdf\n"
+            "    CLIENTE_Y/\n"
+            "        ...", language=None)
+
+# --- 1. CONFIGURAÇÃO ---
+with st.sidebar:
+    st.header("⚙️ Configuração")
+    opcao_grupo = st.radio("Grupo Tarifário:", ["Automático", "A", "B"],
+                           help="Automático: o grupo de cada fatura é lido do PDF; um cliente com UCs "
+                                "dos dois grupos recebe uma planilha por grupo.")
+    grupo = GRUPO_AUTO if opcao_grupo == "Automático" else opcao_grupo
+    workers = st.number_input("Clientes ao mesmo tempo", min_value=1, value=os.cpu_count() or 1, step=1)
+    motor = st.radio("Motor de gravação do Excel", ["xml", "openpyxl"], horizontal=True)
+    leitura_lazy = st.checkbox("Leitura parcial das faturas", value=False)
+    leitura_layout = st.checkbox("Leitura por layout", value=False)
+
+arquivo_zip = st.file_uploader("ZIP da carteira", type=["zip"])
+if grupo == GRUPO_AUTO:
+    colunas_modelo = dict(zip(GRUPOS, st.columns(len(GRUPOS))))
+    modelos_comuns = {g: colunas_modelo[g].file_uploader(f"Modelo comum do Grupo {g}", type=["xlsx"],
+                                                         key=f"modelo_comum_{g}") for g in GRUPOS}
+else:
+    modelos_comuns = {grupo: st.file_uploader("Planilha modelo comum (para clientes sem modelo próprio)",
+                                              type=["xlsx"])}
+modelos_comuns = {g: arquivo for g, arquivo in modelos_comuns.items() if arquivo}
+
+if arquivo_zip:
+    # Uma pasta de trabalho por sessão; substituída a cada novo ZIP
+    anterior = st.session_state.get("pasta_carteira")
+    if st.session_state.get("zip_carteira") != arquivo_zip.file_id:
+        if anterior:
+            shutil.rmtree(anterior, ignore_errors=True)
+        anterior = tempfile.mkdtemp(prefix="carteira_")
+        with zipfile.ZipFile(arquivo_zip) as z:
+            z.extractall(os.path.join(anterior, "entrada"))
+        st.session_state["pasta_carteira"] = anterior
+        st.session_state["zip_carteira"] = arquivo_zip.file_id
+        st.session_state.pop("saida_carteira", None)
+    pasta = st.session_state["pasta_carteira"]
+    raiz = localizar_raiz(os.path.join(pasta, "entrada"))
+    clientes = listar_clientes(raiz)
+
+    if not clientes:
+        st.warning("Nenhum cliente encontrado (pastas com geradora_N/ e beneficiaria_N/).")
+        st.stop()
+
+    st.dataframe([{
+        "cliente": cliente,
+        "geradoras": sum(item['tipo'] == "geradora" for item in itens),
+        "beneficiárias": sum(item['tipo'] == "beneficiaria" for item in itens),
+        "PDFs": sum(len(item['arquivos']) for item in itens),
+        "modelo": os.path.basename(modelo_do_cliente(raiz, cliente) or "") or "comum",
+    } for cliente, itens in clientes.items()], use_container_width=True)
+
+    sem_modelo = [c for c in clientes if not modelo_do_cliente(raiz, c)]
+    if sem_modelo and not modelos_comuns:
+        st.info(f"Envie a planilha modelo comum: {len(sem_modelo)} cliente(s) sem modelo próprio.")
+        st.stop()
+
+    # --- 2. PROCESSAMENTO ---
+    if st.button(f"🚀 Processar {len(clientes)} clientes"):
+        caminhos_modelos = {}
+        for g, arquivo in modelos_comuns.items():
+            caminhos_modelos[g] = os.path.join(pasta, f"modelo_comum_{g}.xlsx")
+            with open(caminhos_modelos[g], "wb") as f:
+                f.write(arquivo.getvalue())
+        saida = os.path.join(pasta, "saida")
+        os.makedirs(saida, exist_ok=True)
+        # No automático cada grupo usa o seu modelo comum (ver lote.modelo_do_grupo)
+        opcoes = {"grupo": grupo, "modelo": caminhos_modelos.get(grupo),
+                  "modelos": caminhos_modelos, "saida": saida, "motor": motor,
+                  "leitura_lazy": leitura_lazy, "leitura_layout": leitura_layout,
+                  "cache": ".cache_faturas", "banco": "",
+                  "completar_com_banco": False}
+
+        progresso = st.progress(0.0)
+        andamento = st.empty()
+
+        def ao_concluir(resultado, concluidos, total):
+            progresso.progress(concluidos / total)
+            andamento.text(f"[{resultado['status']}] {resultado['cliente']} ({concluidos}/{total})")
+
+        destino = os.path.join(pasta, "BALANCOS.zip" if grupo == GRUPO_AUTO else f"BALANCOS_GRUPO_{grupo}.zip")
+        resultados = processar_carteira(raiz, opcoes, destino, workers=workers, ao_concluir=ao_concluir)
+        st.session_state["saida_carteira"] = (destino, resultados)
+
+    # --- 3. RESULTADO ---
+    if "saida_carteira" in st.session_state:
+        destino, resultados = st.session_state["saida_carteira"]
+        ok = sum(r["status"] == "ok" for r in resultados)
+        st.success(f"{ok} de {len(resultados)} clientes sem falhas.")
+        st.dataframe([{"cliente": r["cliente"], "status": r["status"], "faturas": r["faturas"],
+                       "planilhas": ", ".join(r.get("arquivos") or []),
+                       "PDFs com erro": len(r["falhas_pdf"]), "erro": r.get("erro", ""),
+                       "segundos": r["segundos"].get("total")} for r in resultados], use_container_width=True)
+        with open(destino, "rb") as f:
+            st.download_button("📥 Baixar ZIP", f, file_name=os.path.basename(destino), mime="application/zip")
@@ -0,0 +1,73 @@
+import streamlit as st
+
+# Problema e solver do rateio (ver services/rateio.py)
+from services.rateio import (montar_problema, otimizar, arredondar, avaliar, comparar,
+                             fracoes_atuais, fracoes_proporcionais)
+# Banco local (SQLite) com todas as faturas já processadas
+from services.banco_faturas import BancoFaturas
+
+st.set_page_config(page_title="Rateio de Créditos", layout="wide")
+
+
+@st.cache_resource
+def obter_banco():
+    return BancoFaturas()
+
+
+banco = obter_banco()
+
+st.title("🔀 Rateio de Créditos")
+st.caption("Percentuais fixos por beneficiária que maximizam a energia compensada no período "
+           "(menos consumo pago e menos crédito parado nas UCs).")
+
+# --- 1. ORIGEM DOS DADOS ---
+ultima_execucao = st.session_state.get("dados_estruturados")
+origens = (["Última execução do balanço"] if ultima_execucao else []) + ["Banco de faturas"]
+origem = st.radio("Origem das faturas", origens, horizontal=True)
+
+if origem == "Banco de faturas":
+    grupo = st.radio("Grupo Tarifário", ["A", "B"], horizontal=True)
+    ucs = banco.ucs(grupo)
+    geradoras = st.multiselect("UCs geradoras", ucs)
+    beneficiarias = st.multiselect("UCs beneficiárias", [uc for uc in ucs if uc not in geradoras])
+    dados_estruturados = banco.montar_dados_estruturados(grupo, geradoras, beneficiarias)
+else:
+    # Execução com os dois grupos: um rateio por vez
+    grupos = sorted(ultima_execucao)
+    grupo = st.radio("Grupo Tarifário", grupos, horizontal=True) if len(grupos) > 1 else grupos[0]
+    dados_estruturados = ultima_execucao[grupo]
+
+with st.expander("⚙️ Parâmetros"):
+    minimo_kwh = st.number_input("Custo de disponibilidade (kWh/mês)", min_value=0.0, value=0.0, step=10.0,
+                                 help="Consumo mínimo faturado de qualquer forma: não é abatido pelos créditos.")
+    incluir_saldo = st.checkbox("Distribuir também o saldo acumulado das geradoras", value=True)
+    casas = st.number_input("Casas decimais dos percentuais", min_value=0, max_value=4, value=2, step=1)
+
+if not any(item['tipo'] == "beneficiaria" and item['dados'] for item in dados_estruturados):
+    st.info("Selecione pelo menos uma geradora e uma beneficiária com faturas.")
+    st.stop()
+
+try:
+    problema = montar_problema(dados_estruturados, grupo, minimo_kwh=minimo_kwh, incluir_saldo=incluir_saldo)
+except ValueError as e:
+    st.warning(str(e))
+    st.stop()
+
+# --- 2. RESULTADO ---
+fracoes = arredondar(otimizar(problema), int(casas)) / 100
+inicio, fim = problema.meses[0], problema.meses[-1]
+st.markdown(f"**Período:** {inicio[1]:02d}/{inicio[0]} a {fim[1]:02d}/{fim[0]} | "
+            f"**Crédito disponível:** {problema.credito.sum():,.0f} kWh | "
+            f"**Consumo compensável:** {problema.demanda.sum():,.0f} kWh")
+
+resultado = avaliar(problema, fracoes)
+st.subheader("Percentuais sugeridos")
+st.dataframe(resultado, use_container_width=True)
+st.download_button("Baixar CSV", resultado.to_csv(index=False), file_name="rateio.csv", mime="text/csv")
+
+st.subheader("Comparação")
+st.dataframe(comparar(problema, {
+    "Rateio atual (faturas)": fracoes_atuais(problema),
+    "Proporcional ao consumo": fracoes_proporcionais(problema),
+    "Sugerido": fracoes,
+}), use_container_width=True)
@@ -0,0 +1,70 @@
+import pandas as pd
+import streamlit as st
+
+# Banco local (SQLite) com todas as faturas já processadas: titular e CNPJ/CPF ficam em colunas indexadas
+from services.banco_faturas import BancoFaturas
+
+st.set_page_config(page_title="Troca de Titularidade", layout="wide")
+
+
+@st.cache_resource
+def obter_banco():
+    return BancoFaturas()
+
+
+def competencia(ano, mes) -> str:
+    return f"{mes:02d}/{ano}" if ano else ""
+
+
+banco = obter_banco()
+
+st.title("🪪 Troca de Titularidade")
+st.caption("UCs cujo CNPJ/CPF do titular mudou de uma fatura para a seguinte, entre todas as faturas "
+           "já salvas no banco local (sem reler os PDFs).")
+
+# --- 1. FILTRO ---
+opcao_grupo = st.radio("Grupo Tarifário", ["Todos", "A", "B"], horizontal=True)
+grupo = None if opcao_grupo == "Todos" else opcao_grupo
+
+sem_titular = banco.faturas_sem_titular(grupo)
+if sem_titular:
+    st.warning(f"{sem_titular} faturas do banco não têm CNPJ/CPF (processadas antes da leitura do titular "
+               "ou sem o campo no PDF) e ficam fora da comparação. Processe-as de novo para incluí-las.")
+
+# --- 2. TROCAS ---
+trocas = banco.trocas_de_titularidade(grupo)
+ucs_com_troca = sorted({troca["uc"] for troca in trocas})
+
+col1, col2 = st.columns(2)
+col1.metric("UCs com troca de titular", len(ucs_com_troca))
+col2.metric("Trocas encontradas", len(trocas))
+
+if not trocas:
+    st.info("Nenhuma troca de titularidade entre as faturas do banco.")
+    st.stop()
+
+tabela = pd.DataFrame([{
+    "UC": troca["uc"],
+    "Grupo": troca["grupo"],
+    "Fatura anterior": competencia(troca["ano_anterior"], troca["mes_anterior"]),
+    "Titular anterior": troca["titular_anterior"],
+    "CNPJ/CPF anterior": troca["documento_anterior"],
+    "Competência da troca": competencia(troca["ano"], troca["mes"]),
+    "Novo titular": troca["titular"],
+    "Novo CNPJ/CPF": troca["documento"],
+} for troca in trocas])
+st.dataframe(tabela, use_container_width=True, hide_index=True)
+st.download_button("Baixar CSV", tabela.to_csv(index=False), file_name="trocas_de_titularidade.csv",
+                   mime="text/csv")
+
+# --- 3. HISTÓRICO DE UMA UC ---
+st.subheader("Titulares da UC")
+uc = st.selectbox("UC", ucs_com_troca)
+st.dataframe(pd.DataFrame([{
+    "Grupo": periodo["grupo"],
+    "Titular": periodo["titular"],
+    "CNPJ/CPF": periodo["documento"],
+    "Desde": competencia(*periodo["desde"]),
+    "Até": competencia(*periodo["ate"]),
+    "Faturas": periodo["faturas"],
+} for periodo in banco.historico_titulares(uc, grupo)]), use_container_width=True, hide_index=True)
@@ -0,0 +1,38 @@
+"""
+Executor da fila de processamento num processo próprio, fora do servidor do Streamlit.
+
+Uso:
+    python processar_fila.py --jobs 2 --por-dono 1
+
+O app só enfileira (com FILA_EXTERNA=1 ele não inicia o executor embutido);
+este processo pega os jobs de jobs.db e grava o progresso e as planilhas.
+"""
+import argparse
+import sys
+import time
+
+from services.fila_jobs import FilaJobs, ExecutorFila
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Processa os jobs enfileirados pelo app.")
+    parser.add_argument("--banco", default="jobs.db", help="Banco SQLite da fila")
+    parser.add_argument("--pasta", default=".jobs", help="Pasta com os arquivos dos jobs")
+    parser.add_argument("--jobs", type=int, default=2, help="Jobs rodando ao mesmo tempo")
+    parser.add_argument("--por-dono", type=int, default=1, help="Jobs simultâneos de um mesmo usuário")
+    args = parser.parse_args(argv)
+
+    executor = ExecutorFila(FilaJobs(args.banco, args.pasta), max_jobs=args.jobs,
+                            limite_por_dono=args.por_dono).iniciar()
+    print(f"Executor da fila rodando ({args.jobs} jobs, {args.por_dono} por usuário). Ctrl+C para parar.",
+          file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        executor.parar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Processamento em lote, sem a interface do Streamlit.
+
+Estrutura esperada (uma pasta por cliente):
+    carteira/
+        CLIENTE_X/
+            geradora_1/*.pdf
+            beneficiaria_1/*.pdf
+            beneficiaria_2/*.pdf
+
+Uso:
+    python processar_lote.py carteira --modelo "BALANÇO E COMPENSAÇÃO.xlsx" --grupo B --saida saida -j 4
+    python processar_lote.py carteira --grupo auto --modelo BALANCO_B.xlsx --modelo-a BALANCO_A.xlsx
+
+Gera uma planilha por cliente em --saida e um resumo.json com tempos e falhas.
+Com --zip carteira.zip, as planilhas vão para um único ZIP conforme cada cliente termina
+(um .xlsx dentro da pasta do cliente é usado como modelo dele).
+Com --grupo auto o grupo de cada PDF é lido da fatura (linhas de medição / classificação) e
+um cliente com UCs dos dois grupos recebe uma planilha por grupo.
+Com --salvar-plano, cada planilha ganha ao lado o seu plano de escrita (BALANCO_..._GRUPO_X.plano.json);
+--simular não grava planilha nem banco: lista, por planilha, as células que mudariam em relação à
+saída anterior em --saida, comparando com esse plano (ou, sem ele, com a própria planilha).
+Sai com código 1 se algum cliente ou PDF falhar.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from services.lote import listar_clientes, processar_cliente, processar_carteira
+from services.classificacao import GRUPO_AUTO
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera o balanço energético de vários clientes de uma vez.")
+    parser.add_argument("raiz", help="Pasta com uma subpasta por cliente")
+    parser.add_argument("--modelo", required=True, help="Planilha modelo (.xlsx)")
+    parser.add_argument("--grupo", choices=["A", "B", GRUPO_AUTO], required=True,
+                        help="Grupo tarifário; 'auto' classifica cada PDF e gera uma planilha por grupo")
+    parser.add_argument("--modelo-a", default=None, help="Modelo das UCs do Grupo A (padrão: --modelo)")
+    parser.add_argument("--modelo-b", default=None, help="Modelo das UCs do Grupo B (padrão: --modelo)")
+    parser.add_argument("--saida", default="saida", help="Pasta das planilhas geradas")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="Clientes processados ao mesmo tempo")
+    parser.add_argument("--motor", choices=["openpyxl", "xml"], default="xml", help="Motor de gravação do Excel")
+    parser.add_argument("--lazy", action="store_true", help="Leitura parcial das faturas")
+    parser.add_argument("--layout", action="store_true", help="Leitura dos campos pelo layout da página")
+    parser.add_argument("--cache", default=".cache_faturas", help="Pasta do cache em disco ('' desativa)")
+    parser.add_argument("--banco", default="", help="Banco SQLite onde salvar as faturas ('' desativa)")
+    parser.add_argument("--completar-com-banco", action="store_true",
+                        help="Usa os meses já salvos de cada UC (requer --banco)")
+    parser.add_argument("--zip", default=None,
+                        help="Junta as planilhas neste ZIP (um .xlsx na pasta do cliente substitui --modelo)")
+    parser.add_argument("--resumo", default=None, help="Arquivo JSON do resumo (padrão: <saida>/resumo.json)")
+    parser.add_argument("--salvar-plano", action="store_true",
+                        help="Grava o plano de escrita de cada planilha (base para --simular)")
+    parser.add_argument("--simular", action="store_true",
+                        help="Não grava planilhas: compara o que seria gravado com a saída anterior em --saida")
+    args = parser.parse_args(argv)
+    if args.simular and args.zip:
+        parser.error("--simular compara com as planilhas de --saida; não use junto com --zip")
+
+    os.makedirs(args.saida, exist_ok=True)
+    clientes = listar_clientes(args.raiz)
+    opcoes = {
+        "grupo": args.grupo, "modelo": args.modelo, "saida": args.saida, "motor": args.motor,
+        "leitura_lazy": args.lazy, "leitura_layout": args.layout, "cache": args.cache, "banco": args.banco,
+        "completar_com_banco": args.completar_com_banco,
+        "simular": args.simular, "salvar_plano": args.salvar_plano,
+        "modelos": {grupo: modelo for grupo, modelo in (("A", args.modelo_a), ("B", args.modelo_b)) if modelo},
+    }
+
+    inicio = time.perf_counter()
+    iniciado_em = datetime.now().isoformat(timespec="seconds")
+    resultados = []
+    workers = max(1, min(args.workers, len(clientes) or 1))
+    if args.zip:
+        def ao_concluir(resultado, concluidos, total):
+            print(f"[{resultado['status']}] {resultado['cliente']} ({concluidos}/{total})", file=sys.stderr)
+        resultados = processar_carteira(args.raiz, opcoes, args.zip, workers=workers, ao_concluir=ao_concluir)
+    elif workers == 1:
+        for cliente, itens in clientes.items():
+            resultados.append(processar_cliente(cliente, itens, opcoes))
+            print(f"[{resultados[-1]['status']}] {cliente}", file=sys.stderr)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futuros = {pool.submit(processar_cliente, cliente, itens, opcoes): cliente
+                       for cliente, itens in clientes.items()}
+            for futuro in as_completed(futuros):
+                resultados.append(futuro.result())
+                print(f"[{resultados[-1]['status']}] {futuros[futuro]}", file=sys.stderr)
+    resultados.sort(key=lambda r: r["cliente"])
+
+    resumo = {
+        "iniciado_em": iniciado_em,
+        "grupo": args.grupo,
+        "workers": workers,
+        "segundos_total": round(time.perf_counter() - inicio, 3),
+        "clientes": len(resultados),
+        "ok": sum(r["status"] == "ok" for r in resultados),
+        "parciais": sum(r["status"] == "parcial" for r in resultados),
+        "erros": sum(r["status"] == "erro" for r in resultados),
+        "resultados": resultados,
+    }
+    caminho_resumo = args.resumo or os.path.join(args.saida, "resumo.json")
+    with open(caminho_resumo, "w", encoding="utf-8") as f:
+        json.dump(resumo, f, ensure_ascii=False, indent=2)
+    for resultado in resultados:
+        for simulacao in resultado.get("simulacao", []):
+            base = {"plano": "plano salvo", "planilha": "planilha anterior", None: "sem saída anterior"}[simulacao["base"]]
+            print(f"{os.path.basename(simulacao['arquivo'])}: {simulacao['diferencas']} de "
+                  f"{simulacao['celulas']} células mudariam ({base})", file=sys.stderr)
+    print(f"{resumo['ok']} ok, {resumo['parciais']} parciais, {resumo['erros']} com erro "
+          f"em {resumo['segundos_total']}s -> {caminho_resumo}", file=sys.stderr)
+    return 1 if resumo["erros"] or resumo["parciais"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""
+Atualização de uma planilha já gerada (BALANCO_CONSOLIDADO_GRUPO_X.xlsx) só com as faturas novas.
+
+    wb, relatorio = atualizar_planilha("BALANCO_CONSOLIDADO_GRUPO_B.xlsx", "B", registros, motor="xml")
+    wb.save("BALANCO_CONSOLIDADO_GRUPO_B.xlsx")
+
+- A aba de cada UC sai do RESUMO: a coluna F (a partir da linha 7) tem as UCs na mesma
+  ordem das abas (geradoras, depois beneficiárias), que é a ordem em que os writers gravam.
+- Só as abas das UCs com fatura nova recebem escritas, e só nas linhas dos meses dessas
+  faturas: o histórico não é regravado e o RESUMO só ganha as linhas das UCs novas.
+- UC nova ocupa a próxima aba sem UC no RESUMO ou, não havendo, uma cópia da aba de
+  beneficiária com os valores dos meses apagados (as fórmulas ficam).
+- Com o motor "xml" as abas sem escrita são copiadas byte a byte: o custo acompanha as
+  faturas novas, não o tamanho do histórico.
+"""
+import io
+import re
+
+import openpyxl
+
+from services.clonagem_abas import clonar_aba
+from services.indice_planilha import IndicePlanilha, SIGLAS
+from services.pipeline import obter_writers
+from services.xlsx_patch import PlanilhaXML
+from utils.instrumentacao import medir
+
+LINHA_RESUMO = 7
+# Colunas gravadas pelos writers nas linhas dos meses (B..U)
+COLUNAS_MESES = [chr(c) for c in range(ord("B"), ord("U") + 1)]
+RE_ABA_GERADORA = re.compile(r"^UC GERADORA(?: (\d+))?$")
+RE_ABA_BENEF = re.compile(r"^UC BENEF\. (\d+)$")
+
+
+def abrir_planilha(origem, motor="openpyxl"):
+    """Planilha já gerada, no motor escolhido (caminho, bytes ou arquivo enviado)."""
+    if motor == "xml":
+        return PlanilhaXML(origem)
+    if isinstance(origem, (bytes, bytearray)):
+        origem = io.BytesIO(origem)
+    elif hasattr(origem, "seek"):
+        origem.seek(0)
+    return openpyxl.load_workbook(origem)
+
+
+def _aba_resumo(wb):
+    return next((wb[s] for s in wb.sheetnames if "RESUMO" in s.upper()), None)
+
+
+def abas_uc(wb) -> list:
+    """(tipo, indice, titulo) das abas de UC, na ordem em que os writers preenchem o RESUMO."""
+    geradoras, beneficiarias = [], []
+    for titulo in wb.sheetnames:
+        m = RE_ABA_GERADORA.match(titulo)
+        if m:
+            geradoras.append(("geradora", int(m.group(1) or 1), titulo))
+            continue
+        m = RE_ABA_BENEF.match(titulo)
+        if m:
+            beneficiarias.append(("beneficiaria", int(m.group(1)), titulo))
+    return sorted(geradoras) + sorted(beneficiarias)
+
+
+def ucs_do_resumo(wb) -> list:
+    """
+    UCs da coluna F do RESUMO, da linha 7 até a primeira vazia. Uma linha em que F faz parte
+    de uma mesclagem (a tabela do modelo tem 13 linhas; a 20 é mesclada) entra como None:
+    a UC dela não pode ser lida, mas a posição das seguintes continua valendo.
+    """
+    ws = _aba_resumo(wb)
+    ucs = []
+    if ws is None:
+        return ucs
+    indice = IndicePlanilha(ws)
+    while True:
+        coord = f"F{LINHA_RESUMO + len(ucs)}"
+        if indice.ancora(coord) != coord:
+            ucs.append(None)
+            continue
+        valor = ws[coord].value
+        if valor is None or not str(valor).strip():
+            return ucs
+        ucs.append(str(valor).strip())
+
+
+def abas_por_uc(wb) -> dict:
+    """{uc: (tipo, indice, titulo)}: a n-ésima UC do RESUMO fica na n-ésima aba de UC."""
+    return {uc: aba for uc, aba in zip(ucs_do_resumo(wb), abas_uc(wb)) if uc}
+
+
+def limpar_meses(ws):
+    """Apaga os valores das linhas dos meses (colunas B..U); fórmulas e rótulos ficam."""
+    indice = IndicePlanilha(ws)
+    for sigla in SIGLAS:
+        linha = indice.linha_sigla(sigla)
+        if not linha:
+            continue
+        for coluna in COLUNAS_MESES:
+            valor = ws[f"{coluna}{linha}"].value
+            if valor is not None and not (isinstance(valor, str) and valor.startswith("=")):
+                ws[f"{coluna}{linha}"] = None
+
+
+def _abas_para_novas(wb, quantidade, ocupadas):
+    """Abas para as UCs novas: as que ainda não têm UC no RESUMO e, depois, cópias da beneficiária."""
+    abas = abas_uc(wb)
+    livres = abas[ocupadas:ocupadas + quantidade]
+    faltam = quantidade - len(livres)
+    if faltam <= 0:
+        return livres
+    modelo = next((titulo for tipo, _, titulo in reversed(abas) if tipo == "beneficiaria"), None)
+    if modelo is None:
+        return livres
+    ultimo = max((indice for tipo, indice, _ in abas if tipo == "beneficiaria"), default=0)
+    novas = [("beneficiaria", ultimo + n, f"UC BENEF. {ultimo + n}") for n in range(1, faltam + 1)]
+    clonar_aba(wb, wb[modelo], [titulo for _, _, titulo in novas])
+    return livres + novas
+
+
+def atualizar_planilha(origem, grupo: str, faturas, motor="openpyxl", instrumentacao=None):
+    """
+    Grava só as faturas novas na planilha já gerada. faturas: registros de qualquer UC,
+    em qualquer ordem (agrupados aqui pela UC de cada um).
+    Devolve (wb, relatorio) com as UCs atualizadas, as UCs novas e suas abas, e as faturas sem UC.
+    """
+    with medir(instrumentacao, "importar_writer"):
+        _, salvar = obter_writers(grupo)
+    with medir(instrumentacao, "abrir_planilha"):
+        wb = abrir_planilha(origem, motor)
+
+    por_uc = {}
+    sem_uc = 0
+    for fatura in faturas:
+        uc = fatura.get("uc")
+        if uc:
+            por_uc.setdefault(str(uc).strip(), []).append(fatura)
+        else:
+            sem_uc += 1
+
+    with medir(instrumentacao, "localizar_abas"):
+        ucs = ucs_do_resumo(wb)
+        mapa = {uc: aba for uc, aba in zip(ucs, abas_uc(wb)) if uc}
+        novas = [uc for uc in por_uc if uc not in mapa]
+        abas_novas = _abas_para_novas(wb, len(novas), len(ucs))
+        for aba in abas_novas:
+            limpar_meses(wb[aba[2]])
+
+    relatorio = {"atualizadas": [uc for uc in por_uc if uc in mapa], "novas": [], "sem_aba": [], "sem_uc": sem_uc}
+    itens = [{'tipo': mapa[uc][0], 'indice': mapa[uc][1], 'dados': por_uc[uc], 'historico': False}
+             for uc in relatorio["atualizadas"]]
+    ws_resumo = _aba_resumo(wb)
+    indice_resumo = IndicePlanilha(ws_resumo) if ws_resumo is not None else None
+    for posicao, uc in enumerate(novas):
+        if posicao >= len(abas_novas):
+            relatorio["sem_aba"].append(uc)
+            continue
+        tipo, indice, titulo = abas_novas[posicao]
+        # UC nova: o histórico da fatura preenche os meses anteriores, como na geração completa
+        itens.append({'tipo': tipo, 'indice': indice, 'dados': por_uc[uc]})
+        relatorio["novas"].append((uc, titulo))
+        if indice_resumo is not None:
+            linha = LINHA_RESUMO + len(ucs) + posicao
+            indice_resumo.escrever("F", linha, uc)
+            indice_resumo.escrever("G", linha, por_uc[uc][0].get("endereco"))
+
+    with medir(instrumentacao, "writer"):
+        salvar(wb, itens, escrever_resumo=False)
+    return wb, relatorio
@@ -0,0 +1,105 @@
+"""
+Cálculo do balanço em forma colunar (pandas/NumPy), sem depender das fórmulas do Excel.
+
+    frame = calcular_balanco(montar_frame(dados_estruturados, "B"))
+    totais_anuais(frame)
+
+Uma linha por fatura, na mesma ordem em que os writers percorrem dados_estruturados
+(colunas item/posicao). O frame alimenta o painel do balanço e o CSV do app; na planilha
+as colunas calculadas (crédito utilizado, excedente...) continuam sendo fórmulas do modelo,
+então os writers gravam só os valores das faturas. O único valor entregue a eles é o
+consumo total do Grupo A (P + FP + HR), via valores_por_item.
+"""
+import numpy as np
+import pandas as pd
+
+from services.banco_faturas import ano_completo
+from services.registros import FaturaA, FaturaB, MESES, como_fatura
+
+COLUNAS_COMUNS = ["energia_gerada", "credito_recebido", "saldo", "valor_fatura"]
+COLUNAS_GRUPO = {
+    "B": ["energia_ativa"],
+    "A": ["c_p", "c_fp", "c_hr", "d_p", "d_fp", "d_hr"],
+}
+TIPOS = {"A": FaturaA, "B": FaturaB}
+
+
+def montar_frame(dados_estruturados, grupo: str) -> pd.DataFrame:
+    """Carrega todos os registros do cliente ([{'tipo', 'indice', 'dados'}]) num DataFrame."""
+    tipo_registro = TIPOS[grupo]
+    numericas = COLUNAS_COMUNS + COLUNAS_GRUPO[grupo]
+    colunas = {nome: [] for nome in ["item", "posicao", "tipo", "indice", "uc", "ano", "mes_num"] + numericas}
+    for item_idx, item in enumerate(dados_estruturados):
+        for posicao, dados in enumerate(item['dados']):
+            dados = como_fatura(dados, tipo_registro)
+            colunas["item"].append(item_idx)
+            colunas["posicao"].append(posicao)
+            colunas["tipo"].append(item['tipo'])
+            colunas["indice"].append(item['indice'])
+            colunas["uc"].append(dados.uc)
+            colunas["ano"].append(ano_completo(dados.ano))
+            colunas["mes_num"].append(MESES.index(dados.mes) + 1 if dados.mes in MESES else 0)
+            for nome in numericas:
+                colunas[nome].append(getattr(dados, nome))
+
+    frame = pd.DataFrame(colunas)
+    frame[numericas] = frame[numericas].astype("float64")
+    frame[["item", "posicao", "indice", "ano", "mes_num"]] = frame[["item", "posicao", "indice", "ano", "mes_num"]].astype("int64")
+    frame.attrs["grupo"] = grupo
+    return frame
+
+
+def calcular_balanco(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Acrescenta as colunas do balanço mensal:
+    - consumo: energia ativa (B) ou P + FP + HR (A);
+    - credito_utilizado / credito_residual: quanto do crédito recebido abateu o consumo e o que sobrou;
+    - consumo_liquido: consumo ainda faturado depois dos créditos;
+    - excedente_geracao: geração menos consumo (só faz sentido nas geradoras);
+    - variacao_saldo: saldo do mês menos o do mês anterior da mesma UC.
+    """
+    frame = frame.copy()
+    if frame.attrs.get("grupo") == "A":
+        # Mesma ordem de soma do writer (P + FP) + HR, para o resultado ser idêntico
+        frame["consumo"] = (frame["c_p"] + frame["c_fp"]) + frame["c_hr"]
+    else:
+        frame["consumo"] = frame["energia_ativa"]
+
+    consumo = frame["consumo"].to_numpy()
+    credito = frame["credito_recebido"].to_numpy()
+    utilizado = np.minimum(credito, np.maximum(consumo, 0.0))
+    frame["credito_utilizado"] = utilizado
+    frame["credito_residual"] = credito - utilizado
+    frame["consumo_liquido"] = consumo - utilizado
+    frame["excedente_geracao"] = np.where(frame["tipo"].to_numpy() == "geradora",
+                                          frame["energia_gerada"].to_numpy() - consumo, 0.0)
+
+    ordem = frame.sort_values(["item", "ano", "mes_num"], kind="stable")
+    frame["variacao_saldo"] = ordem.groupby("item")["saldo"].diff().reindex(frame.index).fillna(0.0)
+    return frame
+
+
+def totais_anuais(frame: pd.DataFrame) -> pd.DataFrame:
+    """Somas por UC e ano (saldo: último do ano)."""
+    somaveis = [c for c in frame.columns
+                if c not in ("item", "posicao", "tipo", "indice", "uc", "ano", "mes_num", "saldo", "variacao_saldo")]
+    ordem = frame.sort_values(["item", "ano", "mes_num"], kind="stable")
+    agrupado = ordem.groupby(["item", "tipo", "indice", "uc", "ano"], sort=True)
+    totais = agrupado[somaveis].sum()
+    totais["saldo_final"] = agrupado["saldo"].last()
+    totais["meses"] = agrupado.size()
+    return totais.reset_index().drop(columns="item")
+
+
+def totais_postos(frame: pd.DataFrame) -> pd.DataFrame:
+    """Grupo A: consumo e demanda P/FP/HR de todas as UCs somados por mês."""
+    colunas = COLUNAS_GRUPO["A"]
+    return frame.groupby(["ano", "mes_num"], sort=True)[colunas].sum().reset_index()
+
+
+def valores_por_item(frame: pd.DataFrame, coluna: str, qtd_itens: int) -> list:
+    """[[valor da fatura 0, 1, ...] por item], na ordem de dados_estruturados, para os writers."""
+    por_item = [[] for _ in range(qtd_itens)]
+    for item, valor in zip(frame["item"].tolist(), frame[coluna].tolist()):
+        por_item[item].append(valor)
+    return por_item
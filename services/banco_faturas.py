@@ -0,0 +1,217 @@
+import json
+import sqlite3
+from contextlib import closing
+
+from services.registros import serializar
+
+MESES = ["JAN", "FEV", "MAR", "ABR", "MAI", "JUN", "JUL", "AGO", "SET", "OUT", "NOV", "DEZ"]
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS faturas (
+    id INTEGER PRIMARY KEY,
+    uc TEXT NOT NULL,
+    grupo TEXT NOT NULL,
+    ano INTEGER NOT NULL,
+    mes INTEGER NOT NULL,
+    hash TEXT,
+    versao_mapper TEXT,
+    titular TEXT,
+    documento TEXT,
+    dados TEXT NOT NULL,
+    atualizado_em TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (uc, grupo, ano, mes)
+);
+CREATE INDEX IF NOT EXISTS idx_faturas_uc_periodo ON faturas (uc, ano, mes);
+CREATE INDEX IF NOT EXISTS idx_faturas_grupo_periodo ON faturas (grupo, ano, mes);
+"""
+
+# Colunas acrescentadas depois da primeira versão do banco: (nome, tipo, caminho no JSON dos dados)
+COLUNAS_NOVAS = [
+    ("titular", "TEXT", "$.titular"),
+    ("documento", "TEXT", "$.documento"),
+]
+
+# Índice de titularidade: cobre a consulta por UC e grupo em ordem de competência sem ler o JSON
+# (o anterior, sem o grupo, é trocado por este em bancos já existentes)
+ESQUEMA_TITULARES = """
+DROP INDEX IF EXISTS idx_faturas_titular;
+CREATE INDEX IF NOT EXISTS idx_faturas_titular_grupo ON faturas (uc, grupo, ano, mes, documento, titular);
+"""
+
+# Competências de cada UC com o titular da anterior do mesmo grupo (LAG sobre o índice de titularidade):
+# uma UC com o mesmo número nos dois grupos tem duas sequências, como em todas as consultas por (uc, grupo).
+# Faturas sem documento (mapper antigo ou campo não encontrado) ficam de fora: não há com o que comparar.
+SQL_TITULARES = """
+SELECT uc, grupo, ano, mes, titular, documento,
+       LAG(documento) OVER w AS documento_anterior,
+       LAG(titular) OVER w AS titular_anterior,
+       LAG(ano) OVER w AS ano_anterior,
+       LAG(mes) OVER w AS mes_anterior
+FROM faturas
+WHERE documento <> '' {filtro}
+WINDOW w AS (PARTITION BY uc, grupo ORDER BY ano, mes)
+"""
+
+
+def ano_completo(ano) -> int:
+    """Grupo B traz o ano com 4 dígitos (2025) e o Grupo A com 2 ("25")."""
+    try:
+        ano = int(ano)
+    except (TypeError, ValueError):
+        return 0
+    return ano + 2000 if 0 < ano < 100 else ano
+
+
+class BancoFaturas:
+    """
+    Armazena localmente (SQLite) todos os registros mapeados, um por UC/mês/grupo.
+    Uma fatura reenviada para o mesmo mês substitui a anterior.
+    """
+
+    def __init__(self, caminho="faturas.db"):
+        self.caminho = caminho
+        with closing(self._conectar()) as conn, conn:
+            conn.executescript(ESQUEMA)
+            self._migrar(conn)
+            conn.executescript(ESQUEMA_TITULARES)
+
+    def _conectar(self):
+        # Uma conexão por operação: seguro para as várias threads do Streamlit
+        return sqlite3.connect(self.caminho, timeout=30)
+
+    @staticmethod
+    def _migrar(conn):
+        """Banco de uma versão anterior: cria as colunas novas e as preenche a partir do JSON já gravado."""
+        existentes = {linha[1] for linha in conn.execute("PRAGMA table_info(faturas)")}
+        for nome, tipo, caminho in COLUNAS_NOVAS:
+            if nome not in existentes:
+                conn.execute(f"ALTER TABLE faturas ADD COLUMN {nome} {tipo}")
+                conn.execute(f"UPDATE faturas SET {nome} = COALESCE(json_extract(dados, ?), '')", (caminho,))
+
+    def salvar(self, dados: dict, grupo: str, hash_arquivo: str = None, versao_mapper: str = None) -> bool:
+        return self.salvar_varias([dados], grupo, [hash_arquivo], versao_mapper) == 1
+
+    def salvar_varias(self, registros, grupo: str, hashes=None, versao_mapper: str = None) -> int:
+        """Grava vários registros numa transação. Ignora faturas sem UC ou mês."""
+        hashes = hashes or [None] * len(registros)
+        linhas = []
+        for dados, hash_arquivo in zip(registros, hashes):
+            uc = dados.get("uc")
+            mes = dados.get("mes")
+            ano = ano_completo(dados.get("ano"))
+            if not uc or mes not in MESES or not ano:
+                continue
+            linhas.append((uc, grupo, ano, MESES.index(mes) + 1, hash_arquivo, versao_mapper,
+                           dados.get("titular") or "", dados.get("documento") or "",
+                           json.dumps(dados, ensure_ascii=False, default=serializar)))
+
+        with closing(self._conectar()) as conn, conn:
+            conn.executemany(
+                """INSERT INTO faturas (uc, grupo, ano, mes, hash, versao_mapper, titular, documento, dados)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (uc, grupo, ano, mes) DO UPDATE SET
+                       hash = excluded.hash,
+                       versao_mapper = excluded.versao_mapper,
+                       titular = excluded.titular,
+                       documento = excluded.documento,
+                       dados = excluded.dados,
+                       atualizado_em = CURRENT_TIMESTAMP""",
+                linhas,
+            )
+        return len(linhas)
+
+    def faturas_da_uc(self, uc: str, grupo: str = None, desde: tuple = None, ate: tuple = None) -> list:
+        """Todas as faturas de uma UC em ordem cronológica; desde/ate são (ano, mes_num)."""
+        sql = "SELECT dados FROM faturas WHERE uc = ?"
+        params = [uc]
+        if grupo:
+            sql += " AND grupo = ?"
+            params.append(grupo)
+        if desde:
+            sql += " AND (ano > ? OR (ano = ? AND mes >= ?))"
+            params += [desde[0], desde[0], desde[1]]
+        if ate:
+            sql += " AND (ano < ? OR (ano = ? AND mes <= ?))"
+            params += [ate[0], ate[0], ate[1]]
+        sql += " ORDER BY ano, mes"
+        with closing(self._conectar()) as conn:
+            return [json.loads(linha[0]) for linha in conn.execute(sql, params)]
+
+    def faturas_do_periodo(self, grupo: str, ano: int, mes: int = None) -> list:
+        sql = "SELECT dados FROM faturas WHERE grupo = ? AND ano = ?"
+        params = [grupo, ano]
+        if mes:
+            sql += " AND mes = ?"
+            params.append(mes)
+        sql += " ORDER BY uc, mes"
+        with closing(self._conectar()) as conn:
+            return [json.loads(linha[0]) for linha in conn.execute(sql, params)]
+
+    def ucs(self, grupo: str = None) -> list:
+        sql = "SELECT DISTINCT uc FROM faturas"
+        params = []
+        if grupo:
+            sql += " WHERE grupo = ?"
+            params.append(grupo)
+        with closing(self._conectar()) as conn:
+            return [linha[0] for linha in conn.execute(sql + " ORDER BY uc", params)]
+
+    def trocas_de_titularidade(self, grupo: str = None) -> list:
+        """
+        Toda competência em que o CNPJ/CPF da UC mudou em relação à fatura anterior dela:
+        [{'uc', 'grupo', 'ano', 'mes', 'titular', 'documento', 'titular_anterior',
+          'documento_anterior', 'ano_anterior', 'mes_anterior'}], por UC e competência.
+        Só colunas indexadas: o JSON das faturas não é lido.
+        """
+        sql = SQL_TITULARES.format(filtro="AND grupo = ?" if grupo else "")
+        sql = f"SELECT * FROM ({sql}) WHERE documento_anterior <> documento ORDER BY uc, grupo, ano, mes"
+        with closing(self._conectar()) as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(linha) for linha in conn.execute(sql, [grupo] if grupo else [])]
+
+    def historico_titulares(self, uc: str, grupo: str = None) -> list:
+        """
+        Titulares de uma UC em ordem, um período por titular e grupo:
+        [{'grupo', 'titular', 'documento', 'desde': (ano, mes), 'ate': (ano, mes), 'faturas'}].
+        """
+        sql = "SELECT grupo, ano, mes, titular, documento FROM faturas WHERE uc = ? AND documento <> ''"
+        params = [uc]
+        if grupo:
+            sql += " AND grupo = ?"
+            params.append(grupo)
+        periodos = []
+        with closing(self._conectar()) as conn:
+            for grupo_linha, ano, mes, titular, documento in conn.execute(sql + " ORDER BY grupo, ano, mes", params):
+                anterior = periodos[-1] if periodos else None
+                if anterior and anterior["grupo"] == grupo_linha and anterior["documento"] == documento:
+                    anterior["ate"] = (ano, mes)
+                    anterior["faturas"] += 1
+                else:
+                    periodos.append({"grupo": grupo_linha, "titular": titular, "documento": documento,
+                                     "desde": (ano, mes), "ate": (ano, mes), "faturas": 1})
+        return periodos
+
+    def faturas_sem_titular(self, grupo: str = None) -> int:
+        """Faturas gravadas sem CNPJ/CPF (mapper anterior à extração do titular): reprocessar para incluí-las."""
+        sql = "SELECT COUNT(*) FROM faturas WHERE COALESCE(documento, '') = ''"
+        params = []
+        if grupo:
+            sql += " AND grupo = ?"
+            params.append(grupo)
+        with closing(self._conectar()) as conn:
+            return conn.execute(sql, params).fetchone()[0]
+
+    def montar_dados_estruturados(self, grupo: str, geradoras, beneficiarias=(), desde=None, ate=None) -> list:
+        """
+        Monta a mesma estrutura que o app entrega aos writers
+        ([{'tipo', 'indice', 'dados'}]), direto do banco, a partir das UCs informadas.
+        """
+        estrutura = []
+        for tipo, ucs in (("geradora", geradoras), ("beneficiaria", beneficiarias)):
+            for indice, uc in enumerate(ucs, start=1):
+                estrutura.append({
+                    'tipo': tipo,
+                    'indice': indice,
+                    'dados': self.faturas_da_uc(uc, grupo, desde, ate),
+                })
+        return estrutura
@@ -0,0 +1,146 @@
+import re
+
+MESES = "JAN|FEV|MAR|ABR|MAI|JUN|JUL|AGO|SET|OUT|NOV|DEZ"
+
+# Tabela única de campos das faturas Equatorial (sempre sobre o texto normalizado).
+# Cada mapper escolhe quais campos usa; o padrão de cada campo é o mesmo que
+# era buscado individualmente com re.search.
+CAMPOS = {
+    # Comuns aos dois grupos
+    "uc_mes": rf"(\d{{7,}})\s+({MESES})/(\d{{4}})",
+    "endereco": r"ENDEREÇO DE ENTREGA:(.*?)(?:CEP:|$)",
+    # Titular: nome e CNPJ/CPF logo depois da linha de tensão ("... LIM MAX: 396,0 V NOME CNPJ/CPF: ...")
+    "titular": r"TENSÃO NOMINAL.*?\d K?V ([^:]+?) CNPJ/CPF:\s*([\d./-]+)",
+
+    # Grupo B (consumo único)
+    "datas_b": r"(\d{2}/\d{2}/\d{4})\s+(\d{2}/\d{2}/\d{4})\s+\d+\s+\d{2}/\d{2}/\d{4}",
+    "medidor_b": r"(\d{7,}-\d)\s+ENERGIA ATIVA - KWH ÚNICO\s+(\d+)\s+(\d+)",
+    "energia_ativa_b": r"ENERGIA ATIVA - KWH ÚNICO\s+\d+\s+\d+\s+[\d,]+\s+([\d,]+)",
+    "geracao_linha_b": r"ENERGIA GERAÇÃO - KWH ÚNICO\s+\d+\s+\d+\s+[\d,]+\s+([\d,]+)",
+    "scee_b": r"INFORMAÇÕES DO SCEE",
+    "total_b": r"TOTAL\s+([\d\.]+,\d{2})",
+    "historico_b": rf"({MESES})[\/\-](\d{{2,4}})\s+([\d\.,]+)",
+
+    # Bloco SCEE do Grupo B (buscado só na janela após "INFORMAÇÕES DO SCEE")
+    "geracao_scee_b": r"GERAÇÃO CICLO.*?UC\s+\d+\s*:\s*([\d,]+)",
+    "credito_scee_b": r"CRÉDITO RECEBIDO.*?([\d\.]+,\d{2})",
+    "saldo_scee_b": r"SALDO KWH\s*[:=]?\s*([\d\.]+,\d{2})",
+
+    # Grupo A (postos tarifários)
+    "datas_a": r"(\d{2}/\d{2}/\d{4})\s+(\d{2}/\d{2}/\d{4})",
+    "c_p": r"ENERGIA ATIVA - KWH PONTA\s+\d+\s+\d+\s+[\d,]+\s+([\d,]+)",
+    "c_fp": r"ENERGIA ATIVA - KWH FORA PONTA\s+\d+\s+\d+\s+[\d,]+\s+([\d,]+)",
+    "c_hr": r"ENERGIA ATIVA - KWH RESERVADO\s+\d+\s+\d+\s+[\d,]+\s+([\d,]+)",
+    "d_p": r"DEMANDA - KW PONTA\s+\d+\s+\d+\s+[\d,]+\s+([\d,]+)",
+    "d_fp": r"DEMANDA - KW FORA PONTA\s+\d+\s+\d+\s+[\d,]+\s+([\d,]+)",
+    "d_hr": r"DEMANDA - KW RESERVADO\s+\d+\s+\d+\s+[\d,]+\s+([\d,]+)",
+    "inj_p": r"ENERGIA GERAÇÃO-KWH PONTA\s+\d+\s+\d+\s+[\d,.]+\s+([\d,.]+)",
+    "inj_fp": r"ENERGIA GERAÇÃO-KWH FORA PONTA\s+\d+\s+\d+\s+[\d,.]+\s+([\d,.]+)",
+    "inj_hr": r"ENERGIA GERAÇÃO-KWH RESERVADO\s+\d+\s+\d+\s+[\d,.]+\s+([\d,.]+)",
+    "credito_a": r"CREDITO RECEBIDO KWH\s+([\d\.]+,\d{2})",
+    "saldo_a": r"SALDO KWH\s+P-([\d,.]+),\s+FP-([\d,.]+),\s+HR-([\d,.]+)",
+    "total_a": r"TOTAL A PAGAR\s+R\$\s*([\d\.]+,\d{2})",
+    "historico_a": rf"({MESES})\s*[\/\-]\s*(\d{{2}})((?:\s+[\d\.,]+){{7,9}})",
+
+    # Grupo tarifário (services/classificacao.py): linhas de medição e linha de classificação
+    "medicao_postos": r"ENERGIA ATIVA - KWH (?:FORA )?PONTA",
+    "medicao_unica": r"ENERGIA ATIVA - KWH ÚNICO",
+    "classificacao": r"CLASSIFICAÇÃO:\s*([AB])(?=\d|S\b|\s)",
+}
+
+PADROES = {nome: re.compile(padrao) for nome, padrao in CAMPOS.items()}
+
+
+class VarredorCampos:
+    """
+    Preenche numa chamada todos os campos de um grupo, com os padrões compilados na importação
+    (uma busca por campo sobre o texto, não uma varredura única: ver varrer).
+    - Campos simples: primeiro match (mesmo resultado de re.search).
+    - Campos repetidos: todos os matches sem sobreposição (mesmo resultado de re.findall).
+    """
+
+    def __init__(self, nomes, repetidos=()):
+        self.simples = {nome: PADROES[nome] for nome in nomes if nome not in repetidos}
+        self.repetidos = {nome: PADROES[nome] for nome in repetidos}
+
+    def varrer(self, texto: str) -> dict:
+        # Uma busca por campo: quase todos começam por um literal ("ENERGIA ATIVA",
+        # "TOTAL"...), que o re localiza com busca rápida. Juntar tudo numa
+        # alternação única desliga essa otimização e ficou ~3x mais lento.
+        encontrados = {nome: padrao.search(texto) for nome, padrao in self.simples.items()}
+        for nome, padrao in self.repetidos.items():
+            encontrados[nome] = list(padrao.finditer(texto))
+        return encontrados
+
+
+VARREDOR_B = VarredorCampos(
+    ["uc_mes", "endereco", "titular", "datas_b", "medidor_b", "energia_ativa_b",
+     "geracao_linha_b", "scee_b", "total_b", "historico_b"],
+    repetidos=("historico_b",),
+)
+VARREDOR_SCEE_B = VarredorCampos(["geracao_scee_b", "credito_scee_b", "saldo_scee_b"])
+
+VARREDOR_A = VarredorCampos(
+    ["uc_mes", "endereco", "titular", "datas_a", "c_p", "c_fp", "c_hr", "d_p", "d_fp", "d_hr",
+     "inj_p", "inj_fp", "inj_hr", "credito_a", "saldo_a", "total_a", "historico_a"],
+    repetidos=("historico_a",),
+)
+
+
+# Onde cada campo começa no índice espacial (services/indice_espacial.py):
+# (primeira palavra do rótulo ou formas da palavra-âncora, palavras antes dela, linhas da janela).
+# O padrão do campo roda só na janela da âncora, presa à linha dela: um valor não "vaza" de
+# outra coluna ou da linha de baixo, como acontece no texto corrido.
+COMPETENCIA = ("AAA/9999",)
+MES_ANO = ("AAA/99", "AAA/9999", "AAA-99", "AAA-9999", "AAA", "AAA/", "AAA-")
+ANCORAS = {
+    "uc_mes": (COMPETENCIA, 1, 1),
+    "endereco": ("ENDEREÇO", 0, 8),
+    "titular": ("TENSÃO", 0, 3),
+    "datas_b": (("99/99/9999",), 0, 1),
+    "medidor_b": ("ENERGIA", 1, 1),
+    "energia_ativa_b": ("ENERGIA", 0, 1),
+    "geracao_linha_b": ("ENERGIA", 0, 1),
+    "scee_b": ("INFORMAÇÕES", 0, 1),
+    "total_b": ("TOTAL", 0, 1),
+    "historico_b": (MES_ANO, 0, 1),
+    "datas_a": (("99/99/9999",), 0, 1),
+    "c_p": ("ENERGIA", 0, 1),
+    "c_fp": ("ENERGIA", 0, 1),
+    "c_hr": ("ENERGIA", 0, 1),
+    "d_p": ("DEMANDA", 0, 1),
+    "d_fp": ("DEMANDA", 0, 1),
+    "d_hr": ("DEMANDA", 0, 1),
+    "inj_p": ("ENERGIA", 0, 1),
+    "inj_fp": ("ENERGIA", 0, 1),
+    "inj_hr": ("ENERGIA", 0, 1),
+    "credito_a": ("CREDITO", 0, 1),
+    "saldo_a": ("SALDO", 0, 2),
+    "total_a": ("TOTAL", 0, 1),
+    "historico_a": (MES_ANO, 0, 1),
+}
+
+
+class VarredorLayout(VarredorCampos):
+    """
+    Mesmos campos e mesmos grupos de VarredorCampos, lidos do índice espacial: cada padrão
+    só é testado (com match) no início da janela de cada âncora, em vez de percorrer o texto todo.
+    """
+
+    def _candidatos(self, indice, nome):
+        ancora, antes, linhas = ANCORAS[nome]
+        posicoes = indice.ancora(ancora) if isinstance(ancora, str) else indice.com_forma(*ancora)
+        for i in posicoes:
+            yield indice.texto_linha(i, linhas, antes)
+
+    def varrer(self, indice) -> dict:
+        encontrados = {}
+        for nome, padrao in self.simples.items():
+            encontrados[nome] = next((m for m in map(padrao.match, self._candidatos(indice, nome)) if m), None)
+        for nome, padrao in self.repetidos.items():
+            encontrados[nome] = [m for m in map(padrao.match, self._candidatos(indice, nome)) if m]
+        return encontrados
+
+
+LAYOUT_B = VarredorLayout(VARREDOR_B.simples, VARREDOR_B.repetidos)
+LAYOUT_A = VarredorLayout(VARREDOR_A.simples, VARREDOR_A.repetidos)
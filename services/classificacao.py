@@ -0,0 +1,32 @@
+"""
+Grupo tarifário de uma fatura lido do próprio texto, para não depender da escolha do usuário
+(o mapper do grupo errado não falha: devolve zeros).
+
+    classificar_texto(texto)  # "A", "B" ou None
+
+Sinais, em ordem:
+- linhas de medição: energia ativa por posto tarifário ("KWH PONTA", "KWH FORA PONTA") é do
+  Grupo A e "KWH ÚNICO" do Grupo B. São as linhas que cada mapper lê, então decidem;
+- sem elas (ex.: só a primeira página lida), a linha "Classificação: B B1 ..." / "Classificação: A4 ...".
+Sem nenhum dos dois o grupo fica None: a fatura não é mapeada às cegas.
+"""
+from services.campos import PADROES
+from services.fatura_mapper import normalizar_texto
+
+# Grupo "automático" nas opções e nos modos de leitura (ver pipeline.mapear_pdfs_auto)
+GRUPO_AUTO = "auto"
+GRUPOS = ("A", "B")
+
+
+def classificar_texto(texto: str):
+    """Grupo ("A"/"B") da fatura pelo texto extraído (ou pelas linhas do índice espacial); None se não houver sinal."""
+    texto = normalizar_texto(texto or "")
+    postos = PADROES["medicao_postos"].search(texto)
+    unica = PADROES["medicao_unica"].search(texto)
+    if postos or unica:
+        # As duas no mesmo texto: vale a que aparece primeiro (a medição da própria fatura)
+        if postos and unica:
+            return "A" if postos.start() < unica.start() else "B"
+        return "A" if postos else "B"
+    m = PADROES["classificacao"].search(texto)
+    return m.group(1) if m else None
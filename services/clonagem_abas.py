@@ -0,0 +1,105 @@
+"""
+Cópia em lote das abas de UC (UC GERADORA / UC BENEF.) no preparo da planilha.
+
+    clonar_aba(wb, wb["UC BENEF. 1"], ["UC BENEF. 2", ..., "UC BENEF. 100"])
+
+- openpyxl: wb.copy_worksheet recria cada célula com cell(), copia o estilo com copy()
+  e refaz as bordas de todas as mesclagens (MergedCellRange.__copy__ soma Border a
+  Border na aba modelo a cada cópia). Aqui o modelo é lido uma única vez (ModeloAba):
+  cada cópia só instancia as células a partir da lista pronta, com o mesmo vetor de
+  estilo (os índices apontam para os mesmos fonts/fills/bordas do workbook) e as
+  mesclagens já com as bordas resolvidas no modelo.
+- ModeloAba usa estado interno do openpyxl (ws._cells/_current_row, Cell._value/_style,
+  MergedCellRange montado sem __init__), testado com as versões 3.1.x fixadas em
+  requirements.txt. Se uma versão não tiver esses atributos, clonar_aba volta para o
+  wb.copy_worksheet.
+- PlanilhaXML: a cópia já é só uma referência à parte XML do modelo; o XML limpo do
+  clone é montado uma vez por modelo no save (ver services/xlsx_patch.py).
+"""
+from copy import copy
+
+import openpyxl
+from openpyxl.cell.cell import Cell, MergedCell
+from openpyxl.worksheet.cell_range import CellRange, MultiCellRange
+from openpyxl.worksheet.merge import MergedCellRange
+
+
+def clone_direto_disponivel(ws) -> bool:
+    """O openpyxl instalado tem o estado interno que ModeloAba lê e escreve."""
+    return (isinstance(getattr(ws, "_cells", None), dict) and hasattr(ws, "_current_row")
+            and all(hasattr(Cell, nome) for nome in ("_value", "_style", "_hyperlink"))
+            and hasattr(MergedCell, "_style")
+            and all(hasattr(MergedCellRange, nome) for nome in ("min_row", "min_col")))
+
+
+class ModeloAba:
+    """Aba modelo lida uma vez; clonar(wb, titulo) cria cada cópia a partir dela."""
+
+    def __init__(self, ws):
+        self.ws = ws
+        # (linha, coluna, valor, tipo, estilo, hyperlink, comentário, mesclada)
+        self.celulas = [
+            (linha, coluna, celula._value, celula.data_type,
+             celula._style if celula.has_style else None,
+             celula.hyperlink, celula.comment, isinstance(celula, MergedCell))
+            for (linha, coluna), celula in ws._cells.items()
+        ]
+        self.mesclagens = [str(intervalo) for intervalo in ws.merged_cells.ranges]
+        self.ultima_linha = max((linha for linha, _ in ws._cells), default=0)
+
+    def clonar(self, wb, titulo):
+        ws = wb.create_sheet(titulo)
+        celulas = ws._cells
+        for linha, coluna, valor, tipo, estilo, hyperlink, comentario, mesclada in self.celulas:
+            if mesclada:
+                celula = MergedCell(ws, row=linha, column=coluna)
+                if estilo is not None:
+                    celula._style = copy(estilo)
+            else:
+                # Cell copia o vetor de estilo: mudar o formato de uma cópia não afeta as outras
+                celula = Cell(ws, row=linha, column=coluna, style_array=estilo)
+                celula._value = valor
+                celula.data_type = tipo
+            if hyperlink:
+                celula._hyperlink = copy(hyperlink)
+            if comentario:
+                celula.comment = copy(comentario)
+            celulas[(linha, coluna)] = celula
+        # O que ws.cell() atualizaria: sem isso iter_rows()/values veem a cópia vazia e append() grava na linha 1
+        ws._current_row = self.ultima_linha
+
+        # Mesmo conteúdo de WorksheetCopy, sem recalcular as bordas das mesclagens
+        ws.merged_cells = MultiCellRange()
+        for coord in self.mesclagens:
+            intervalo = MergedCellRange.__new__(MergedCellRange)
+            intervalo.ws = ws
+            CellRange.__init__(intervalo, range_string=coord)
+            intervalo.start_cell = ws.cell(row=intervalo.min_row, column=intervalo.min_col)
+            ws.merged_cells.add(intervalo)
+        for atributo in ("row_dimensions", "column_dimensions"):
+            origem, destino = getattr(self.ws, atributo), getattr(ws, atributo)
+            for chave, dimensao in origem.items():
+                destino[chave] = copy(dimensao)
+                destino[chave].worksheet = ws
+        ws.sheet_format = copy(self.ws.sheet_format)
+        ws.sheet_properties = copy(self.ws.sheet_properties)
+        ws.page_margins = copy(self.ws.page_margins)
+        ws.page_setup = copy(self.ws.page_setup)
+        ws.print_options = copy(self.ws.print_options)
+        return ws
+
+
+def clonar_aba(wb, ws_modelo, titulos) -> list:
+    """Cria, no fim do workbook, uma cópia de ws_modelo para cada título (na ordem)."""
+    if not titulos:
+        return []
+    if isinstance(wb, openpyxl.Workbook) and clone_direto_disponivel(ws_modelo):
+        modelo = ModeloAba(ws_modelo)
+        return [modelo.clonar(wb, titulo) for titulo in titulos]
+    # PlanilhaXML, ou openpyxl sem o estado interno esperado: cópia pela API pública
+    copias = []
+    for titulo in titulos:
+        copia = wb.copy_worksheet(ws_modelo)
+        copia.title = titulo
+        copias.append(copia)
+    return copias
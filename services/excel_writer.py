@@ -1,45 +1,40 @@
 import openpyxl
-from openpyxl.cell.cell import MergedCell
-import datetime 
+from services.indice_planilha import obter_indice
+from services.xlsx_patch import PlanilhaXML
+from services.clonagem_abas import clonar_aba
+from services.registros import FaturaB, como_fatura
+from services.linha_do_tempo import LinhaDoTempo
+from services.plano_escrita import PlanoEscrita, aplicar_plano
 
-def preparar_planilha(caminho_entrada, qtd_geradoras, qtd_beneficiarias):
-    wb = openpyxl.load_workbook(caminho_entrada)
+def preparar_planilha(caminho_entrada, qtd_geradoras, qtd_beneficiarias, motor="openpyxl"):
+    # motor "xml": injeta os valores direto no zip do modelo (ver services/xlsx_patch.py)
+    wb = PlanilhaXML(caminho_entrada) if motor == "xml" else openpyxl.load_workbook(caminho_entrada)
     
-    # Preparar Geradoras
+    # Preparar Geradoras (as cópias saem todas de uma vez, ver services/clonagem_abas.py)
     if "UC GERADORA" in wb.sheetnames:
-        ws_modelo_ger = wb["UC GERADORA"]
-        for i in range(qtd_geradoras):
-            nome_aba = f"UC GERADORA {i+1}" if i > 0 else "UC GERADORA"
-            if i == 0: ws_modelo_ger.title = nome_aba
-            else: 
-                nova = wb.copy_worksheet(ws_modelo_ger)
-                nova.title = nome_aba
+        clonar_aba(wb, wb["UC GERADORA"], [f"UC GERADORA {i+1}" for i in range(1, qtd_geradoras)])
 
     # Preparar Beneficiárias
     nome_modelo_benef = next((s for s in wb.sheetnames if "UC BENEF" in s.upper()), None)
     if nome_modelo_benef and qtd_beneficiarias > 0:
         ws_modelo_ben = wb[nome_modelo_benef]
-        for i in range(qtd_beneficiarias):
-            nome_aba = f"UC BENEF. {i+1}"
-            if i == 0: ws_modelo_ben.title = nome_aba
-            else: 
-                nova = wb.copy_worksheet(ws_modelo_ben)
-                nova.title = nome_aba
+        ws_modelo_ben.title = "UC BENEF. 1"
+        clonar_aba(wb, ws_modelo_ben, [f"UC BENEF. {i+1}" for i in range(1, qtd_beneficiarias)])
 
     return wb
 
-def safe_write(ws, col, row, value):
-    coord = f"{col}{row}"
-    cell = ws[coord]
-    if isinstance(cell, MergedCell):
-        for rng in ws.merged_cells.ranges:
-            if coord in rng:
-                ws[rng.start_cell.coordinate].value = value
-                return
-    else:
-        cell.value = value
+def salvar_dados_multiplos(wb, dados_estruturados, escrever_resumo=True):
+    """Planeja e grava de uma vez (ver planejar_dados_multiplos e services/plano_escrita.py)."""
+    return aplicar_plano(wb, planejar_dados_multiplos(wb, dados_estruturados, escrever_resumo))
 
-def salvar_dados_multiplos(wb, dados_estruturados):
+def planejar_dados_multiplos(wb, dados_estruturados, escrever_resumo=True) -> PlanoEscrita:
+    """
+    Células que as faturas de cada item ({'tipo', 'indice', 'dados'}) ocupam na aba da UC e no
+    RESUMO, sem gravar nada: do wb só são lidos os nomes das abas, a coluna A e as mesclagens.
+    escrever_resumo=False: o RESUMO fica como está (atualização de uma planilha já gerada).
+    Um item com 'historico': False não preenche os meses anteriores pelo histórico da fatura.
+    """
+    plano = PlanoEscrita(wb.sheetnames)
     mapa_meses = {
         "JAN": "Jan", "FEV": "Fev", "MAR": "Mar", "ABR": "Abr",
         "MAI": "Mai", "JUN": "Jun", "JUL": "Jul", "AGO": "Ago",
@@ -55,10 +50,14 @@ def salvar_dados_multiplos(wb, dados_estruturados):
         'medidor': 'R', 'leitura_med_ant': 'S', 'leitura_med_atual': 'T'
     }
 
+    # Índice por aba (linhas dos meses e células mescladas), montado uma vez
+    indices = {}
+
     for item in dados_estruturados:
         tipo = item['tipo']
         indice = item['indice']
         faturas = item['dados']
+        preencher_historico = item.get('historico', True)
         
         # Nome da aba
         if tipo == 'geradora':
@@ -79,63 +78,41 @@ def salvar_dados_multiplos(wb, dados_estruturados):
             }
         if nome_aba in wb.sheetnames:
             ws = wb[nome_aba]
+            indice = obter_indice(indices, ws)
+            celulas = plano.aba(nome_aba)
+
+            # Um valor por mês: fatura do mês ou, sem ela, o histórico mais novo (ver services/linha_do_tempo.py)
+            linha_tempo = LinhaDoTempo.de_faturas(faturas, FaturaB, com_historico=preencher_historico)
+            for mes in linha_tempo.por_mes_do_ano().values():
+                dados = mes.fatura
 
-            for dados in faturas:
                 # --- 1. DADOS DO MÊS ATUAL (DA FATURA) ---
-                mes_pdf = dados.get("mes", "")
-                if mes_pdf and mes_pdf in mapa_meses:
-                    mes_excel = mapa_meses[mes_pdf]
+                if dados is not None:
+                    mes_excel = mapa_meses[mes.sigla]
 
                     # Achar linha
-                    linha_destino = None
-                    for row in range(5, 40):
-                        celula = ws[f"A{row}"].value
-                        if celula and str(celula).strip() == mes_excel:
-                            linha_destino = row
-                            break
+                    linha_destino = indice.linha_texto(mes_excel, fim=40)
                         
                     if linha_destino:
                         # Preenche tudo
-                        ws[f"{cols['leitura_ant']}{linha_destino}"] = dados["data_leitura_anterior"]
-                        ws[f"{cols['leitura_atual']}{linha_destino}"] = dados["data_leitura_atual"]
-                        ws[f"{cols['geracao']}{linha_destino}"] = dados["energia_gerada"]
-                        ws[f"{cols_uso['credito']}{linha_destino}"] = dados["credito_recebido"]
-                        ws[f"{cols_uso['consumo']}{linha_destino}"] = dados["energia_ativa"]
-                        ws[f"{cols_uso['valor']}{linha_destino}"] = dados["valor_fatura"]
-                        ws[f"{col_saldo_atual}{linha_destino}"] = dados["saldo"] # P ou Q
-                        ws[f"{cols_uso['medidor']}{linha_destino}"] = dados["medidor"]
-                        ws[f"{cols_uso['leitura_med_ant']}{linha_destino}"] = dados["leitura_anterior"]
-                        ws[f"{cols_uso['leitura_med_atual']}{linha_destino}"] = dados["leitura_atual"]
+                        celulas[f"{cols['leitura_ant']}{linha_destino}"] = dados.data_leitura_anterior
+                        celulas[f"{cols['leitura_atual']}{linha_destino}"] = dados.data_leitura_atual
+                        celulas[f"{cols['geracao']}{linha_destino}"] = dados.energia_gerada
+                        celulas[f"{cols_uso['credito']}{linha_destino}"] = dados.credito_recebido
+                        celulas[f"{cols_uso['consumo']}{linha_destino}"] = dados.energia_ativa
+                        celulas[f"{cols_uso['valor']}{linha_destino}"] = dados.valor_fatura
+                        celulas[f"{col_saldo_atual}{linha_destino}"] = dados.saldo # P ou Q
+                        celulas[f"{cols_uso['medidor']}{linha_destino}"] = dados.medidor
+                        celulas[f"{cols_uso['leitura_med_ant']}{linha_destino}"] = dados.leitura_anterior
+                        celulas[f"{cols_uso['leitura_med_atual']}{linha_destino}"] = dados.leitura_atual
 
                 # --- 2. PREENCHIMENTO RETROATIVO (HISTÓRICO) ---
                 # Útil se enviou apenas 1 fatura e quer preencher os consumos anteriores
-                if "historico" in dados and dados["historico"]:
-                    for hist in dados["historico"]:
-                        mes_hist = hist['mes']
-                        linha_hist = None
-                        for row in range(5, 45):
-                            cell_val = ws[f"A{row}"].value
-                            if not cell_val: continue
-                            mes_comparacao = ""
-                            # Se a célula for Data (comum no Excel), extraímos o mês dela
-                            if isinstance(cell_val, (datetime.datetime, datetime.date)):
-                                # Mapeia o número do mês (1-12) para a sigla (JAN-DEZ)
-                                siglas = ["JAN", "FEV", "MAR", "ABR", "MAI", "JUN", "JUL", "AGO", "SET", "OUT", "NOV", "DEZ"]
-                                mes_comparacao = siglas[cell_val.month - 1]
-                            else:
-                                # Se for texto ("Jan", "Janeiro"), normalizamos para comparar
-                                texto_cell = str(cell_val).strip().upper()
-                                for sigla, nome_mapa in mapa_meses.items():
-                                    if sigla in texto_cell or nome_mapa.upper() in texto_cell:
-                                        mes_comparacao = sigla
-                                        break
-                            if mes_comparacao == mes_hist:
-                                linha_hist = row
-                                break
-                        # Preenche o consumo se achar a linha e não for o mês da fatura atual
-                        if linha_hist and mes_hist != dados.get("mes"):
-                            col_cons = cols_uso['consumo']
-                            ws[f"{col_cons}{linha_hist}"] = hist['consumo']
+                else:
+                    # Aceita datas ("Jan" como data do Excel) e textos ("Jan", "Janeiro")
+                    linha_hist = indice.linha_sigla(mes.sigla)
+                    if linha_hist:
+                        celulas[f"{cols_uso['consumo']}{linha_hist}"] = mes.valores["consumo"]
                                                 
     # --- 3. RESUMO (UC e Endereço) ---
     ws_resumo = None
@@ -144,22 +121,23 @@ def salvar_dados_multiplos(wb, dados_estruturados):
             ws_resumo = wb[sheet]
             break
     
-    if ws_resumo:
+    if ws_resumo and escrever_resumo:
+        indice_resumo = obter_indice(indices, ws_resumo)
         linha_atual = 7
         # Geradoras
         for item in dados_estruturados:
             if item['tipo'] == 'geradora' and item['dados']:
-                dados_ref = item['dados'][0]
-                safe_write(ws_resumo, "F", linha_atual, dados_ref.get("uc", ""))
-                safe_write(ws_resumo, "G", linha_atual, dados_ref.get("endereco", ""))
+                dados_ref = como_fatura(item['dados'][0], FaturaB)
+                plano.escrever(ws_resumo.title, indice_resumo.ancora(f"F{linha_atual}"), dados_ref.uc)
+                plano.escrever(ws_resumo.title, indice_resumo.ancora(f"G{linha_atual}"), dados_ref.endereco)
                 linha_atual += 1
         
         # Beneficiárias
         for item in dados_estruturados:
             if item['tipo'] == 'beneficiaria' and item['dados']:
-                dados_ref = item['dados'][0]
-                safe_write(ws_resumo, "F", linha_atual, dados_ref.get("uc", ""))
-                safe_write(ws_resumo, "G", linha_atual, dados_ref.get("endereco", ""))
+                dados_ref = como_fatura(item['dados'][0], FaturaB)
+                plano.escrever(ws_resumo.title, indice_resumo.ancora(f"F{linha_atual}"), dados_ref.uc)
+                plano.escrever(ws_resumo.title, indice_resumo.ancora(f"G{linha_atual}"), dados_ref.endereco)
                 linha_atual += 1
                 
-    return wb
\ No newline at end of file
+    return plano
@@ -1,117 +1,118 @@
 import openpyxl
-from openpyxl.cell.cell import MergedCell
-import datetime
+from services.indice_planilha import obter_indice
+from services.xlsx_patch import PlanilhaXML
+from services.clonagem_abas import clonar_aba
+from services.registros import FaturaA, como_fatura
+from services.linha_do_tempo import LinhaDoTempo
+from services.plano_escrita import PlanoEscrita, aplicar_plano
 
-def preparar_planilha(caminho_entrada, qtd_geradoras, qtd_beneficiarias):
+def preparar_planilha(caminho_entrada, qtd_geradoras, qtd_beneficiarias, motor="openpyxl"):
     """Prepara o workbook duplicando as abas de modelo."""
-    wb = openpyxl.load_workbook(caminho_entrada)
+    # motor "xml": injeta os valores direto no zip do modelo (ver services/xlsx_patch.py)
+    wb = PlanilhaXML(caminho_entrada) if motor == "xml" else openpyxl.load_workbook(caminho_entrada)
     
-    # Preparar Geradoras
+    # Preparar Geradoras (as cópias saem todas de uma vez, ver services/clonagem_abas.py)
     if "UC GERADORA" in wb.sheetnames:
-        ws_modelo_ger = wb["UC GERADORA"]
-        for i in range(qtd_geradoras):
-            nome_aba = f"UC GERADORA {i+1}" if i > 0 else "UC GERADORA"
-            if i == 0: ws_modelo_ger.title = nome_aba
-            else:
-                nova = wb.copy_worksheet(ws_modelo_ger)
-                nova.title = nome_aba
+        clonar_aba(wb, wb["UC GERADORA"], [f"UC GERADORA {i+1}" for i in range(1, qtd_geradoras)])
 
     # Preparar Beneficiárias
     nome_modelo_benef = next((s for s in wb.sheetnames if "UC BENEF" in s.upper()), None)
     if nome_modelo_benef and qtd_beneficiarias > 0:
         ws_modelo_ben = wb[nome_modelo_benef]
-        for i in range(qtd_beneficiarias):
-            nome_aba = f"UC BENEF. {i+1}"
-            if i == 0: ws_modelo_ben.title = nome_aba
-            else:
-                nova = wb.copy_worksheet(ws_modelo_ben)
-                nova.title = nome_aba
+        ws_modelo_ben.title = "UC BENEF. 1"
+        clonar_aba(wb, ws_modelo_ben, [f"UC BENEF. {i+1}" for i in range(1, qtd_beneficiarias)])
     return wb
 
-def safe_write(ws, col, row, value):
-    """Escreve em células, tratando corretamente células mescladas."""
-    coord = f"{col}{row}"
-    cell = ws[coord]
-    if isinstance(cell, MergedCell):
-        for rng in ws.merged_cells.ranges:
-            if coord in rng:
-                ws[rng.start_cell.coordinate].value = value
-                return
-    else:
-        cell.value = value
+def salvar_dados_A(wb, dados_estruturados, balanco=None, escrever_resumo=True):
+    """Planeja e grava de uma vez (ver planejar_dados_A e services/plano_escrita.py)."""
+    return aplicar_plano(wb, planejar_dados_A(wb, dados_estruturados, balanco, escrever_resumo))
 
-def salvar_dados_A(wb, dados_estruturados):
-    """Mapeia os dados para as abas individuais, dimensionamento e resumo."""
-    
-    meses_map = {"JAN": 1, "FEV": 2, "MAR": 3, "ABR": 4, "MAI": 5, "JUN": 6, 
-                 "JUL": 7, "AGO": 8, "SET": 9, "OUT": 10, "NOV": 11, "DEZ": 12}
+def planejar_dados_A(wb, dados_estruturados, balanco=None, escrever_resumo=True) -> PlanoEscrita:
+    """
+    Células dos dados nas abas individuais, dimensionamento e resumo, sem gravar nada
+    (do wb só são lidos os nomes das abas, a coluna A e as mesclagens).
+    balanco: frame de services.balanco.calcular_balanco; quando vem, o consumo total
+    (P + FP + HR) é lido dele em vez de somado fatura a fatura.
+    escrever_resumo=False: o RESUMO fica como está (atualização de uma planilha já gerada).
+    """
+    plano = PlanoEscrita(wb.sheetnames)
+    consumos = None
+    if balanco is not None:
+        # Só quando o frame vem: importar o writer não carrega o pandas
+        from services.balanco import valores_por_item
+        consumos = valores_por_item(balanco, "consumo", len(dados_estruturados))
 
     nome_aba_geral = next((s for s in wb.sheetnames if "GRUPO A" in s.upper()), "GRUPO A")
     ws_geral = wb[nome_aba_geral] if nome_aba_geral in wb.sheetnames else None
 
-    for item in dados_estruturados:
+    # Índice por aba (linhas dos meses e células mescladas), montado uma vez
+    indices = {}
+    indice_geral = obter_indice(indices, ws_geral) if ws_geral else None
+    celulas_geral = plano.aba(ws_geral.title) if ws_geral else None
+
+    for item_idx, item in enumerate(dados_estruturados):
         tipo, indice, faturas = item['tipo'], item['indice'], item['dados']
         nome_aba_uc = "UC GERADORA" if tipo == 'geradora' and indice == 1 else (f"UC GERADORA {indice}" if tipo == 'geradora' else f"UC BENEF. {indice}")
         ws_uc = wb[nome_aba_uc] if nome_aba_uc in wb.sheetnames else None
+        indice_uc = obter_indice(indices, ws_uc) if ws_uc else None
+        celulas_uc = plano.aba(nome_aba_uc) if ws_uc else None
 
-        for dados in faturas:
-            mes_num = meses_map.get(dados.get("mes"))
-            if not mes_num: continue
+        # Uma fatura por mês (a de competência mais nova), ver services/linha_do_tempo.py
+        linha_tempo = LinhaDoTempo.de_faturas(faturas, FaturaA, com_historico=False)
+        for mes_num, mes in linha_tempo.por_mes_do_ano().items():
+            dados, posicao = mes.fatura, mes.posicao
 
             # --- 1. ABA DIMENSIONAMENTO GERAL ---
             if ws_geral:
-                for row in range(5, 25):
-                    celula = ws_geral[f"A{row}"].value
-                    if isinstance(celula, datetime.datetime) and celula.month == mes_num:
-                        # Dados consumo 
-                        ws_geral[f"B{row}"] = dados.get("c_p", 0.0)
-                        ws_geral[f"C{row}"] = dados.get("c_fp", 0.0)
-                        ws_geral[f"D{row}"] = dados.get("c_hr", 0.0)
-                        # Dados demanda 
-                        ws_geral[f"M{row}"] = dados.get("d_p", 0.0)
-                        ws_geral[f"N{row}"] = dados.get("d_fp", 0.0)
-                        ws_geral[f"O{row}"] = dados.get("d_hr", 0.0)
-                        break
+                row = indice_geral.linha_data(mes_num, fim=25)
+                if row:
+                    # Dados consumo 
+                    celulas_geral[f"B{row}"] = dados.c_p
+                    celulas_geral[f"C{row}"] = dados.c_fp
+                    celulas_geral[f"D{row}"] = dados.c_hr
+                    # Dados demanda 
+                    celulas_geral[f"M{row}"] = dados.d_p
+                    celulas_geral[f"N{row}"] = dados.d_fp
+                    celulas_geral[f"O{row}"] = dados.d_hr
 
             # --- 2. ABAS INDIVIDUAIS (Parte Amarela) ---
             if ws_uc:
-                for row in range(5, 45):
-                    celula = ws_uc[f"A{row}"].value
-                    if isinstance(celula, datetime.datetime) and celula.month == mes_num:
-                        ws_uc[f"B{row}"] = dados.get("data_leitura_anterior")
-                        ws_uc[f"C{row}"] = dados.get("data_leitura_atual")
-                        c_total = dados.get("c_p", 0) + dados.get("c_fp", 0) + dados.get("c_hr", 0)
+                row = indice_uc.linha_data(mes_num)
+                if row:
+                    celulas_uc[f"B{row}"] = dados.data_leitura_anterior
+                    celulas_uc[f"C{row}"] = dados.data_leitura_atual
+                    c_total = consumos[item_idx][posicao] if consumos else dados.c_p + dados.c_fp + dados.c_hr
 
-                        if tipo == 'geradora':
-                            ws_uc[f"I{row}"] = dados.get("energia_gerada", 0.0)
-                            ws_uc[f"J{row}"] = dados.get("credito_recebido", 0.0)
-                            ws_uc[f"N{row}"] = dados.get("valor_fatura", 0.0)
-                            ws_uc[f"P{row}"] = dados.get("saldo", 0.0)
-                        else:
-                            ws_uc[f"F{row}"] = c_total
-                            ws_uc[f"H{row}"] = dados.get("credito_recebido", 0.0)
-                            ws_uc[f"J{row}"] = dados.get("valor_fatura", 0.0)
-                            ws_uc[f"Q{row}"] = dados.get("saldo", 0.0)
-                        break
+                    if tipo == 'geradora':
+                        celulas_uc[f"I{row}"] = dados.energia_gerada
+                        celulas_uc[f"J{row}"] = dados.credito_recebido
+                        celulas_uc[f"N{row}"] = dados.valor_fatura
+                        celulas_uc[f"P{row}"] = dados.saldo
+                    else:
+                        celulas_uc[f"F{row}"] = c_total
+                        celulas_uc[f"H{row}"] = dados.credito_recebido
+                        celulas_uc[f"J{row}"] = dados.valor_fatura
+                        celulas_uc[f"Q{row}"] = dados.saldo
 
     # --- 3. RESUMO (UC e Endereço) ---
     ws_resumo = next((wb[s] for s in wb.sheetnames if "RESUMO" in s.upper()), None)
-    if ws_resumo:
+    if ws_resumo and escrever_resumo:
+        indice_resumo = obter_indice(indices, ws_resumo)
         linha_atual = 7
         # Geradoras
         for item in dados_estruturados:
             if item['tipo'] == 'geradora' and item['dados']:
-                dados_ref = item['dados'][0]
-                safe_write(ws_resumo, "F", linha_atual, dados_ref.get("uc", ""))
-                safe_write(ws_resumo, "G", linha_atual, dados_ref.get("endereco", ""))
+                dados_ref = como_fatura(item['dados'][0], FaturaA)
+                plano.escrever(ws_resumo.title, indice_resumo.ancora(f"F{linha_atual}"), dados_ref.uc)
+                plano.escrever(ws_resumo.title, indice_resumo.ancora(f"G{linha_atual}"), dados_ref.endereco)
                 linha_atual += 1
         
         # Beneficiárias
         for item in dados_estruturados:
             if item['tipo'] == 'beneficiaria' and item['dados']:
-                dados_ref = item['dados'][0]
-                safe_write(ws_resumo, "F", linha_atual, dados_ref.get("uc", ""))
-                safe_write(ws_resumo, "G", linha_atual, dados_ref.get("endereco", ""))
+                dados_ref = como_fatura(item['dados'][0], FaturaA)
+                plano.escrever(ws_resumo.title, indice_resumo.ancora(f"F{linha_atual}"), dados_ref.uc)
+                plano.escrever(ws_resumo.title, indice_resumo.ancora(f"G{linha_atual}"), dados_ref.endereco)
                 linha_atual += 1
                 
-    return wb
\ No newline at end of file
+    return plano
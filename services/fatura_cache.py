@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+from services.registros import serializar
+
+
+def hash_pdf(conteudo: bytes) -> str:
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+def hash_arquivo(arquivo, tamanho_bloco=1 << 20) -> str:
+    """Mesmo hash de hash_pdf, lendo um arquivo aberto em blocos (sem copiar o conteúdo todo)."""
+    h = hashlib.sha256()
+    arquivo.seek(0)
+    for bloco in iter(lambda: arquivo.read(tamanho_bloco), b""):
+        h.update(bloco)
+    arquivo.seek(0)
+    return h.hexdigest()
+
+
+def chave_texto(hash_arquivo: str, modo: str = "") -> str:
+    """Texto extraído depende do PDF e do modo de leitura (completa, lazy, recortes)."""
+    return f"texto-{modo}-{hash_arquivo}" if modo else f"texto-{hash_arquivo}"
+
+
+def chave_dados(hash_arquivo: str, grupo: str, versao_mapper: str, modo: str = "") -> str:
+    """Registro mapeado depende do PDF, do grupo, da versão do mapper e do modo de leitura."""
+    return f"dados-{grupo}-{versao_mapper}-{modo}-{hash_arquivo}" if modo else f"dados-{grupo}-{versao_mapper}-{hash_arquivo}"
+
+
+def chave_grupo(hash_arquivo: str) -> str:
+    """Grupo tarifário classificado pelo texto: depende só do PDF."""
+    return f"grupo-{hash_arquivo}"
+
+
+class CacheFaturas:
+    """
+    Cache em dois níveis para texto e dados das faturas:
+    - memória: LRU limitado por quantidade de itens;
+    - disco: um JSON por chave, com despejo dos mais antigos ao passar do limite em MB.
+    """
+
+    def __init__(self, pasta=".cache_faturas", max_itens_memoria=512, max_disco_mb=256):
+        self.pasta = pasta
+        self.max_itens_memoria = max_itens_memoria
+        self.max_disco_bytes = int(max_disco_mb * 1024 * 1024)
+        self._memoria = OrderedDict()
+        self.acertos_memoria = 0
+        self.acertos_disco = 0
+        self.faltas = 0
+        self._bytes_disco = 0
+        if self.pasta:
+            os.makedirs(self.pasta, exist_ok=True)
+            self._bytes_disco = sum(tamanho for _, tamanho, _ in self._arquivos_disco())
+
+    def _caminho(self, chave):
+        return os.path.join(self.pasta, f"{chave}.json")
+
+    def _guardar_memoria(self, chave, valor):
+        self._memoria[chave] = valor
+        self._memoria.move_to_end(chave)
+        while len(self._memoria) > self.max_itens_memoria:
+            self._memoria.popitem(last=False)
+
+    def get(self, chave):
+        if chave in self._memoria:
+            self._memoria.move_to_end(chave)
+            self.acertos_memoria += 1
+            return self._memoria[chave]
+
+        if self.pasta:
+            caminho = self._caminho(chave)
+            try:
+                with open(caminho, "r", encoding="utf-8") as f:
+                    valor = json.load(f)
+                os.utime(caminho)  # marca como usado recentemente
+            except (OSError, ValueError):
+                valor = None
+            if valor is not None:
+                self.acertos_disco += 1
+                self._guardar_memoria(chave, valor)
+                return valor
+
+        self.faltas += 1
+        return None
+
+    def set(self, chave, valor):
+        self._guardar_memoria(chave, valor)
+        if not self.pasta:
+            return
+        caminho = self._caminho(chave)
+        # Outro processo pode despejar a chave a qualquer momento: o tamanho vem dos bytes gravados
+        try:
+            anterior = os.path.getsize(caminho)
+        except OSError:
+            anterior = 0
+        conteudo = json.dumps(valor, ensure_ascii=False, default=serializar).encode("utf-8")
+        temporario = f"{caminho}.{os.getpid()}.tmp"  # vários processos podem gravar a mesma chave
+        with open(temporario, "wb") as f:
+            f.write(conteudo)
+        os.replace(temporario, caminho)
+        self._bytes_disco += len(conteudo) - anterior
+        if self._bytes_disco > self.max_disco_bytes:
+            self._despejar_disco()
+
+    def _arquivos_disco(self):
+        arquivos = []
+        for nome in os.listdir(self.pasta):
+            if not nome.endswith(".json"):
+                continue
+            caminho = os.path.join(self.pasta, nome)
+            try:
+                info = os.stat(caminho)
+            except OSError:
+                continue
+            arquivos.append((info.st_mtime, info.st_size, caminho))
+        return arquivos
+
+    def _despejar_disco(self):
+        """Remove os arquivos menos usados até caber no limite de disco."""
+        arquivos = self._arquivos_disco()
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        for _, tamanho, caminho in sorted(arquivos):
+            if total <= self.max_disco_bytes:
+                break
+            try:
+                os.remove(caminho)
+            except OSError:
+                continue
+            total -= tamanho
+        self._bytes_disco = total
+
+    def limpar(self):
+        self._memoria.clear()
+        if self.pasta:
+            for nome in os.listdir(self.pasta):
+                if nome.endswith(".json"):
+                    os.remove(os.path.join(self.pasta, nome))
+            self._bytes_disco = 0
+
+    def estatisticas(self) -> dict:
+        return {
+            "acertos_memoria": self.acertos_memoria,
+            "acertos_disco": self.acertos_disco,
+            "faltas": self.faltas,
+            "itens_memoria": len(self._memoria),
+        }
@@ -1,4 +1,10 @@
-import re
+from services.campos import PADROES, VARREDOR_B, VARREDOR_SCEE_B, LAYOUT_B
+from services.registros import FaturaB, Historico
+
+# Incrementar sempre que a lógica de extração mudar (invalida o cache de faturas)
+VERSAO = "2"
+
+PADRAO_HISTORICO = PADROES["historico_b"]
 
 def normalizar_numero_br(valor: str) -> float:
     if not valor:
@@ -12,52 +18,65 @@ def normalizar_numero_br(valor: str) -> float:
 def normalizar_texto(texto: str) -> str:
     return " ".join(texto.upper().split())
 
-def extrair_historico_consumo(texto: str) -> list:
-    """
-    Busca o bloco de histórico (Ex: NOV/24 230) para preencher meses passados.
-    Retorna lista: [{'mes': 'NOV', 'ano': 24, 'kwh': 230.0}, ...]
-    """
-    historico = []
-    # Regex para capturar: MES/ANO (2 digitos) espaço NUMERO (kWh)
-    # Ex: DEZ/24 518
-    padrao = r"(JAN|FEV|MAR|ABR|MAI|JUN|JUL|AGO|SET|OUT|NOV|DEZ)[\/\-](\d{2,4})\s+([\d\.,]+)"
-    
-    matches = re.findall(padrao, texto)
-    
+def _montar_historico(matches) -> Historico:
+    historico = Historico(FaturaB.GRANDEZAS_HISTORICO)
     for mes, ano, kwh in matches:
         consumo = normalizar_numero_br(kwh)
         if consumo > 0:
-            historico.append({
-                "mes": mes.upper(),
-                "ano": int(ano),
-                "consumo": consumo
-        })
+            historico.adicionar(mes.upper(), int(ano), consumo=consumo)
     return historico
 
-def extrair_fatura(texto: str) -> dict:
-    dados = {}
+def extrair_historico_consumo(texto: str) -> Historico:
+    """
+    Busca o bloco de histórico (Ex: NOV/24 230) para preencher meses passados.
+    Retorna um Historico (services/registros.py) com a série 'consumo' (kWh > 0);
+    cada item dele é {'mes': 'NOV', 'ano': 24, 'consumo': 230.0}.
+    """
+    # Regex para capturar: MES/ANO (2 ou 4 digitos) espaço NUMERO (kWh)
+    # Ex: DEZ/24 518
+    return _montar_historico(PADRAO_HISTORICO.findall(texto))
+
+def extrair_fatura(texto: str) -> FaturaB:
     texto = normalizar_texto(texto)
+    # Todos os campos do grupo numa chamada, com os padrões já compilados (ver services/campos.py)
+    campos = VARREDOR_B.varrer(texto)
+    m_scee = campos["scee_b"]
+    bloco = VARREDOR_SCEE_B.varrer(texto[m_scee.start() : m_scee.start() + 1000]) if m_scee else None
+    return montar_fatura(campos, bloco)
+
+def extrair_fatura_layout(indice) -> FaturaB:
+    """Mesma fatura, com cada campo lido na linha da sua âncora (ver IndiceEspacial)."""
+    campos = LAYOUT_B.varrer(indice)
+    posicoes = indice.ancora("INFORMAÇÕES DO SCEE")
+    bloco = VARREDOR_SCEE_B.varrer(indice.texto_desde(posicoes[0], 1000)[:1000]) if posicoes else None
+    return montar_fatura(campos, bloco)
+
+def montar_fatura(campos: dict, bloco: dict = None) -> FaturaB:
+    """FaturaB a partir dos campos varridos e do bloco SCEE (None se não houver)."""
+    dados = {}
 
     # --- 1. MÊS E ANO ATUAL ---
-    m = re.search(r"(\d{7,})\s+(JAN|FEV|MAR|ABR|MAI|JUN|JUL|AGO|SET|OUT|NOV|DEZ)/(\d{4})", texto)
+    m = campos["uc_mes"]
     dados["uc"] = m.group(1) if m else ""
     dados["mes"] = m.group(2) if m else ""
     dados["ano"] = int(m.group(3)) if m else 0
 
     # --- 2. ENDEREÇO ---
-    if "ENDEREÇO DE ENTREGA:" in texto:
-        trecho = texto.split("ENDEREÇO DE ENTREGA:", 1)[1]
-        dados["endereco"] = trecho.split("CEP:", 1)[0].strip()
-    else:
-        dados["endereco"] = ""
+    m = campos["endereco"]
+    dados["endereco"] = m.group(1).strip() if m else ""
+
+    # Titular (nome e CNPJ/CPF): base da detecção de troca de titularidade
+    m_tit = campos["titular"]
+    dados["titular"] = m_tit.group(1).strip() if m_tit else ""
+    dados["documento"] = m_tit.group(2) if m_tit else ""
 
     # --- 3. DATAS ---
-    m = re.search(r"(\d{2}/\d{2}/\d{4})\s+(\d{2}/\d{2}/\d{4})\s+\d+\s+\d{2}/\d{2}/\d{4}", texto)
+    m = campos["datas_b"]
     dados["data_leitura_anterior"] = m.group(1) if m else ""
     dados["data_leitura_atual"] = m.group(2) if m else ""
 
     # --- 4. MEDIDOR ---
-    m = re.search(r"(\d{7,}-\d)\s+ENERGIA ATIVA - KWH ÚNICO\s+(\d+)\s+(\d+)", texto)
+    m = campos["medidor_b"]
     if m:
         dados["medidor"] = m.group(1)
         dados["leitura_anterior"] = int(m.group(2))
@@ -69,7 +88,7 @@ def extrair_fatura(texto: str) -> dict:
 
     # --- 5. ENERGIA ATIVA (Consumo Atual) ---
     dados["energia_ativa"] = 0.0
-    m_ativa = re.search(r"ENERGIA ATIVA - KWH ÚNICO\s+\d+\s+\d+\s+[\d,]+\s+([\d,]+)", texto)
+    m_ativa = campos["energia_ativa_b"]
     if m_ativa:
         dados["energia_ativa"] = normalizar_numero_br(m_ativa.group(1))
 
@@ -79,37 +98,34 @@ def extrair_fatura(texto: str) -> dict:
     dados["saldo"] = 0.0
 
     # Tenta geração na linha
-    m_geracao_linha = re.search(r"ENERGIA GERAÇÃO - KWH ÚNICO\s+\d+\s+\d+\s+[\d,]+\s+([\d,]+)", texto)
+    m_geracao_linha = campos["geracao_linha_b"]
     if m_geracao_linha:
         dados["energia_gerada"] = normalizar_numero_br(m_geracao_linha.group(1))
     
     # Bloco SCEE
-    idx_scee = texto.find("INFORMAÇÕES DO SCEE")
-    if idx_scee != -1:
-        bloco_busca = texto[idx_scee : idx_scee + 1000]
-        
+    if bloco:
         # Fallback Geração
         if dados["energia_gerada"] == 0:
-            m_ger_scee = re.search(r"GERAÇÃO CICLO.*?UC\s+\d+\s*:\s*([\d,]+)", bloco_busca)
+            m_ger_scee = bloco["geracao_scee_b"]
             if m_ger_scee:
                 dados["energia_gerada"] = normalizar_numero_br(m_ger_scee.group(1))
         
         # Crédito
-        m_credito = re.search(r"CRÉDITO RECEBIDO.*?([\d\.]+,\d{2})", bloco_busca)
+        m_credito = bloco["credito_scee_b"]
         if m_credito:
             dados["credito_recebido"] = normalizar_numero_br(m_credito.group(1))
 
         # Saldo (com regex robusta para pontos e vírgulas)
-        m_saldo = re.search(r"SALDO KWH\s*[:=]?\s*([\d\.]+,\d{2})", bloco_busca)
+        m_saldo = bloco["saldo_scee_b"]
         if m_saldo:
             dados["saldo"] = normalizar_numero_br(m_saldo.group(1))
 
     # --- 7. VALOR ---
-    m = re.search(r"TOTAL\s+([\d\.]+,\d{2})", texto)
+    m = campos["total_b"]
     dados["valor_fatura"] = normalizar_numero_br(m.group(1)) if m else 0.0
 
     # --- 8. HISTÓRICO DE CONSUMO (NOVO) ---
     # Extrai lista de consumos passados para caso seja enviado apenas 1 PDF
-    dados["historico"] = extrair_historico_consumo(texto)
+    dados["historico"] = _montar_historico(m.groups() for m in campos["historico_b"])
 
-    return dados
\ No newline at end of file
+    return FaturaB(**dados)
\ No newline at end of file
@@ -0,0 +1,347 @@
+"""
+Fila local de processamento (SQLite + pasta em disco), sem broker externo.
+
+    fila = FilaJobs()
+    job_id = fila.submeter("usuario", modelo, itens, opcoes, descricao="Cliente X")
+    ExecutorFila(fila, max_jobs=2, limite_por_dono=1).iniciar()
+    fila.jobs_do_dono("usuario")
+
+- Cada job ganha uma pasta com o modelo e os PDFs no mesmo formato do processamento em
+  lote (geradora_N/, beneficiaria_N/), então roda com services.lote.processar_cliente.
+- Os jobs rodam em processos separados (um por job, no máximo max_jobs ao mesmo tempo),
+  fora da execução do Streamlit; progresso e resultado ficam no banco.
+- limite_por_dono: quantos jobs de um mesmo usuário podem rodar juntos. Entre os pendentes,
+  sai primeiro o de quem tem menos jobs rodando, então uma carteira enorme não segura a fila.
+- Cada executor tem um id e renova o batimento dos jobs que reservou; só volta para a fila o
+  job 'executando' cujo batimento parou (executor que caiu), nunca o de um executor vivo.
+"""
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+
+from services.lote import listar_clientes, processar_cliente
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    dono TEXT NOT NULL,
+    descricao TEXT,
+    estado TEXT NOT NULL DEFAULT 'pendente',
+    pasta TEXT NOT NULL,
+    opcoes TEXT NOT NULL,
+    progresso REAL NOT NULL DEFAULT 0,
+    mensagem TEXT,
+    resultado TEXT,
+    criado_em TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    iniciado_em TEXT,
+    concluido_em TEXT,
+    executor TEXT,
+    batimento TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_estado ON jobs (estado, id);
+CREATE INDEX IF NOT EXISTS idx_jobs_dono ON jobs (dono, id);
+"""
+
+# Próximo pendente cujo dono ainda está abaixo do limite; quem tem menos jobs rodando vem antes
+SQL_PROXIMO = """
+SELECT j.id FROM jobs j
+LEFT JOIN (SELECT dono, COUNT(*) AS rodando FROM jobs WHERE estado = 'executando' GROUP BY dono) r
+       ON r.dono = j.dono
+WHERE j.estado = 'pendente' AND COALESCE(r.rodando, 0) < ?
+ORDER BY COALESCE(r.rodando, 0), j.id
+LIMIT 1
+"""
+
+ESTADOS_FINAIS = ("concluido", "erro", "cancelado")
+
+# Colunas que bancos de versões anteriores não têm: (nome, tipo)
+COLUNAS_NOVAS = [("executor", "TEXT"), ("batimento", "TEXT")]
+
+# Segundos entre batimentos de um executor e sem batimento até o job ser dado como interrompido
+INTERVALO_BATIMENTO = 10
+PRAZO_BATIMENTO = 60
+
+# Executores iniciados neste processo, por banco (o app roda o script a cada rerun)
+_EXECUTORES = {}
+_TRAVA_EXECUTORES = threading.Lock()
+
+# Carregados uma vez no processo servidor (forkserver); cada job já nasce com eles importados
+MODULOS_JOB = ["services.lote", "services.pipeline", "services.pdf_extractor", "pdfplumber", "openpyxl"]
+
+
+def _nome_seguro(nome: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_ ." else "_" for c in nome).strip() or "cliente"
+
+
+class FilaJobs:
+    """Jobs guardados em SQLite; os arquivos de cada job ficam em pasta/<uuid>/."""
+
+    def __init__(self, caminho="jobs.db", pasta=".jobs"):
+        self.caminho = caminho
+        self.pasta = pasta
+        os.makedirs(pasta, exist_ok=True)
+        with closing(self._conectar()) as conn, conn:
+            conn.executescript(ESQUEMA)
+            self._migrar(conn)
+
+    @staticmethod
+    def _migrar(conn):
+        """Banco de uma versão anterior: cria as colunas novas."""
+        existentes = {linha[1] for linha in conn.execute("PRAGMA table_info(jobs)")}
+        for nome, tipo in COLUNAS_NOVAS:
+            if nome not in existentes:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {nome} {tipo}")
+
+    def _conectar(self):
+        # Uma conexão por operação: seguro para as threads do Streamlit e os processos dos jobs
+        conn = sqlite3.connect(self.caminho, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _como_dict(linha):
+        job = dict(linha)
+        job["opcoes"] = json.loads(job["opcoes"])
+        job["resultado"] = json.loads(job["resultado"]) if job["resultado"] else None
+        return job
+
+    def submeter(self, dono: str, modelo, itens, opcoes: dict, descricao: str = "") -> int:
+        """
+        Grava os arquivos do job e o coloca na fila.
+        modelo: bytes da planilha modelo ou, no grupo automático, {grupo: bytes}.
+        itens: [{'tipo', 'indice', 'arquivos': [(nome, conteudo_bytes), ...]}]
+        opcoes: as mesmas de processar_cliente (grupo, motor, leitura_lazy, cache, banco...);
+        modelo(s) e saida são definidos aqui, dentro da pasta do job.
+        """
+        pasta_job = os.path.join(self.pasta, uuid.uuid4().hex)
+        cliente = _nome_seguro(descricao or "cliente")
+        os.makedirs(pasta_job)
+        for item in itens:
+            pasta_uc = os.path.join(pasta_job, cliente, f"{item['tipo']}_{item['indice']}")
+            os.makedirs(pasta_uc, exist_ok=True)
+            for ordem, (nome, conteudo) in enumerate(item['arquivos']):
+                # O prefixo mantém a ordem do upload (listar_clientes ordena por nome)
+                with open(os.path.join(pasta_uc, f"{ordem:04d}_{_nome_seguro(nome)}"), "wb") as f:
+                    f.write(conteudo)
+        modelos = modelo if isinstance(modelo, dict) else {"": modelo}
+        caminhos = {}
+        for grupo, conteudo in modelos.items():
+            caminhos[grupo] = os.path.join(pasta_job, f"modelo_{grupo}.xlsx" if grupo else "modelo.xlsx")
+            with open(caminhos[grupo], "wb") as f:
+                f.write(conteudo)
+        opcoes = {**opcoes, "modelo": next(iter(caminhos.values())), "saida": pasta_job,
+                  "modelos": {grupo: caminho for grupo, caminho in caminhos.items() if grupo}}
+
+        with closing(self._conectar()) as conn, conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (dono, descricao, pasta, opcoes) VALUES (?, ?, ?, ?)",
+                (dono, descricao, pasta_job, json.dumps(opcoes, ensure_ascii=False)))
+            return cursor.lastrowid
+
+    def reservar(self, limite_por_dono: int = 1, executor: str = None):
+        """
+        Marca o próximo job elegível como 'executando' do executor e o devolve (None se não houver).
+        O batimento começa agora; o executor o renova com bater() enquanto o job roda.
+        """
+        with closing(self._conectar()) as conn:
+            conn.isolation_level = None
+            conn.execute("BEGIN IMMEDIATE")  # trava a escrita: dois executores não pegam o mesmo job
+            try:
+                linha = conn.execute(SQL_PROXIMO, (limite_por_dono,)).fetchone()
+                if linha is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute("UPDATE jobs SET estado = 'executando', iniciado_em = CURRENT_TIMESTAMP, "
+                             "mensagem = 'Iniciando', executor = ?, batimento = CURRENT_TIMESTAMP "
+                             "WHERE id = ?", (executor, linha["id"]))
+                job = conn.execute("SELECT * FROM jobs WHERE id = ?", (linha["id"],)).fetchone()
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return self._como_dict(job)
+
+    def atualizar_progresso(self, job_id: int, progresso: float, mensagem: str = None):
+        with closing(self._conectar()) as conn, conn:
+            conn.execute("UPDATE jobs SET progresso = ?, mensagem = COALESCE(?, mensagem) "
+                         "WHERE id = ? AND estado = 'executando'", (progresso, mensagem, job_id))
+
+    def finalizar(self, job_id: int, estado: str, resultado=None, mensagem: str = None):
+        with closing(self._conectar()) as conn, conn:
+            conn.execute("UPDATE jobs SET estado = ?, resultado = ?, mensagem = ?, "
+                         "progresso = CASE WHEN ? = 'concluido' THEN 1 ELSE progresso END, "
+                         "concluido_em = CURRENT_TIMESTAMP WHERE id = ?",
+                         (estado, json.dumps(resultado, ensure_ascii=False) if resultado is not None else None,
+                          mensagem, estado, job_id))
+
+    def cancelar(self, job_id: int, dono: str) -> bool:
+        """Só jobs ainda pendentes podem ser cancelados."""
+        with closing(self._conectar()) as conn, conn:
+            cursor = conn.execute("UPDATE jobs SET estado = 'cancelado', concluido_em = CURRENT_TIMESTAMP "
+                                  "WHERE id = ? AND dono = ? AND estado = 'pendente'", (job_id, dono))
+            return cursor.rowcount == 1
+
+    def remover(self, job_id: int, dono: str) -> bool:
+        """Apaga um job finalizado e seus arquivos."""
+        job = self.job(job_id)
+        if not job or job["dono"] != dono or job["estado"] not in ESTADOS_FINAIS:
+            return False
+        with closing(self._conectar()) as conn, conn:
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        shutil.rmtree(job["pasta"], ignore_errors=True)
+        return True
+
+    def bater(self, executor: str, job_ids) -> int:
+        """Renova o batimento dos jobs que o executor está rodando."""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return 0
+        marcadores = ", ".join("?" * len(job_ids))
+        with closing(self._conectar()) as conn, conn:
+            return conn.execute(f"UPDATE jobs SET batimento = CURRENT_TIMESTAMP WHERE estado = 'executando' "
+                                f"AND executor = ? AND id IN ({marcadores})", (executor, *job_ids)).rowcount
+
+    def recuperar_interrompidos(self, prazo: float = PRAZO_BATIMENTO) -> int:
+        """
+        Jobs cujo executor caiu voltam para a fila: 'executando' sem batimento há mais de prazo
+        segundos. Os de executores vivos (no app ou no processar_fila.py) continuam onde estão.
+        """
+        with closing(self._conectar()) as conn, conn:
+            return conn.execute("UPDATE jobs SET estado = 'pendente', progresso = 0, mensagem = 'Reenfileirado', "
+                                "executor = NULL, batimento = NULL WHERE estado = 'executando' "
+                                "AND (batimento IS NULL OR batimento < datetime('now', ?))",
+                                (f"-{prazo} seconds",)).rowcount
+
+    def job(self, job_id: int):
+        with closing(self._conectar()) as conn:
+            linha = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._como_dict(linha) if linha else None
+
+    def jobs_do_dono(self, dono: str, limite: int = 50) -> list:
+        with closing(self._conectar()) as conn:
+            linhas = conn.execute("SELECT * FROM jobs WHERE dono = ? ORDER BY id DESC LIMIT ?", (dono, limite))
+            return [self._como_dict(linha) for linha in linhas]
+
+    def posicao_na_fila(self, job_id: int) -> int:
+        """Quantos jobs pendentes foram enviados antes deste."""
+        with closing(self._conectar()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE estado = 'pendente' AND id < ?",
+                                (job_id,)).fetchone()[0]
+
+
+def executar_job(caminho_banco: str, pasta: str, job_id: int):
+    """Roda num processo do executor: processa o cliente do job e grava o resultado na fila."""
+    fila = FilaJobs(caminho_banco, pasta)
+    job = fila.job(job_id)
+    opcoes = job["opcoes"]
+    clientes = listar_clientes(job["pasta"])
+    if not clientes:
+        fila.finalizar(job_id, "erro", mensagem="Nenhum PDF no job")
+        return
+
+    def ao_progresso(concluidos, total):
+        etapa = "Gravando a planilha" if concluidos == total - 1 else f"Lendo faturas {concluidos}/{total - 1}"
+        fila.atualizar_progresso(job_id, concluidos / total, etapa)
+
+    (cliente, itens), = clientes.items()
+    resultado = processar_cliente(cliente, itens, opcoes, ao_progresso=ao_progresso)
+    if resultado["status"] == "erro":
+        fila.finalizar(job_id, "erro", resultado, resultado.get("erro"))
+    else:
+        falhas = len(resultado["falhas_pdf"])
+        fila.finalizar(job_id, "concluido", resultado,
+                       f"{resultado['faturas']} faturas" + (f", {falhas} PDFs com erro" if falhas else ""))
+
+
+class ExecutorFila:
+    """
+    Pega jobs da fila e os roda num pool de processos. Pode viver dentro do app
+    (st.cache_resource) ou num processo próprio (processar_fila.py).
+    """
+
+    def __init__(self, fila: FilaJobs, max_jobs: int = 2, limite_por_dono: int = 1, intervalo: float = 1.0):
+        self.fila = fila
+        self.id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.max_jobs = max_jobs
+        self.limite_por_dono = limite_por_dono
+        self.intervalo = intervalo
+        self.rodando = {}  # job_id -> Future
+        self._parar = threading.Event()
+        self._thread = None
+        self._pool = None
+        self._ultimo_batimento = 0.0
+
+    def iniciar(self):
+        if self._thread is None:
+            self.fila.recuperar_interrompidos()
+            # forkserver: os processos dos jobs não são copiados deste, que tem outras threads
+            # usando o SQLite (um fork no meio de uma consulta herda a trava e o job não sai do lugar).
+            # Onde não há forkserver (Windows), spawn: também não copia o processo, só não pré-carrega
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                contexto = multiprocessing.get_context("forkserver")
+                contexto.set_forkserver_preload(MODULOS_JOB)
+            else:
+                contexto = multiprocessing.get_context("spawn")
+            self._pool = ProcessPoolExecutor(max_workers=self.max_jobs, mp_context=contexto)
+            self._thread = threading.Thread(target=self.executar, name="executor-fila", daemon=True)
+            self._thread.start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+    def _recolher(self):
+        for job_id, futuro in list(self.rodando.items()):
+            if not futuro.done():
+                continue
+            del self.rodando[job_id]
+            erro = futuro.exception()
+            if erro is not None:
+                # Falha fora de processar_cliente (ex.: o processo do job morreu)
+                self.fila.finalizar(job_id, "erro", mensagem=f"{type(erro).__name__}: {erro}")
+
+    def _bater(self):
+        """A cada INTERVALO_BATIMENTO: renova os jobs deste executor e recupera os de executores que caíram."""
+        agora = time.monotonic()
+        if agora - self._ultimo_batimento < INTERVALO_BATIMENTO:
+            return
+        self._ultimo_batimento = agora
+        self.fila.bater(self.id, self.rodando)
+        self.fila.recuperar_interrompidos()
+
+    def executar(self):
+        """Laço do despachante: completa os slots livres a cada intervalo."""
+        while not self._parar.is_set():
+            self._recolher()
+            self._bater()
+            while len(self.rodando) < self.max_jobs:
+                job = self.fila.reservar(self.limite_por_dono, self.id)
+                if job is None:
+                    break
+                self.rodando[job["id"]] = self._pool.submit(executar_job, self.fila.caminho, self.fila.pasta,
+                                                         job["id"])
+            self._parar.wait(self.intervalo)
+
+
+def executor_do_processo(fila: FilaJobs, **opcoes) -> ExecutorFila:
+    """
+    Inicia o executor da fila uma vez por processo e banco; as chamadas seguintes (reruns,
+    "Clear cache" do Streamlit) devolvem o que já está rodando.
+    """
+    chave = os.path.abspath(fila.caminho)
+    with _TRAVA_EXECUTORES:
+        if chave not in _EXECUTORES:
+            _EXECUTORES[chave] = ExecutorFila(fila, **opcoes).iniciar()
+        return _EXECUTORES[chave]
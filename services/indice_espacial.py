@@ -0,0 +1,148 @@
+"""
+Índice espacial das palavras de um PDF (uma chamada de extract_words por página).
+
+    indice = extrair_indice_pdf(conteudo)   # services/pdf_extractor.py
+    for i in indice.ancora("TOTAL"):
+        indice.texto_linha(i)              # "TOTAL 141,32 5,73 120,42 22,88"
+    indice.na_regiao(0, 40, 700, 300, 760)  # palavras dentro da caixa
+
+- As palavras ficam na ordem de leitura (página, linha, x) e agrupadas em linhas pela
+  posição vertical (mesma tolerância de 3 pt do extract_text do pdfplumber).
+- Âncoras: dicionário palavra -> posições e forma -> posições ("DEZ/2025" tem a forma
+  "AAA/9999"), então achar um rótulo ou todas as datas não percorre o texto.
+- Regiões: os topos das linhas de cada página ficam ordenados; uma caixa é resolvida
+  com bisect (O(log n)) mais as palavras das linhas que ela cobre.
+- de_texto monta o mesmo índice a partir de texto já extraído (uma linha por linha,
+  x = coluna do caractere), usado quando só o texto está no cache.
+"""
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+TOLERANCIA_LINHA = 3
+PONTUACAO = ":;,."
+
+
+def forma(palavra: str) -> str:
+    """Letras viram A e dígitos 9; o resto fica ("DEZ/2025" -> "AAA/9999")."""
+    return "".join("9" if c.isdigit() else "A" if c.isalpha() else c for c in palavra)
+
+
+class IndiceEspacial:
+    def __init__(self, palavras):
+        """palavras: (texto, pagina, x0, topo, x1, base), em qualquer ordem."""
+        ordenadas = sorted(palavras, key=lambda p: (p[1], p[3], p[2]))
+
+        # Agrupa em linhas: uma palavra entra na linha atual se o topo estiver na tolerância
+        linhas = []
+        for palavra in ordenadas:
+            atual = linhas[-1] if linhas else None
+            if atual and atual[0][1] == palavra[1] and palavra[3] - atual[0][3] <= TOLERANCIA_LINHA:
+                atual.append(palavra)
+            else:
+                linhas.append([palavra])
+
+        self.textos = []    # palavra em maiúsculas, na ordem de leitura
+        self.caixas = []    # (pagina, x0, topo, x1, base)
+        self.linha_de = []  # linha de cada palavra
+        self.linhas = []    # (inicio, fim) das palavras de cada linha
+        self._topos = defaultdict(list)         # pagina -> topo de cada linha (crescente)
+        self._linhas_pagina = defaultdict(list)  # pagina -> número de cada linha
+        self._por_texto = defaultdict(list)     # palavra sem pontuação final ("SCEE:" -> "SCEE")
+        self._por_forma = defaultdict(list)
+        for n, linha in enumerate(linhas):
+            linha.sort(key=lambda p: p[2])
+            inicio = len(self.textos)
+            for texto, pagina, x0, topo, x1, base in linha:
+                i = len(self.textos)
+                texto = texto.upper()
+                self.textos.append(texto)
+                self.caixas.append((pagina, x0, topo, x1, base))
+                self.linha_de.append(n)
+                self._por_texto[texto.rstrip(PONTUACAO) or texto].append(i)
+                self._por_forma[forma(texto)].append(i)
+            self.linhas.append((inicio, len(self.textos)))
+            self._topos[linha[0][1]].append(min(p[3] for p in linha))
+            self._linhas_pagina[linha[0][1]].append(n)
+
+    def __len__(self):
+        return len(self.textos)
+
+    @classmethod
+    def de_texto(cls, texto: str):
+        """Índice a partir do texto: linha k tem topo 10*k e cada palavra x = sua coluna."""
+        palavras = []
+        for k, linha in enumerate(texto.splitlines()):
+            coluna = 0
+            for palavra in linha.split():
+                coluna = linha.index(palavra, coluna)
+                palavras.append((palavra, 0, coluna, 10 * k, coluna + len(palavra), 10 * k + 8))
+                coluna += len(palavra)
+        return cls(palavras)
+
+    def como_texto(self) -> str:
+        """Uma linha de texto por linha do índice (mesma forma que o app extrai)."""
+        return "\n".join(" ".join(self.textos[inicio:fim]) for inicio, fim in self.linhas)
+
+    # --- âncoras ---
+    def ancora(self, rotulo: str) -> list:
+        """Posições onde as palavras do rótulo aparecem em sequência (ignora ":" e afins no fim)."""
+        partes = rotulo.upper().split()
+        if not partes:
+            return []
+        k = len(partes)
+        return [i for i in self._por_texto.get(partes[0], ())
+                if [t.rstrip(PONTUACAO) or t for t in self.textos[i:i + k]] == partes]
+
+    def com_forma(self, *formas) -> list:
+        """Posições das palavras com alguma das formas, na ordem de leitura."""
+        posicoes = [i for f in formas for i in self._por_forma.get(f, ())]
+        return sorted(posicoes) if len(formas) > 1 else posicoes
+
+    # --- texto em volta de uma palavra ---
+    def fim_da_linha(self, i: int, linhas: int = 1) -> int:
+        """Posição logo depois da última palavra da linha de i (ou das linhas-1 seguintes)."""
+        ultima = min(self.linha_de[i] + linhas - 1, len(self.linhas) - 1)
+        return self.linhas[ultima][1]
+
+    def texto_linha(self, i: int, linhas: int = 1, antes: int = 0) -> str:
+        """Texto de i (ou de `antes` palavras antes) até o fim da linha (ou de mais linhas)."""
+        return " ".join(self.textos[max(i - antes, 0):self.fim_da_linha(i, linhas)])
+
+    def texto_desde(self, i: int, max_caracteres: int) -> str:
+        """Texto na ordem de leitura a partir de i, com pelo menos max_caracteres (se houver)."""
+        partes, total = [], 0
+        for texto in self.textos[i:]:
+            if total >= max_caracteres:
+                break
+            partes.append(texto)
+            total += len(texto) + 1
+        return " ".join(partes)
+
+    # --- consultas por posição ---
+    def na_regiao(self, pagina: int, x0: float, topo: float, x1: float, base: float) -> list:
+        """Palavras inteiramente dentro da caixa, na ordem de leitura."""
+        topos = self._topos.get(pagina, [])
+        linhas = self._linhas_pagina.get(pagina, [])
+        # Linhas cujo topo está na faixa; a palavra mais alta de uma linha fica até 3 pt abaixo do topo dela
+        primeira = bisect_left(topos, topo - TOLERANCIA_LINHA)
+        ultima = bisect_right(topos, base)
+        encontradas = []
+        for n in linhas[primeira:ultima]:
+            inicio, fim = self.linhas[n]
+            for i in range(inicio, fim):
+                _, px0, ptopo, px1, pbase = self.caixas[i]
+                if px0 >= x0 and px1 <= x1 and ptopo >= topo and pbase <= base:
+                    encontradas.append(i)
+        return encontradas
+
+    def a_direita(self, i: int, distancia: float = None) -> list:
+        """Palavras da mesma linha à direita de i (até `distancia` pontos, se informada)."""
+        _, _, _, x1, _ = self.caixas[i]
+        _, fim = self.linhas[self.linha_de[i]]
+        return [j for j in range(i + 1, fim)
+                if distancia is None or self.caixas[j][1] - x1 <= distancia]
+
+    def abaixo(self, i: int, altura: float, margem: float = 0.0) -> list:
+        """Palavras logo abaixo de i, na faixa horizontal dela (com `margem` para os lados)."""
+        pagina, x0, _, x1, base = self.caixas[i]
+        return self.na_regiao(pagina, x0 - margem, base, x1 + margem, base + altura)
@@ -0,0 +1,91 @@
+import datetime
+
+from openpyxl.utils import get_column_letter
+
+SIGLAS = ["JAN", "FEV", "MAR", "ABR", "MAI", "JUN", "JUL", "AGO", "SET", "OUT", "NOV", "DEZ"]
+
+
+class IndicePlanilha:
+    """
+    Índice de uma aba, montado uma única vez por escrita:
+    - linha de cada mês na coluna A (por texto exato, por sigla ou por data);
+    - âncora de cada célula mesclada.
+    Assim os writers não precisam reler a coluna A nem percorrer as mesclagens a cada escrita.
+    """
+
+    def __init__(self, ws, linha_inicio=5, linha_fim=45):
+        self.ws = ws
+        self.linha_inicio = linha_inicio
+        self.linha_fim = linha_fim
+        # Cada parte é montada na primeira consulta (ler a coluna A cria as
+        # células no openpyxl, o que não deve acontecer em abas como o RESUMO)
+        self._por_texto = None   # texto da célula (strip) -> primeira linha
+        self._por_sigla = None   # "JAN".."DEZ" (texto ou data) -> primeira linha
+        self._por_data = None    # mês 1-12 de células datetime -> primeira linha
+        self._ancoras = None     # célula mesclada (exceto a âncora) -> âncora
+
+    def _indexar_meses(self):
+        self._por_texto, self._por_sigla, self._por_data = {}, {}, {}
+        for row in range(self.linha_inicio, self.linha_fim):
+            valor = self.ws[f"A{row}"].value
+            if not valor:
+                continue
+            if isinstance(valor, (datetime.datetime, datetime.date)):
+                sigla = SIGLAS[valor.month - 1]
+                if isinstance(valor, datetime.datetime):
+                    self._por_data.setdefault(valor.month, row)
+            else:
+                texto = str(valor).strip()
+                self._por_texto.setdefault(texto, row)
+                texto = texto.upper()
+                sigla = next((s for s in SIGLAS if s in texto), None)
+            if sigla:
+                self._por_sigla.setdefault(sigla, row)
+
+    def _indexar_mescladas(self):
+        self._ancoras = {}
+        for rng in self.ws.merged_cells.ranges:
+            ancora = f"{get_column_letter(rng.min_col)}{rng.min_row}"
+            for row, col in rng.cells:
+                coord = f"{get_column_letter(col)}{row}"
+                if coord != ancora:
+                    self._ancoras[coord] = ancora
+
+    @staticmethod
+    def _limitar(linha, fim):
+        return linha if linha is not None and (fim is None or linha < fim) else None
+
+    def linha_texto(self, texto, fim=None):
+        """Primeira linha cuja coluna A é exatamente o texto (ex.: "Jan")."""
+        if self._por_texto is None:
+            self._indexar_meses()
+        return self._limitar(self._por_texto.get(texto), fim)
+
+    def linha_sigla(self, sigla, fim=None):
+        """Primeira linha do mês, aceitando datas, "Jan", "Janeiro", "JAN/25"..."""
+        if self._por_sigla is None:
+            self._indexar_meses()
+        return self._limitar(self._por_sigla.get(sigla), fim)
+
+    def linha_data(self, mes_num, fim=None):
+        """Primeira linha cuja coluna A é uma data (datetime) do mês informado."""
+        if self._por_data is None:
+            self._indexar_meses()
+        return self._limitar(self._por_data.get(mes_num), fim)
+
+    def ancora(self, coord):
+        if self._ancoras is None:
+            self._indexar_mescladas()
+        return self._ancoras.get(coord, coord)
+
+    def escrever(self, col, row, value):
+        """Grava direto na aba; células mescladas gravam na âncora."""
+        self.ws[self.ancora(f"{col}{row}")].value = value
+
+
+def obter_indice(indices, ws, **kwargs):
+    """Devolve o índice da aba, criando na primeira vez (indices é um dict por título)."""
+    indice = indices.get(ws.title)
+    if indice is None or indice.ws is not ws:
+        indice = indices[ws.title] = IndicePlanilha(ws, **kwargs)
+    return indice
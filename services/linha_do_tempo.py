@@ -0,0 +1,93 @@
+"""
+Linha do tempo de uma UC: todas as faturas e os históricos delas num único valor por (ano, mês).
+
+    linha = LinhaDoTempo.de_faturas(faturas, FaturaB)
+    for mes_num, mes in linha.por_mes_do_ano().items():
+        mes.fatura      # fatura do próprio mês (ou None: só há o valor do histórico)
+        mes.valores     # {"consumo": ...} do histórico, quando não há fatura do mês
+
+Precedência num mesmo (ano, mês):
+- a fatura do próprio mês vence qualquer entrada de histórico de outra fatura;
+- entre duas faturas do mês, ou entre dois históricos, vence a fatura de competência
+  mais nova (empate: a que veio depois na lista).
+As abas têm uma linha por mês (Jan..Dez), então por_mes_do_ano entrega o ano mais
+recente de cada mês: o writer recebe exatamente um valor por célula.
+"""
+from services.banco_faturas import ano_completo
+from services.registros import MESES, como_fatura
+
+
+class MesDaLinha:
+    """Um (ano, mês) resolvido: a fatura do mês ou os valores de um histórico."""
+    __slots__ = ("ano", "mes_num", "fatura", "posicao", "valores")
+
+    def __init__(self, ano, mes_num, fatura=None, posicao=None, valores=None):
+        self.ano = ano
+        self.mes_num = mes_num
+        self.fatura = fatura      # registro do próprio mês
+        self.posicao = posicao    # posição da fatura na lista (para os valores do balanço)
+        self.valores = valores    # grandezas do histórico, quando não há fatura do mês
+
+    @property
+    def sigla(self) -> str:
+        return MESES[self.mes_num - 1]
+
+    def __repr__(self):
+        origem = f"fatura #{self.posicao}" if self.fatura is not None else f"histórico {self.valores}"
+        return f"MesDaLinha({self.sigla}/{self.ano}, {origem})"
+
+
+_NUM_MES = {sigla: n for n, sigla in enumerate(MESES, start=1)}
+
+
+def _mes_num(sigla) -> int:
+    return _NUM_MES.get(sigla, 0)
+
+
+class LinhaDoTempo:
+    def __init__(self):
+        self.meses = {}  # (ano, mes_num) -> MesDaLinha
+
+    @classmethod
+    def de_faturas(cls, faturas, tipo, com_historico=True):
+        """
+        Monta a linha do tempo a partir dos registros (ou dicts do cache/banco) de uma UC.
+        com_historico=False: só as faturas de cada mês (o histórico delas é ignorado).
+        """
+        registros = []
+        for posicao, dados in enumerate(faturas):
+            dados = como_fatura(dados, tipo)
+            registros.append(((ano_completo(dados.ano), _mes_num(dados.mes), posicao), dados))
+        # Da fatura de maior prioridade para a de menor: o primeiro valor de cada (ano, mês) fica
+        registros.sort(key=lambda registro: registro[0], reverse=True)
+
+        linha = cls()
+        meses = linha.meses
+        for (ano, mes_num, posicao), dados in registros:
+            if mes_num and (ano, mes_num) not in meses:
+                meses[(ano, mes_num)] = MesDaLinha(ano, mes_num, fatura=dados, posicao=posicao)
+        if not com_historico:
+            return linha
+
+        # Histórico só depois de todas as faturas: mês com fatura própria não o consulta
+        for _, dados in registros:
+            historico = dados.historico
+            series = None
+            for i, (ano, mes_num) in enumerate(historico.competencias()):
+                chave = (ano_completo(ano), mes_num)
+                if chave in meses:
+                    continue
+                if series is None:
+                    series = [(nome, historico.serie(nome)) for nome in historico.grandezas]
+                meses[chave] = MesDaLinha(chave[0], mes_num, valores={nome: serie[i] for nome, serie in series})
+        return linha
+
+    def __len__(self):
+        return len(self.meses)
+
+    def por_mes_do_ano(self) -> dict:
+        """{mês 1-12: MesDaLinha do ano mais recente daquele mês}, em ordem de mês."""
+        por_mes = {}
+        for (ano, mes_num), mes in sorted(self.meses.items()):
+            por_mes[mes_num] = mes
+        return dict(sorted(por_mes.items()))
@@ -0,0 +1,207 @@
+"""
+Processamento de um cliente inteiro a partir de pastas de PDFs (geradora_N / beneficiaria_N).
+Usado pela linha de comando (processar_lote.py), pela fila de processamento
+(services/fila_jobs.py) e pela página de carteira (vários clientes num ZIP).
+"""
+import os
+import re
+import time
+import traceback
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from services.pipeline import (MAPPERS, mapear_pdfs, mapear_pdfs_auto, mesclar_com_banco, planejar_planilha,
+                               separar_por_grupo, quantidades_de_abas)
+from services.classificacao import GRUPO_AUTO
+from services.fatura_cache import CacheFaturas
+from services.banco_faturas import BancoFaturas
+
+RE_PASTA_UC = re.compile(r"^(geradora|beneficiaria)_(\d+)$", re.IGNORECASE)
+
+
+def listar_clientes(raiz):
+    """{cliente: [{'tipo', 'indice', 'arquivos'}]} a partir das pastas geradora_N / beneficiaria_N."""
+    clientes = {}
+    for cliente in sorted(os.listdir(raiz)):
+        pasta_cliente = os.path.join(raiz, cliente)
+        if not os.path.isdir(pasta_cliente):
+            continue
+        itens = []
+        for nome in sorted(os.listdir(pasta_cliente)):
+            m = RE_PASTA_UC.match(nome)
+            pasta_uc = os.path.join(pasta_cliente, nome)
+            if not m or not os.path.isdir(pasta_uc):
+                continue
+            arquivos = sorted(os.path.join(pasta_uc, f) for f in os.listdir(pasta_uc) if f.lower().endswith(".pdf"))
+            itens.append({'tipo': m.group(1).lower(), 'indice': int(m.group(2)), 'arquivos': arquivos})
+        if itens:
+            itens.sort(key=lambda item: (item['tipo'] != 'geradora', item['indice']))
+            clientes[cliente] = itens
+    return clientes
+
+
+def modelo_do_cliente(raiz, cliente):
+    """Planilha modelo própria do cliente (um .xlsx na pasta dele), ou None para usar a comum."""
+    pasta_cliente = os.path.join(raiz, cliente)
+    modelos = sorted(f for f in os.listdir(pasta_cliente)
+                     if f.lower().endswith(".xlsx") and not f.startswith("~$"))
+    return os.path.join(pasta_cliente, modelos[0]) if modelos else None
+
+
+def localizar_raiz(pasta):
+    """Desce por pastas únicas (ex.: ZIP com 'carteira/' por fora) até achar as pastas dos clientes."""
+    while not listar_clientes(pasta):
+        subpastas = [os.path.join(pasta, p) for p in os.listdir(pasta)
+                     if os.path.isdir(os.path.join(pasta, p)) and not p.startswith(("__MACOSX", "."))]
+        if len(subpastas) != 1:
+            break
+        pasta = subpastas[0]
+    return pasta
+
+
+def modelo_do_grupo(opcoes, grupo: str):
+    """Modelo para as UCs do grupo: opcoes["modelos"][grupo] (lote misto) ou opcoes["modelo"]."""
+    modelo = (opcoes.get("modelos") or {}).get(grupo) or opcoes.get("modelo")
+    if not modelo:
+        raise ValueError(f"sem planilha modelo para o Grupo {grupo}")
+    return modelo
+
+
+def processar_cliente(cliente, itens, opcoes, ao_progresso=None):
+    """
+    Roda num processo do pool: lê as faturas do cliente e grava a planilha consolidada.
+    ao_progresso(concluidos, total): chamado a cada PDF lido e ao terminar a planilha.
+    opcoes["grupo"] == GRUPO_AUTO: cada PDF vai para o mapper do seu grupo e sai uma planilha
+    por grupo encontrado (resultado["arquivos"]; resultado["arquivo"] é a primeira).
+    opcoes["simular"]: nenhuma planilha é gravada (nem o banco); resultado["simulacao"] traz, por
+    planilha, as células que mudariam em relação à saída anterior (ver plano_escrita.comparar_com_saida).
+    opcoes["salvar_plano"]: grava o plano de escrita ao lado de cada planilha (base da próxima simulação).
+    """
+    inicio = time.perf_counter()
+    grupo = opcoes["grupo"]
+    automatico = grupo == GRUPO_AUTO
+    simular = opcoes.get("simular", False)
+    resultado = {"cliente": cliente, "status": "ok", "arquivo": None, "arquivos": [], "faturas": 0,
+                 "falhas_pdf": [], "segundos": {}}
+    try:
+        cache = CacheFaturas(opcoes["cache"]) if opcoes["cache"] else None
+        banco = BancoFaturas(opcoes["banco"]) if opcoes["banco"] else None
+
+        # Fase 1: leitura, um PDF por vez para que um arquivo ruim não derrube o cliente
+        t0 = time.perf_counter()
+        lidos, grupos_por_item = [], []
+        total = sum(len(item['arquivos']) for item in itens) + 1  # + a planilha
+        concluidos = 0
+        for item in itens:
+            faturas, grupos = [], []
+            for caminho in item['arquivos']:
+                try:
+                    with open(caminho, "rb") as f:
+                        conteudo = f.read()
+                    opcoes_leitura = dict(cache=cache, leitura_lazy=opcoes["leitura_lazy"], max_workers=1,
+                                          layout=opcoes.get("leitura_layout", False))
+                    if automatico:
+                        registros, grupos_pdf, hashes, _, _ = mapear_pdfs_auto([conteudo], **opcoes_leitura)
+                        if grupos_pdf[0] is None:
+                            raise ValueError("grupo tarifário não identificado")
+                    else:
+                        registros, hashes, _, _ = mapear_pdfs([conteudo], grupo, **opcoes_leitura)
+                        grupos_pdf = [grupo]
+                except Exception as e:
+                    resultado["falhas_pdf"].append({"arquivo": caminho, "erro": f"{type(e).__name__}: {e}"})
+                    continue
+                finally:
+                    concluidos += 1
+                    if ao_progresso:
+                        ao_progresso(concluidos, total)
+                faturas.extend(registros)
+                grupos.extend(grupos_pdf)
+                if banco and not simular:
+                    banco.salvar_varias(registros, grupos_pdf[0], hashes, MAPPERS[grupos_pdf[0]][1])
+            lidos.append({'tipo': item['tipo'], 'indice': item['indice'], 'dados': faturas})
+            grupos_por_item.append(grupos)
+        if automatico:
+            por_grupo = separar_por_grupo(lidos, grupos_por_item)
+            if not por_grupo:
+                raise ValueError("nenhuma fatura com grupo tarifário identificado")
+        else:
+            por_grupo = {grupo: lidos}
+        for grupo_itens, dados_estruturados in por_grupo.items():
+            if banco and opcoes["completar_com_banco"]:
+                for item in dados_estruturados:
+                    item['dados'] = mesclar_com_banco(item['dados'], banco, grupo_itens)
+            resultado["faturas"] += sum(len(item['dados']) for item in dados_estruturados)
+        resultado["segundos"]["leitura"] = round(time.perf_counter() - t0, 3)
+
+        # Fase 2: planilha consolidada (uma por grupo no lote misto): plano de escrita e, fora da simulação, gravação
+        t0 = time.perf_counter()
+        # Importado aqui, como os writers: ler as faturas não depende do openpyxl
+        from services.plano_escrita import aplicar_plano, caminho_do_plano, comparar_com_saida
+        if simular:
+            resultado["simulacao"] = []
+        for grupo_itens, dados_estruturados in por_grupo.items():
+            qtd_geradoras, qtd_beneficiarias = quantidades_de_abas(dados_estruturados)
+            # A simulação só precisa do layout do modelo: o motor xml não o carrega inteiro
+            wb, plano = planejar_planilha(modelo_do_grupo(opcoes, grupo_itens), grupo_itens, dados_estruturados,
+                                          qtd_geradoras, qtd_beneficiarias, motor="xml" if simular else opcoes["motor"])
+            destino = os.path.join(opcoes["saida"], f"BALANCO_{cliente}_GRUPO_{grupo_itens}.xlsx")
+            if simular:
+                resultado["simulacao"].append(comparar_com_saida(plano, destino))
+                continue
+            aplicar_plano(wb, plano)
+            wb.save(destino)
+            if opcoes.get("salvar_plano"):
+                plano.salvar(caminho_do_plano(destino))
+            resultado["arquivos"].append(destino)
+        resultado["arquivo"] = resultado["arquivos"][0] if resultado["arquivos"] else None
+        if automatico:
+            resultado["grupos"] = {g: len(dados) for g, dados in por_grupo.items()}
+        resultado["segundos"]["escrita"] = round(time.perf_counter() - t0, 3)
+        if ao_progresso:
+            ao_progresso(total, total)
+        if resultado["falhas_pdf"]:
+            resultado["status"] = "parcial"
+    except Exception as e:
+        resultado["status"] = "erro"
+        resultado["erro"] = f"{type(e).__name__}: {e}"
+        resultado["traceback"] = traceback.format_exc()
+    resultado["segundos"]["total"] = round(time.perf_counter() - inicio, 3)
+    return resultado
+
+
+def processar_carteira(raiz, opcoes, destino_zip, workers=None, ao_concluir=None) -> list:
+    """
+    Processa todos os clientes de raiz em paralelo (um processo por cliente) e junta as
+    planilhas num único ZIP, gravado em disco à medida que cada cliente termina: cada
+    planilha entra no ZIP e é apagada, então nunca há mais de `workers` delas ao mesmo tempo.
+    Cada cliente usa o seu próprio modelo, se houver (ver modelo_do_cliente), ou o comum do
+    grupo (ver modelo_do_grupo).
+    ao_concluir(resultado, concluidos, total): chamado quando cada cliente termina.
+    No retorno, resultado["arquivo"] / resultado["arquivos"] são os nomes das planilhas dentro do ZIP.
+    """
+    clientes = listar_clientes(raiz)
+    total = len(clientes)
+    resultados = []
+    workers = max(1, min(workers or os.cpu_count() or 1, total or 1))
+    # xlsx já é comprimido: ZIP_STORED evita recomprimir
+    with zipfile.ZipFile(destino_zip, "w", zipfile.ZIP_STORED) as saida, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        futuros = {}
+        for cliente, itens in clientes.items():
+            proprio = modelo_do_cliente(raiz, cliente)
+            # O modelo próprio vale para todas as planilhas do cliente, inclusive no lote misto
+            opcoes_cliente = {**opcoes, "modelo": proprio, "modelos": {}} if proprio else opcoes
+            futuros[pool.submit(processar_cliente, cliente, itens, opcoes_cliente)] = cliente
+        for futuro in as_completed(futuros):
+            resultado = futuro.result()
+            for caminho in resultado["arquivos"]:
+                saida.write(caminho, os.path.basename(caminho))
+                os.remove(caminho)
+            resultado["arquivos"] = [os.path.basename(caminho) for caminho in resultado["arquivos"]]
+            if resultado["arquivo"]:
+                resultado["arquivo"] = os.path.basename(resultado["arquivo"])
+            resultados.append(resultado)
+            if ao_concluir:
+                ao_concluir(resultado, len(resultados), total)
+    resultados.sort(key=lambda r: r["cliente"])
+    return resultados
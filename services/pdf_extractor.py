@@ -0,0 +1,288 @@
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from services.campos import PADROES, VARREDOR_A, VARREDOR_B
+from services.classificacao import GRUPO_AUTO, classificar_texto
+from services.fatura_mapper import normalizar_texto
+from services.indice_espacial import IndiceEspacial
+from utils.instrumentacao import Instrumentacao, medir
+
+# Campos que precisam estar no texto para a leitura parcial (lazy) parar: todos os que o mapper
+# do grupo lê. Fatura sem algum deles (ex.: sem bloco SCEE) é lida até o fim, em vez de voltar
+# com zeros no lugar de um valor que estava numa página seguinte.
+CAMPOS_OBRIGATORIOS = {
+    "B": list(VARREDOR_B.simples),
+    "A": list(VARREDOR_A.simples),
+}
+# Texto que o mapper lê a partir do campo (o bloco SCEE é varrido nos 1000 caracteres seguintes)
+JANELAS = {"scee_b": 1000}
+# Histórico: a tabela pode continuar na página seguinte, então só está completa quando uma página
+# lida depois da última linha dela não tem mais linhas de histórico (contar os meses não basta:
+# outras datas do texto, como "DEZ/2025 14/01/2026", também casam com o padrão).
+HISTORICOS = {"B": "historico_b", "A": "historico_a"}
+
+# Pool compartilhado do processo: (configuração, pool); ver pool_do_processo
+_POOL = None
+_TRAVA_POOL = threading.Lock()
+
+# PDF de uma linha (Helvetica, sem xref: o pdfminer reconstrói) para aquecer os workers
+PDF_AQUECIMENTO = (b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+                   b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+                   b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 200 50]/Contents 4 0 R"
+                   b"/Resources<</Font<</F1 5 0 R>>>>>>endobj\n"
+                   b"4 0 obj<</Length 44>>stream\nBT /F1 9 Tf 10 20 Td (JAN/2025 1,00) Tj ET\nendstream endobj\n"
+                   b"5 0 obj<</Type/Font/Subtype/Type1/BaseFont/Helvetica>>endobj\n"
+                   b"trailer<</Root 1 0 R>>\n%%EOF\n")
+
+
+def _limitar_memoria(limite_mb):
+    """Inicializador dos workers: aplica o teto de memória por processo (somente Unix)."""
+    if not limite_mb:
+        return
+    try:
+        import resource
+    except ImportError:
+        return
+    limite = int(limite_mb * 1024 * 1024)
+    _, maximo = resource.getrlimit(resource.RLIMIT_AS)
+    if maximo != resource.RLIM_INFINITY:
+        limite = min(limite, maximo)
+    resource.setrlimit(resource.RLIMIT_AS, (limite, maximo))
+
+
+def abrir_pdf(conteudo):
+    """Aceita o PDF em bytes ou o caminho de um arquivo em disco (modo de pouca memória)."""
+    # Importado só na primeira leitura: quem só usa o pool (ex.: o app ao abrir) não paga o pdfplumber
+    import pdfplumber
+    if isinstance(conteudo, (str, os.PathLike)):
+        return pdfplumber.open(conteudo)
+    return pdfplumber.open(io.BytesIO(conteudo))
+
+
+def _texto_pagina(pagina, regioes=None) -> str:
+    """Texto da página inteira ou só dos recortes (x0, topo, x1, base em frações da página)."""
+    if not regioes:
+        return pagina.extract_text() or ""
+    x_origem, y_origem, x_fim, y_fim = pagina.bbox
+    largura, altura = x_fim - x_origem, y_fim - y_origem
+    partes = []
+    for x0, topo, x1, base in regioes:
+        recorte = pagina.crop((x_origem + x0 * largura, y_origem + topo * altura,
+                               x_origem + x1 * largura, y_origem + base * altura))
+        partes.append(recorte.extract_text() or "")
+    return "\n".join(partes)
+
+
+def campos_satisfeitos(texto: str, grupo: str, ultima_pagina: str = None) -> bool:
+    """
+    Verifica se os campos obrigatórios do grupo (e o histórico inteiro) já estão no texto lido.
+    O último token é ignorado, pois pode continuar na próxima página
+    (o app junta as páginas sem separador), e o match não pode encostar no fim.
+    ultima_pagina: texto da última página lida (sem ela, o histórico nunca é dado como completo).
+    """
+    parcial = normalizar_texto(texto).rsplit(" ", 1)[0]
+    for nome in CAMPOS_OBRIGATORIOS[grupo]:
+        m = PADROES[nome].search(parcial)
+        if not m or m.end() >= len(parcial) or m.start() + JANELAS.get(nome, 0) > len(parcial):
+            return False
+    return historico_completo(parcial, grupo, ultima_pagina)
+
+
+def historico_completo(parcial: str, grupo: str, ultima_pagina: str = None) -> bool:
+    """Histórico já encontrado e ausente da última página lida (a tabela acabou numa página anterior)."""
+    padrao = PADROES[HISTORICOS[grupo]]
+    if ultima_pagina is None or not padrao.search(parcial):
+        return False
+    return padrao.search(normalizar_texto(ultima_pagina)) is None
+
+
+def extrair_indice_pdf(conteudo, inicio: int = 0, fim: int = None, instrumentacao=None) -> IndiceEspacial:
+    """Índice espacial das palavras das páginas [inicio, fim) (uma chamada de extract_words por página)."""
+    palavras = []
+    with medir(instrumentacao, "pdfplumber.open"):
+        pdf = abrir_pdf(conteudo)
+    with pdf:
+        for n, pagina in enumerate(pdf.pages[inicio:fim], start=inicio):
+            with medir(instrumentacao, "extract_words"):
+                palavras.extend((p["text"], n, p["x0"], p["top"], p["x1"], p["bottom"])
+                                for p in pagina.extract_words())
+            pagina.close()
+    return IndiceEspacial(palavras)
+
+
+def extrair_texto_pdf(conteudo, inicio: int = 0, fim: int = None,
+                      grupo_lazy: str = None, regioes: dict = None, instrumentacao=None,
+                      layout: bool = False) -> str:
+    """
+    Extrai o texto das páginas [inicio, fim) de um PDF (bytes ou caminho), na mesma forma usada pelo app.
+    - grupo_lazy: lê página a página e para assim que os campos obrigatórios do grupo e o histórico inteiro aparecem.
+      GRUPO_AUTO: o grupo é classificado pelas páginas já lidas (ver services/classificacao.py).
+    - regioes: {indice_pagina: [(x0, topo, x1, base), ...]} para extrair só esses blocos.
+    - instrumentacao: mede a abertura do PDF e a extração de cada página.
+    - layout: texto montado das linhas do índice espacial (lê o PDF inteiro; ignora as outras opções).
+    """
+    if layout:
+        return extrair_indice_pdf(conteudo, inicio, fim, instrumentacao).como_texto()
+    regioes = regioes or {}
+    partes = []
+    with medir(instrumentacao, "pdfplumber.open"):
+        pdf = abrir_pdf(conteudo)
+    with pdf:
+        for n, pagina in enumerate(pdf.pages[inicio:fim], start=inicio):
+            with medir(instrumentacao, "extract_text"):
+                partes.append(_texto_pagina(pagina, regioes.get(n)))
+            # Libera objetos de layout já processados desta página
+            pagina.close()
+            if grupo_lazy:
+                texto = "".join(partes)
+                grupo = classificar_texto(texto) if grupo_lazy == GRUPO_AUTO else grupo_lazy
+                if grupo and campos_satisfeitos(texto, grupo, partes[-1]):
+                    break
+    return "".join(partes)
+
+
+def _extrair_medindo(conteudo, inicio=0, fim=None, grupo_lazy=None, regioes=None, layout=False):
+    """Versão para os workers: devolve também as medições feitas no processo filho."""
+    instrumentacao = Instrumentacao()
+    texto = extrair_texto_pdf(conteudo, inicio, fim, grupo_lazy, regioes, instrumentacao, layout)
+    return texto, instrumentacao.registros
+
+
+def contar_paginas(conteudo) -> int:
+    with abrir_pdf(conteudo) as pdf:
+        return len(pdf.pages)
+
+
+def calcular_workers(max_workers=None, max_memoria_mb=None, memoria_por_worker_mb=512):
+    """Define quantos processos usar respeitando CPUs e o orçamento de memória do pool."""
+    workers = max_workers or os.cpu_count() or 1
+    if max_memoria_mb:
+        workers = min(workers, max(1, int(max_memoria_mb // memoria_por_worker_mb)))
+    return max(1, workers)
+
+
+def aquecer_extracao():
+    """Importa o pdfplumber e lê um PDF mínimo (texto e palavras), carregando o que a primeira fatura usaria."""
+    with abrir_pdf(PDF_AQUECIMENTO) as pdf:
+        pagina = pdf.pages[0]
+        pagina.extract_text()
+        pagina.extract_words()
+    # Os padrões dos campos já são compilados na importação (services/campos.py)
+    campos_satisfeitos(normalizar_texto("JAN/2025 1,00"), "B")
+
+
+def _iniciar_worker(limite_mb, aquecer):
+    _limitar_memoria(limite_mb)
+    if aquecer:
+        aquecer_extracao()
+
+
+def criar_pool(max_workers=None, max_memoria_mb=None, aquecer=False) -> ProcessPoolExecutor:
+    """
+    Pool de extração com o teto de memória dividido entre os workers.
+    aquecer: sobe os processos agora, cada um já com o pdfplumber importado e usado uma vez,
+    para que a primeira leitura não pague a inicialização.
+    """
+    workers = calcular_workers(max_workers, max_memoria_mb)
+    limite_worker = (max_memoria_mb / workers) if max_memoria_mb else None
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker, initargs=(limite_worker, aquecer))
+    if aquecer:
+        # Os processos só sobem com a primeira tarefa; tarefas vazias sobem todos sem esperar por eles
+        for _ in range(workers):
+            pool.submit(os.getpid)
+    return pool
+
+
+def pool_do_processo(max_workers=None, max_memoria_mb=None, aquecer=False) -> ProcessPoolExecutor:
+    """
+    Um único pool de extração por processo (o do app): com a mesma configuração devolve o
+    que já existe; com outra, cria o novo e encerra o anterior. As leituras já enviadas ao
+    pool antigo terminam antes de os processos dele saírem.
+    """
+    global _POOL
+    configuracao = (max_workers, max_memoria_mb, aquecer)
+    with _TRAVA_POOL:
+        if _POOL is not None and _POOL[0] == configuracao:
+            return _POOL[1]
+        anterior = _POOL
+        _POOL = (configuracao, criar_pool(max_workers, max_memoria_mb, aquecer=aquecer))
+    if anterior is not None:
+        anterior[1].shutdown(wait=False)
+    return _POOL[1]
+
+
+def extrair_textos(pdfs, max_workers=None, max_memoria_mb=None, por_pagina=False,
+                   paginas_por_tarefa=2, ao_concluir=None, grupo_lazy=None, regioes=None,
+                   instrumentacao=None, nomes=None, layout=False) -> list:
+    """
+    Extrai o texto de vários PDFs em paralelo (ProcessPool).
+    - pdfs: lista de bytes; o retorno mantém a mesma ordem.
+    - max_memoria_mb: orçamento total do pool, dividido entre os workers.
+    - por_pagina: divide cada PDF em blocos de páginas entre os workers.
+    - ao_concluir(indice, concluidos, total): chamado sempre que um PDF termina.
+    - grupo_lazy / regioes / layout: ver extrair_texto_pdf. A leitura lazy é sequencial dentro
+      de cada PDF e a de layout lê o índice inteiro, então as duas desativam a divisão por página.
+    - instrumentacao / nomes: recebe as medições de cada PDF, identificadas pelo nome.
+    """
+    total = len(pdfs)
+    textos = [None] * total
+    if grupo_lazy or layout:
+        por_pagina = False
+    if not total:
+        return textos
+    nomes = nomes or list(range(total))
+
+    workers = calcular_workers(max_workers, max_memoria_mb)
+    if not por_pagina:
+        workers = min(workers, total)
+
+    # Um único worker: evita o custo de subir processos
+    if workers == 1:
+        for i, conteudo in enumerate(pdfs):
+            instr_pdf = Instrumentacao() if instrumentacao is not None else None
+            textos[i] = extrair_texto_pdf(conteudo, grupo_lazy=grupo_lazy, regioes=regioes,
+                                          instrumentacao=instr_pdf, layout=layout)
+            if instr_pdf is not None:
+                instrumentacao.incorporar(instr_pdf.registros, pdf=nomes[i])
+            if ao_concluir:
+                ao_concluir(i, i + 1, total)
+        return textos
+
+    partes = {}      # indice do PDF -> {inicio: texto}
+    pendentes = {}   # indice do PDF -> blocos que faltam
+    concluidos = 0
+    tarefa = _extrair_medindo if instrumentacao is not None else extrair_texto_pdf
+
+    with criar_pool(workers, max_memoria_mb) as pool:
+        futuros = {}
+        for i, conteudo in enumerate(pdfs):
+            if por_pagina:
+                n_paginas = contar_paginas(conteudo)
+                blocos = range(0, max(n_paginas, 1), paginas_por_tarefa)
+            else:
+                blocos = [0]
+            partes[i] = {}
+            pendentes[i] = len(blocos)
+            for inicio in blocos:
+                fim = inicio + paginas_por_tarefa if por_pagina else None
+                futuro = pool.submit(tarefa, conteudo, inicio, fim, grupo_lazy, regioes, layout=layout)
+                futuros[futuro] = (i, inicio)
+
+        for futuro in as_completed(futuros):
+            i, inicio = futuros[futuro]
+            resultado = futuro.result()
+            if instrumentacao is not None:
+                resultado, registros = resultado
+                instrumentacao.incorporar(registros, pdf=nomes[i])
+            partes[i][inicio] = resultado
+            pendentes[i] -= 1
+            if pendentes[i] == 0:
+                textos[i] = "".join(partes[i][k] for k in sorted(partes[i]))
+                del partes[i]
+                concluidos += 1
+                if ao_concluir:
+                    ao_concluir(i, concluidos, total)
+
+    return textos
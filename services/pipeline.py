@@ -0,0 +1,242 @@
+"""
+Etapas do balanço sem dependência do Streamlit, usadas pelo app e pela linha de comando:
+leitura dos PDFs (com cache) -> registros mapeados -> planilha preenchida.
+
+Os writers (openpyxl) e o balanço (pandas) são importados na primeira vez que a etapa
+roda: importar este módulo custa só os mappers, e o pdfplumber só entra na primeira
+leitura (ver pdf_extractor.abrir_pdf).
+"""
+import importlib
+
+from services.fatura_mapper import extrair_fatura as extrair_B, extrair_fatura_layout as layout_B, VERSAO as VERSAO_B
+from services.fatura_mapperA import extrair_fatura as extrair_A, extrair_fatura_layout as layout_A, VERSAO as VERSAO_A
+from services.pdf_extractor import extrair_textos, extrair_texto_pdf, extrair_indice_pdf
+from services.indice_espacial import IndiceEspacial
+from services.fatura_cache import hash_pdf, chave_texto, chave_dados, chave_grupo
+from services.classificacao import GRUPO_AUTO, classificar_texto
+from utils.instrumentacao import Instrumentacao, medir
+
+MAPPERS = {"A": (extrair_A, VERSAO_A), "B": (extrair_B, VERSAO_B)}
+# Leitura por layout: mesmos campos, lidos na linha de cada âncora do índice espacial
+MAPPERS_LAYOUT = {"A": layout_A, "B": layout_B}
+# grupo -> (módulo, função de gravação, função de planejamento); o preparo é sempre preparar_planilha
+WRITERS = {"A": ("services.excel_writterA", "salvar_dados_A", "planejar_dados_A"),
+           "B": ("services.excel_writer", "salvar_dados_multiplos", "planejar_dados_multiplos")}
+
+
+def obter_writers(grupo: str):
+    """(preparar_planilha, salvar) do grupo, importando o writer na primeira chamada."""
+    modulo, salvar, _ = WRITERS[grupo]
+    writer = importlib.import_module(modulo)
+    return writer.preparar_planilha, getattr(writer, salvar)
+
+
+def obter_planejador(grupo: str):
+    """(preparar_planilha, planejar) do grupo: planejar devolve o PlanoEscrita sem gravar."""
+    modulo, _, planejar = WRITERS[grupo]
+    writer = importlib.import_module(modulo)
+    return writer.preparar_planilha, getattr(writer, planejar)
+
+
+def modo_leitura(grupo: str, leitura_lazy: bool = False, layout: bool = False) -> str:
+    # A leitura por layout lê o PDF inteiro, então prevalece sobre a parcial
+    if layout:
+        return "layout"
+    return f"lazy{grupo}" if leitura_lazy else ""
+
+
+def mapear_texto(texto: str, grupo: str, layout: bool = False):
+    """Registro a partir do texto; no modo layout o texto (linhas do índice) vira índice de novo."""
+    if layout:
+        return MAPPERS_LAYOUT[grupo](IndiceEspacial.de_texto(texto))
+    return MAPPERS[grupo][0](texto)
+
+
+def mapear_pdfs(pdfs, grupo: str, cache=None, leitura_lazy=False, ao_concluir=None,
+                instrumentacao=None, nomes=None, layout=False, **opcoes_extracao):
+    """
+    Devolve (registros, hashes, qtd_reaproveitadas, qtd_extraidas) na ordem dos PDFs.
+    O cache é consultado primeiro; só os PDFs inéditos vão para extrair_textos
+    (opcoes_extracao: max_workers, max_memoria_mb, por_pagina...).
+    nomes identifica cada PDF nas medições da instrumentacao.
+    layout: lê os campos pelo índice espacial (ver services/indice_espacial.py).
+    """
+    registros, _, hashes, reaproveitadas, extraidas = _mapear(
+        pdfs, [grupo] * len(pdfs), cache, leitura_lazy, ao_concluir, instrumentacao, nomes, layout, opcoes_extracao)
+    return registros, hashes, reaproveitadas, extraidas
+
+
+def mapear_pdfs_auto(pdfs, cache=None, leitura_lazy=False, ao_concluir=None,
+                     instrumentacao=None, nomes=None, layout=False, **opcoes_extracao):
+    """
+    Como mapear_pdfs, para um lote que mistura Grupo A e Grupo B: o grupo de cada PDF é
+    classificado pelo texto (e guardado no cache junto com a extração) e o PDF vai para o
+    mapper do seu grupo. Devolve (registros, grupos, hashes, qtd_reaproveitadas, qtd_extraidas);
+    um PDF sem grupo identificado fica com registro e grupo None.
+    """
+    return _mapear(pdfs, [None] * len(pdfs), cache, leitura_lazy, ao_concluir, instrumentacao,
+                   nomes, layout, opcoes_extracao)
+
+
+def _mapear(pdfs, grupos, cache, leitura_lazy, ao_concluir, instrumentacao, nomes, layout, opcoes_extracao):
+    """grupos: o grupo de cada PDF ou None para classificar (cache -> texto)."""
+    nomes = nomes or list(range(len(pdfs)))
+    leitura_lazy = leitura_lazy and not layout
+    hashes = [hash_pdf(conteudo) for conteudo in pdfs]
+    if cache is not None:
+        grupos = [grupo or cache.get(chave_grupo(h)) for grupo, h in zip(grupos, hashes)]
+
+    def modo(i):
+        # Grupo ainda desconhecido: a leitura lazy classifica as páginas enquanto lê
+        return modo_leitura(grupos[i] or GRUPO_AUTO, leitura_lazy, layout)
+
+    def chave_registro(i):
+        return chave_dados(hashes[i], grupos[i], MAPPERS[grupos[i]][1], modo(i))
+
+    if cache is not None:
+        registros = [cache.get(chave_registro(i)) if grupos[i] else None for i in range(len(pdfs))]
+    else:
+        registros = [None] * len(pdfs)
+    sem_registro = [i for i, reg in enumerate(registros) if reg is None]
+    textos = {i: cache.get(chave_texto(hashes[i], modo(i))) if cache is not None else None for i in sem_registro}
+    sem_texto = [i for i in sem_registro if textos[i] is None]
+
+    grupo_lazy = None
+    if leitura_lazy:
+        # Um grupo só (o caso do grupo escolhido): para nos campos dele; senão cada PDF classifica o seu
+        pendentes = {grupos[i] for i in sem_texto}
+        grupo_lazy = pendentes.pop() if len(pendentes) == 1 and None not in pendentes else GRUPO_AUTO
+    novos = extrair_textos([pdfs[i] for i in sem_texto], ao_concluir=ao_concluir,
+                           grupo_lazy=grupo_lazy, instrumentacao=instrumentacao,
+                           nomes=[nomes[i] for i in sem_texto], layout=layout, **opcoes_extracao)
+    textos.update(zip(sem_texto, novos))
+
+    extraidos = set(sem_texto)
+    for i in sem_registro:
+        if grupos[i] is None:
+            with medir(instrumentacao, "classificacao", pdf=nomes[i]):
+                grupos[i] = classificar_texto(textos[i])
+            if cache is not None and grupos[i]:
+                cache.set(chave_grupo(hashes[i]), grupos[i])
+        # Depois da classificação: na leitura lazy a chave do texto depende do grupo
+        if cache is not None and i in extraidos:
+            cache.set(chave_texto(hashes[i], modo(i)), textos[i])
+        if grupos[i] is None:
+            continue
+        with medir(instrumentacao, "mapper", pdf=nomes[i]):
+            registros[i] = mapear_texto(textos[i], grupos[i], layout)
+        if cache is not None:
+            cache.set(chave_registro(i), registros[i])
+
+    return registros, grupos, hashes, len(pdfs) - len(sem_registro), len(sem_texto)
+
+
+def processar_pdf(conteudo, grupo: str, leitura_lazy=False, devolver_texto=True, layout=False):
+    """
+    Lê e mapeia um único PDF (bytes ou caminho); usado como tarefa de executor
+    (ver processamento_incremental). Devolve (texto, registro, medições, grupo).
+    devolver_texto=False: o texto fica no worker e só o registro volta (texto = None).
+    layout: mapeia direto do índice espacial; o texto devolvido são as linhas do índice.
+    grupo=GRUPO_AUTO: o grupo é classificado pelo texto; sem grupo identificado, ValueError.
+    """
+    instrumentacao = Instrumentacao()
+    if layout:
+        indice = extrair_indice_pdf(conteudo, instrumentacao=instrumentacao)
+        texto = indice.como_texto() if devolver_texto or grupo == GRUPO_AUTO else None
+    else:
+        indice = None
+        texto = extrair_texto_pdf(conteudo, grupo_lazy=grupo if leitura_lazy else None,
+                                  instrumentacao=instrumentacao)
+    if grupo == GRUPO_AUTO:
+        with instrumentacao.etapa("classificacao"):
+            grupo = classificar_texto(texto)
+        if grupo is None:
+            raise ValueError("grupo tarifário não identificado (sem linhas de medição nem classificação)")
+    with instrumentacao.etapa("mapper"):
+        registro = MAPPERS_LAYOUT[grupo](indice) if layout else MAPPERS[grupo][0](texto)
+    return (texto if devolver_texto else None), registro, instrumentacao.registros, grupo
+
+
+def separar_por_grupo(itens, grupos_por_item) -> dict:
+    """
+    Roteia um lote misto: {grupo: [{'tipo', 'indice', 'dados'}]} a partir dos itens
+    ({'tipo', 'indice', 'dados'}) e do grupo de cada registro (grupos_por_item[n][k] é o
+    grupo de itens[n]['dados'][k]). Cada planilha só tem as UCs do seu grupo, então os
+    índices são renumerados por tipo dentro do grupo, na ordem original.
+    """
+    por_grupo = {}
+    for item, grupos in zip(itens, grupos_por_item):
+        faturas = {}
+        for registro, grupo in zip(item['dados'], grupos):
+            if grupo:
+                faturas.setdefault(grupo, []).append(registro)
+        for grupo in sorted(faturas):
+            destino = por_grupo.setdefault(grupo, [])
+            indice = 1 + sum(existente['tipo'] == item['tipo'] for existente in destino)
+            destino.append({'tipo': item['tipo'], 'indice': indice, 'dados': faturas[grupo]})
+    return dict(sorted(por_grupo.items()))
+
+
+def quantidades_de_abas(itens):
+    """(qtd_geradoras, qtd_beneficiarias) que o modelo precisa para os itens."""
+    qtd_geradoras = max([i['indice'] for i in itens if i['tipo'] == 'geradora'], default=1)
+    qtd_beneficiarias = max([i['indice'] for i in itens if i['tipo'] == 'beneficiaria'], default=0)
+    return qtd_geradoras, qtd_beneficiarias
+
+
+def mesclar_com_banco(faturas, banco, grupo: str) -> list:
+    """Meses já salvos da UC entram antes; as faturas recebidas agora prevalecem."""
+    uc = next((f.get("uc") for f in faturas if f.get("uc")), None)
+    if not uc:
+        return faturas
+    meses_novos = {(f.get("ano"), f.get("mes")) for f in faturas}
+    anteriores = [f for f in banco.faturas_da_uc(uc, grupo)
+                  if (f.get("ano"), f.get("mes")) not in meses_novos]
+    return anteriores + faturas
+
+
+def planejar_planilha(modelo, grupo: str, dados_estruturados, qtd_geradoras, qtd_beneficiarias,
+                      motor="xml", instrumentacao=None, balanco=None):
+    """
+    Prepara as abas do modelo e devolve (wb, plano) sem gravar nenhuma célula
+    (ver services/plano_escrita.py). Com o motor "xml" (padrão) o modelo não é carregado
+    inteiro: só as abas consultadas são lidas, o que basta para uma simulação.
+    """
+    with medir(instrumentacao, "importar_writer"):
+        preparar, planejar = obter_planejador(grupo)
+    with medir(instrumentacao, "preparar_planilha"):
+        wb = preparar(modelo, qtd_geradoras, qtd_beneficiarias, motor=motor)
+    with medir(instrumentacao, "planejar"):
+        if grupo == "A" and balanco is not None:
+            return wb, planejar(wb, dados_estruturados, balanco=balanco)
+        return wb, planejar(wb, dados_estruturados)
+
+
+def gerar_planilha(modelo, grupo: str, dados_estruturados, qtd_geradoras, qtd_beneficiarias,
+                   motor="openpyxl", instrumentacao=None, balanco=None):
+    """
+    Prepara as abas do modelo e grava os registros ([{'tipo', 'indice', 'dados'}]).
+    balanco: frame já calculado (services.balanco); o writer do Grupo A lê dele o consumo total
+    (P + FP + HR). O Grupo B não usa o frame.
+    """
+    wb, plano = planejar_planilha(modelo, grupo, dados_estruturados, qtd_geradoras, qtd_beneficiarias,
+                                  motor=motor, instrumentacao=instrumentacao, balanco=balanco)
+    # Já importado pelo writer: o plano é gravado numa passada por aba
+    from services.plano_escrita import aplicar_plano
+    with medir(instrumentacao, "aplicar_plano"):
+        return aplicar_plano(wb, plano)
+
+
+def calcular(dados_estruturados, grupo: str, instrumentacao=None):
+    """Balanço colunar de todos os registros do cliente (ver services/balanco.py)."""
+    with medir(instrumentacao, "importar_balanco"):
+        from services.balanco import montar_frame, calcular_balanco
+    with medir(instrumentacao, "balanco"):
+        return calcular_balanco(montar_frame(dados_estruturados, grupo))
+
+
+def salvar_planilha(wb, destino, instrumentacao=None):
+    """destino: arquivo em memória (BytesIO) ou caminho; em disco a planilha não passa pela memória inteira."""
+    with medir(instrumentacao, "wb.save"):
+        wb.save(destino)
+    return destino
@@ -0,0 +1,161 @@
+"""
+Plano de escrita dos writers: todas as células que uma execução grava, antes de gravar.
+
+    plano = planejar_dados_multiplos(wb, dados_estruturados)  # só lê o layout (coluna A, mesclagens)
+    aplicar_plano(wb, plano)                                  # uma passada por aba, openpyxl ou PlanilhaXML
+    plano.salvar("BALANCO_X_GRUPO_B.plano.json")
+    diferencas(plano, PlanoEscrita.carregar("BALANCO_X_GRUPO_B.plano.json"))  # simulação, sem planilha
+
+- plano.operacoes é a lista (aba, célula, valor) ordenada por aba (na ordem do modelo), linha
+  e coluna. Uma célula escrita duas vezes fica com o último valor, como na escrita direta.
+- As células mescladas do RESUMO já saem resolvidas para a âncora (ver IndicePlanilha.ancora).
+- No PlanilhaXML as escritas de cada aba entram de uma vez no dict que o save injeta.
+- diferencas percorre os dicts das abas e só ordena o que mudou: a simulação de um cliente
+  custa menos que abrir a planilha dele.
+"""
+import json
+import os
+import re
+
+from services.xlsx_patch import AbaXML, PlanilhaXML
+
+RE_COORD = re.compile(r"([A-Z]+)(\d+)")
+SUFIXO_PLANO = ".plano.json"
+
+
+def _ordem_celula(coord):
+    coluna, linha = RE_COORD.fullmatch(coord).groups()
+    return int(linha), len(coluna), coluna
+
+
+def caminho_do_plano(caminho_planilha: str) -> str:
+    """BALANCO_X_GRUPO_B.xlsx -> BALANCO_X_GRUPO_B.plano.json (ao lado da planilha)."""
+    return os.path.splitext(caminho_planilha)[0] + SUFIXO_PLANO
+
+
+class PlanoEscrita:
+    """Células a gravar, agrupadas por aba: {aba: {coordenada: valor}}."""
+    __slots__ = ("abas", "ordem_abas")
+
+    def __init__(self, ordem_abas=()):
+        self.abas = {}
+        self.ordem_abas = list(ordem_abas)  # ordem das abas no modelo (abas fora dela vão para o fim)
+
+    def escrever(self, aba: str, coord: str, valor):
+        self.abas.setdefault(aba, {})[coord.upper()] = valor
+
+    def aba(self, aba: str) -> dict:
+        """Células da aba, para os writers gravarem direto (coordenadas já em maiúsculas)."""
+        return self.abas.setdefault(aba, {})
+
+    def __len__(self):
+        return sum(len(celulas) for celulas in self.abas.values())
+
+    def _abas_em_ordem(self):
+        posicao = {aba: n for n, aba in enumerate(self.ordem_abas)}
+        return sorted(self.abas, key=lambda aba: (posicao.get(aba, len(posicao)), aba))
+
+    @property
+    def operacoes(self) -> list:
+        """[(aba, célula, valor)] em ordem de aba, linha e coluna."""
+        return [(aba, coord, self.abas[aba][coord])
+                for aba in self._abas_em_ordem() for coord in sorted(self.abas[aba], key=_ordem_celula)]
+
+    def valor(self, aba: str, coord: str, padrao=None):
+        return self.abas.get(aba, {}).get(coord, padrao)
+
+    # --- persistência (JSON ao lado da planilha gerada) ---
+    def para_dict(self) -> dict:
+        return {"abas": self._abas_em_ordem(), "operacoes": [list(op) for op in self.operacoes]}
+
+    @classmethod
+    def de_dict(cls, dados: dict):
+        plano = cls(dados.get("abas", ()))
+        for aba, coord, valor in dados.get("operacoes", ()):
+            plano.escrever(aba, coord, valor)
+        return plano
+
+    def salvar(self, caminho: str):
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(self.para_dict(), f, ensure_ascii=False)
+
+    @classmethod
+    def carregar(cls, caminho: str):
+        with open(caminho, "r", encoding="utf-8") as f:
+            return cls.de_dict(json.load(f))
+
+
+def aplicar_plano(wb, plano: PlanoEscrita):
+    """Grava o plano no workbook (openpyxl ou PlanilhaXML), aba por aba. Devolve o wb."""
+    for aba, celulas in plano.abas.items():
+        ws = wb[aba]
+        if isinstance(ws, AbaXML):
+            ws.escritas.update(celulas)
+            continue
+        for coord, valor in celulas.items():
+            ws[coord] = valor
+    return wb
+
+
+def plano_da_planilha(origem, plano: PlanoEscrita) -> PlanoEscrita:
+    """
+    Valores que uma planilha já gerada tem nas células do plano (para comparar quando não há
+    o plano dela). Usa o motor xml: só as abas do plano são lidas.
+    """
+    wb = PlanilhaXML(origem)
+    atual = PlanoEscrita(wb.sheetnames)
+    for aba, celulas in plano.abas.items():
+        if aba not in wb:
+            continue
+        ws = wb[aba]
+        for coord in celulas:
+            atual.escrever(aba, coord, ws[coord].value)
+    return atual
+
+
+def diferencas(novo: PlanoEscrita, anterior: PlanoEscrita) -> list:
+    """
+    Células com valor diferente entre dois planos: [(aba, célula, antes, depois)], em ordem de
+    aba, linha e coluna. Célula que só um dos planos grava aparece com None do outro lado.
+    """
+    resultado = []
+    for aba, celulas in novo.abas.items():
+        antigas = anterior.abas.get(aba, {})
+        for coord, valor in celulas.items():
+            antes = antigas.get(coord)
+            if antes != valor:
+                resultado.append((aba, coord, antes, valor))
+    for aba, celulas in anterior.abas.items():
+        novas = novo.abas.get(aba, {})
+        resultado.extend((aba, coord, valor, None) for coord, valor in celulas.items()
+                         if valor is not None and coord not in novas)
+    # Só as diferenças são ordenadas (abas na ordem do novo plano, depois as do anterior)
+    posicao = {}
+    for aba in novo.ordem_abas + anterior.ordem_abas:
+        posicao.setdefault(aba, len(posicao))
+    resultado.sort(key=lambda d: (posicao.get(d[0], len(posicao)), d[0], _ordem_celula(d[1])))
+    return resultado
+
+
+def comparar_com_saida(plano: PlanoEscrita, caminho_planilha: str, exemplos: int = 20) -> dict:
+    """
+    Simulação: o que mudaria em relação à execução anterior gravada em caminho_planilha.
+    Compara com o plano salvo ao lado dela (sem abrir planilha nenhuma) ou, sem ele, com os
+    valores da própria planilha nas células do plano.
+    """
+    caminho_plano = caminho_do_plano(caminho_planilha)
+    if os.path.exists(caminho_plano):
+        anterior, base = PlanoEscrita.carregar(caminho_plano), "plano"
+    elif os.path.exists(caminho_planilha):
+        anterior, base = plano_da_planilha(caminho_planilha, plano), "planilha"
+    else:
+        anterior, base = PlanoEscrita(), None
+    lista = diferencas(plano, anterior)
+    return {
+        "arquivo": caminho_planilha,
+        "base": base,
+        "celulas": len(plano),
+        "diferencas": len(lista),
+        "exemplos": [{"aba": aba, "celula": coord, "antes": antes, "depois": depois}
+                     for aba, coord, antes, depois in lista[:exemplos]],
+    }
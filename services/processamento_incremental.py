@@ -0,0 +1,185 @@
+"""
+Processamento incremental para o app: cada PDF enviado é lido uma única vez, em segundo
+plano, assim que entra no uploader. O objeto vive em st.session_state, então os reruns
+do Streamlit (mudar a quantidade de UCs, trocar de aba...) não descartam o que já foi lido.
+
+- Cada arquivo é identificado pelo hash do conteúdo + grupo + modo de leitura.
+- Remover ou substituir um arquivo descarta só o resultado daquele arquivo.
+- "Processar" só espera os pendentes e entrega os registros já mapeados ao writer.
+- baixa_memoria: o PDF vai para um arquivo temporário (em blocos, sem cópia inteira em
+  memória), o worker lê do disco e só o registro mapeado volta; o texto não é guardado.
+- leitura_layout: os campos são lidos pelo índice espacial das palavras (ver pipeline.processar_pdf).
+- grupo GRUPO_AUTO: cada PDF é classificado (ver services/classificacao.py) e vai para o
+  mapper do seu grupo; grupos_de(slot) diz o grupo de cada registro.
+"""
+import os
+import shutil
+import tempfile
+from concurrent.futures import wait
+
+from services.fatura_cache import hash_pdf, hash_arquivo, chave_texto, chave_dados, chave_grupo
+from services.classificacao import GRUPO_AUTO, classificar_texto
+from services.pipeline import MAPPERS, modo_leitura, mapear_texto, processar_pdf
+
+
+class ProcessamentoIncremental:
+    def __init__(self, baixa_memoria=False, leitura_layout=False):
+        self.baixa_memoria = baixa_memoria
+        self.leitura_layout = leitura_layout
+        self.tarefas = {}   # chave -> Future (em andamento)
+        self.prontos = {}   # chave -> registro mapeado
+        self.erros = {}     # chave -> mensagem
+        self.hashes = {}    # chave -> hash do PDF
+        self.grupos = {}    # chave -> grupo do registro (o escolhido ou o classificado)
+        self.nomes = {}     # chave -> nome do arquivo
+        self.slots = {}     # uploader (ex.: "ger_0") -> [chave, ...] na ordem do upload
+        self.medicoes = {}  # chave -> medições do worker (ver utils.instrumentacao)
+        self.em_disco = {}  # chave -> arquivo temporário ainda não lido (baixa_memoria)
+        self._pasta = None
+
+    def _gravar_em_disco(self, chave, arquivo):
+        """Copia o upload para um arquivo temporário em blocos; devolve o caminho."""
+        if self._pasta is None:
+            self._pasta = tempfile.mkdtemp(prefix="faturas_")
+        caminho = os.path.join(self._pasta, f"{chave}.pdf")
+        arquivo.seek(0)
+        with open(caminho, "wb") as destino:
+            shutil.copyfileobj(arquivo, destino, 1 << 20)
+        arquivo.seek(0)
+        self.em_disco[chave] = caminho
+        return caminho
+
+    def _remover_do_disco(self, chave):
+        caminho = self.em_disco.pop(chave, None)
+        if caminho and os.path.exists(caminho):
+            os.remove(caminho)
+
+    def chave(self, hash_conteudo, grupo, leitura_lazy):
+        return f"{grupo}-{modo_leitura(grupo, leitura_lazy, self.leitura_layout)}-{hash_conteudo}"
+
+    def sincronizar(self, slot, arquivos, grupo, leitura_lazy, executor, cache=None):
+        """
+        Registra os arquivos atuais de um uploader e dispara a leitura dos que ainda não
+        foram vistos. Arquivos vindos do cache não chegam a ir para o executor.
+        """
+        chaves = []
+        for arquivo in arquivos or []:
+            conteudo = None
+            if self.baixa_memoria:
+                hash_arquivo_pdf = hash_arquivo(arquivo)
+            else:
+                conteudo = arquivo.getvalue()
+                hash_arquivo_pdf = hash_pdf(conteudo)
+            chave = self.chave(hash_arquivo_pdf, grupo, leitura_lazy)
+            chaves.append(chave)
+            self.nomes[chave] = arquivo.name
+            # Arquivo com erro só é lido de novo se for substituído (o hash muda)
+            if chave in self.prontos or chave in self.tarefas or chave in self.erros:
+                continue
+            self.hashes[chave] = hash_arquivo_pdf
+            if cache is not None:
+                registro, grupo_pdf = self._do_cache(cache, hash_arquivo_pdf, grupo, leitura_lazy)
+                if registro is not None:
+                    self.prontos[chave] = registro
+                    self.grupos[chave] = grupo_pdf
+                    continue
+            if self.baixa_memoria:
+                # O worker recebe só o caminho; o texto não volta para este processo
+                conteudo = self._gravar_em_disco(chave, arquivo)
+            self.tarefas[chave] = executor.submit(processar_pdf, conteudo, grupo, leitura_lazy,
+                                                  not self.baixa_memoria, self.leitura_layout)
+        self.slots[slot] = chaves
+
+    def _do_cache(self, cache, hash_arquivo_pdf, grupo, leitura_lazy):
+        """(registro, grupo) montados só com o cache, ou (None, None) se o PDF precisa ser lido."""
+        if grupo == GRUPO_AUTO:
+            grupo = cache.get(chave_grupo(hash_arquivo_pdf))
+        modo = modo_leitura(grupo or GRUPO_AUTO, leitura_lazy, self.leitura_layout)
+        if grupo:
+            registro = cache.get(chave_dados(hash_arquivo_pdf, grupo, MAPPERS[grupo][1], modo))
+            if registro is not None:
+                return registro, grupo
+        # Texto já extraído (ex.: o usuário trocou de grupo): só o mapper roda
+        texto = cache.get(chave_texto(hash_arquivo_pdf, modo))
+        if texto is None:
+            return None, None
+        if grupo is None:
+            grupo = classificar_texto(texto)
+            if grupo is None:
+                return None, None
+            cache.set(chave_grupo(hash_arquivo_pdf), grupo)
+            modo = modo_leitura(grupo, leitura_lazy, self.leitura_layout)
+        registro = mapear_texto(texto, grupo, self.leitura_layout)
+        cache.set(chave_dados(hash_arquivo_pdf, grupo, MAPPERS[grupo][1], modo), registro)
+        return registro, grupo
+
+    def descartar_nao_usados(self, slots_ativos):
+        """Esquece uploaders que sumiram e arquivos que não estão em nenhum uploader."""
+        for slot in list(self.slots):
+            if slot not in slots_ativos:
+                del self.slots[slot]
+        em_uso = {chave for chaves in self.slots.values() for chave in chaves}
+        for chave in list(self.tarefas):
+            if chave not in em_uso:
+                # Se já estiver rodando, o arquivo temporário só é removido no coletar
+                if self.tarefas.pop(chave).cancel():
+                    self._remover_do_disco(chave)
+        for dicionario in (self.prontos, self.erros, self.hashes, self.nomes, self.medicoes, self.grupos):
+            for chave in list(dicionario):
+                if chave not in em_uso:
+                    del dicionario[chave]
+
+    def coletar(self, cache=None):
+        """Move as tarefas concluídas para prontos/erros e grava no cache. Retorna quantas terminaram."""
+        concluidas = [chave for chave, futuro in self.tarefas.items() if futuro.done()]
+        for chave in concluidas:
+            futuro = self.tarefas.pop(chave)
+            self._remover_do_disco(chave)
+            try:
+                texto, registro, medicoes, grupo = futuro.result()
+            except Exception as e:
+                self.erros[chave] = f"{type(e).__name__}: {e}"
+                continue
+            self.prontos[chave] = registro
+            self.medicoes[chave] = medicoes
+            self.grupos[chave] = grupo
+            if cache is not None:
+                grupo_chave, modo, hash_arquivo_pdf = chave.split("-", 2)
+                if grupo_chave == GRUPO_AUTO:
+                    cache.set(chave_grupo(hash_arquivo_pdf), grupo)
+                    # A leitura lazy automática parou nos campos do grupo classificado
+                    if modo == modo_leitura(GRUPO_AUTO, True):
+                        modo = modo_leitura(grupo, True)
+                versao = MAPPERS[grupo][1]
+                if texto is not None:
+                    cache.set(chave_texto(hash_arquivo_pdf, modo), texto)
+                cache.set(chave_dados(hash_arquivo_pdf, grupo, versao, modo), registro)
+        return len(concluidas)
+
+    def aguardar(self, cache=None, ao_concluir=None):
+        """Espera as leituras pendentes; ao_concluir(concluidos, total) a cada PDF."""
+        total = len(self.tarefas)
+        concluidos = 0
+        while self.tarefas:
+            wait(list(self.tarefas.values()), return_when="FIRST_COMPLETED")
+            concluidos += self.coletar(cache=cache)
+            if ao_concluir:
+                ao_concluir(concluidos, total)
+
+    def situacao(self, slot):
+        """(lidos, pendentes, com_erro) de um uploader."""
+        chaves = self.slots.get(slot, [])
+        return (sum(c in self.prontos for c in chaves),
+                sum(c in self.tarefas for c in chaves),
+                sum(c in self.erros for c in chaves))
+
+    def registros(self, slot):
+        """Registros mapeados do uploader, na ordem do upload (arquivos com erro ficam de fora)."""
+        return [self.prontos[c] for c in self.slots.get(slot, []) if c in self.prontos]
+
+    def hashes_de(self, slot):
+        return [self.hashes.get(c) for c in self.slots.get(slot, []) if c in self.prontos]
+
+    def grupos_de(self, slot):
+        """Grupo de cada registro de registros(slot), na mesma ordem."""
+        return [self.grupos.get(c) for c in self.slots.get(slot, []) if c in self.prontos]
@@ -0,0 +1,241 @@
+"""
+Rateio dos créditos das geradoras entre as beneficiárias.
+
+    problema = montar_problema(dados_estruturados, "B")
+    fracoes = otimizar(problema)
+    avaliar(problema, fracoes)
+
+Modelo (um percentual fixo por beneficiária, como é cadastrado na distribuidora):
+- crédito do mês: excedente das geradoras (energia gerada - consumo próprio); o saldo
+  acumulado informado na primeira fatura do período entra como crédito do primeiro mês;
+- o crédito recebido por uma beneficiária abate o consumo do mês e o que sobra fica
+  acumulado para os meses seguintes (nunca para trás);
+- consumo não compensado + crédito que sobra no fim do período = crédito total -
+  compensado + consumo total - compensado, então minimizar os dois é o mesmo que
+  maximizar a energia compensada.
+
+Com crédito acumulável, a energia compensada de uma UC que recebe a fração p é
+    f(p) = min_k (p * A[k] + B[k])
+(A[k]: crédito gerado até o mês k; B[k]: consumo depois do mês k), uma função côncava
+e linear por partes. As inclinações A[k] são as mesmas para todas as UCs, então o ótimo
+sai de um preenchimento guloso por faixa de inclinação, sem solver de PL.
+"""
+import numpy as np
+import pandas as pd
+
+from services.balanco import montar_frame, calcular_balanco
+from services.banco_faturas import ano_completo
+from services.registros import MESES, FaturaA, FaturaB, como_fatura
+
+TIPOS = {"A": FaturaA, "B": FaturaB}
+
+
+class ProblemaRateio:
+    """
+    meses: [(ano, mes_num)] do período; credito: kWh disponíveis por mês (T,);
+    demanda: consumo compensável das beneficiárias (n, T); credito_atual: crédito que cada
+    beneficiária recebeu nas faturas (n,), usado para inferir o rateio vigente.
+    """
+
+    def __init__(self, meses, credito, demanda, ucs, indices, credito_atual=None):
+        self.meses = list(meses)
+        self.credito = np.asarray(credito, dtype="float64")
+        self.demanda = np.asarray(demanda, dtype="float64").reshape(len(ucs), len(self.meses))
+        self.ucs = list(ucs)
+        self.indices = list(indices)
+        self.credito_atual = (np.zeros(len(self.ucs)) if credito_atual is None
+                              else np.asarray(credito_atual, dtype="float64"))
+
+    def __len__(self):
+        return len(self.ucs)
+
+
+def _consumo_do_historico(dados) -> dict:
+    """{(ano, mes_num): consumo} a partir do histórico impresso na fatura."""
+    historico = dados.historico
+    if isinstance(dados, FaturaA):
+        series = [historico.serie(nome) for nome in ("c_p", "c_fp", "c_hr")]
+        valores = [a + b + c for a, b, c in zip(*series)]
+    else:
+        valores = list(historico.serie("consumo"))
+    return {(ano_completo(historico.ano(i)), MESES.index(historico.mes(i)) + 1): valores[i]
+            for i in range(len(historico))}
+
+
+def montar_problema(dados_estruturados, grupo: str, minimo_kwh=0.0, incluir_saldo=True) -> ProblemaRateio:
+    """
+    Monta o problema a partir dos registros do cliente ([{'tipo', 'indice', 'dados'}]).
+    O período é o das faturas das geradoras. O consumo de cada beneficiária vem das
+    faturas do mês; meses sem fatura usam o histórico impresso e, na falta dele, a média
+    dos meses conhecidos. minimo_kwh: custo de disponibilidade, que não pode ser compensado.
+    """
+    frame = calcular_balanco(montar_frame(dados_estruturados, grupo))
+    geradoras = frame[(frame["tipo"] == "geradora") & (frame["mes_num"] > 0)]
+    if geradoras.empty:
+        raise ValueError("Nenhuma fatura de geradora para definir o período do rateio.")
+
+    meses = sorted(set(zip(geradoras["ano"].tolist(), geradoras["mes_num"].tolist())))
+    posicao = {mes: t for t, mes in enumerate(meses)}
+
+    credito = np.zeros(len(meses))
+    excedente = geradoras["excedente_geracao"].clip(lower=0.0)
+    np.add.at(credito, [posicao[m] for m in zip(geradoras["ano"], geradoras["mes_num"])], excedente.to_numpy())
+    if incluir_saldo:
+        # Saldo acumulado da primeira fatura de cada geradora no período
+        primeiras = geradoras.sort_values(["item", "ano", "mes_num"]).groupby("item").head(1)
+        credito[0] += primeiras["saldo"].clip(lower=0.0).sum()
+
+    tipo_registro = TIPOS[grupo]
+    ucs, indices, linhas, credito_atual = [], [], [], []
+    for item_idx, item in enumerate(dados_estruturados):
+        if item['tipo'] != "beneficiaria" or not item['dados']:
+            continue
+        registros = [como_fatura(d, tipo_registro) for d in item['dados']]
+        conhecido = {}
+        for dados in registros:
+            conhecido.update(_consumo_do_historico(dados))
+        faturas = frame[frame["item"] == item_idx]
+        conhecido.update(zip(zip(faturas["ano"], faturas["mes_num"]), faturas["consumo"]))
+
+        linha = np.array([conhecido.get(mes, np.nan) for mes in meses])
+        if np.isnan(linha).all():
+            linha[:] = faturas["consumo"].mean() if not faturas.empty else 0.0
+        else:
+            linha[np.isnan(linha)] = np.nanmean(linha)
+        linhas.append(linha)
+        ucs.append(registros[0].uc)
+        indices.append(item['indice'])
+        noperiodo = [mes in posicao for mes in zip(faturas["ano"], faturas["mes_num"])]
+        credito_atual.append(faturas["credito_recebido"][noperiodo].sum())
+
+    demanda = np.clip(np.array(linhas).reshape(len(ucs), len(meses)) - minimo_kwh, 0.0, None)
+    return ProblemaRateio(meses, credito, demanda, ucs, indices, credito_atual)
+
+
+def _retas(problema):
+    """A (T+1,) e B (n, T+1) da envoltória f(p) = min_k (p * A[k] + B[k])."""
+    inclinacoes = np.concatenate(([0.0], np.cumsum(problema.credito)))
+    sufixo = np.cumsum(problema.demanda[:, ::-1], axis=1)[:, ::-1]
+    interceptos = np.concatenate((sufixo, np.zeros((len(problema), 1))), axis=1)
+    return inclinacoes, interceptos
+
+
+def compensado(problema, fracoes) -> np.ndarray:
+    """Energia compensada em cada beneficiária no período, dada a fração de cada uma."""
+    inclinacoes, interceptos = _retas(problema)
+    fracoes = np.asarray(fracoes, dtype="float64")
+    return (fracoes[:, None] * inclinacoes[None, :] + interceptos).min(axis=1)
+
+
+def _faixas(problema) -> np.ndarray:
+    """
+    Largura (n, T+1) do trecho de p em [0, 1] em que a reta k é a ativa na UC,
+    ou seja, quanto de fração a UC absorve com ganho marginal A[k].
+    """
+    a, b = _retas(problema)
+    dif_a = a[None, None, :] - a[None, :, None]   # [., k, m] = A[m] - A[k]
+    dif_b = b[:, :, None] - b[:, None, :]         # [j, k, m] = B[k] - B[m]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cruzamento = dif_b / dif_a
+
+    k = np.arange(len(a))
+    paralela = dif_a == 0
+    # Retas paralelas: fica a de menor intercepto (empate: a de menor k)
+    dominada = (paralela & ((dif_b > 0) | ((dif_b == 0) & (k[None, None, :] < k[None, :, None])))).any(axis=2)
+
+    # Retas de inclinação maior (m > k) valem para p pequeno: a reta k começa depois delas
+    inicio = np.where((k[None, None, :] > k[None, :, None]) & ~paralela, cruzamento, -np.inf).max(axis=2)
+    fim = np.where((k[None, None, :] < k[None, :, None]) & ~paralela, cruzamento, np.inf).min(axis=2)
+    largura = np.clip(fim, 0.0, 1.0) - np.clip(inicio, 0.0, 1.0)
+    return np.where(dominada | (largura < 0), 0.0, largura)
+
+
+def otimizar(problema) -> np.ndarray:
+    """
+    Frações (somando 1) que maximizam a energia compensada. Preenche as faixas da maior
+    inclinação para a menor; faixas de mesma inclinação são divididas na proporção da largura.
+    Crédito que nenhuma beneficiária consegue usar é dividido na proporção do consumo.
+    """
+    n = len(problema)
+    if n == 0:
+        return np.zeros(0)
+    inclinacoes, _ = _retas(problema)
+    larguras = _faixas(problema)
+
+    fracoes = np.zeros(n)
+    restante = 1.0
+    # k = 0 tem inclinação 0 (não compensa nada): fica para o rateio do excedente
+    for k in range(len(inclinacoes) - 1, 0, -1):
+        if inclinacoes[k] <= 0 or restante <= 0:
+            break
+        total = larguras[:, k].sum()
+        if total <= 0:
+            continue
+        usado = min(total, restante)
+        fracoes += larguras[:, k] * (usado / total)
+        restante -= usado
+
+    if restante > 1e-12:
+        consumo = problema.demanda.sum(axis=1)
+        peso = consumo / consumo.sum() if consumo.sum() > 0 else np.full(n, 1.0 / n)
+        fracoes += restante * peso
+    return fracoes / fracoes.sum()
+
+
+def arredondar(fracoes, casas=2) -> np.ndarray:
+    """Percentuais com `casas` decimais somando exatamente 100 (maiores restos)."""
+    escala = 100 * 10 ** casas
+    bruto = np.asarray(fracoes, dtype="float64") * escala
+    inteiros = np.floor(bruto).astype("int64")
+    faltam = int(escala - inteiros.sum())
+    if faltam > 0:
+        inteiros[np.argsort(-(bruto - inteiros), kind="stable")[:faltam]] += 1
+    return inteiros / 10 ** casas
+
+
+def fracoes_atuais(problema):
+    """Rateio vigente inferido do crédito recebido pelas beneficiárias (None se não houver)."""
+    total = problema.credito_atual.sum()
+    return problema.credito_atual / total if total > 0 else None
+
+
+def fracoes_proporcionais(problema) -> np.ndarray:
+    """Referência: rateio proporcional ao consumo do período."""
+    consumo = problema.demanda.sum(axis=1)
+    if consumo.sum() <= 0:
+        return np.full(len(problema), 1.0 / max(len(problema), 1))
+    return consumo / consumo.sum()
+
+
+def avaliar(problema, fracoes) -> pd.DataFrame:
+    """Resultado por beneficiária para um rateio (frações somando 1)."""
+    fracoes = np.asarray(fracoes, dtype="float64")
+    consumo = problema.demanda.sum(axis=1)
+    recebido = fracoes * problema.credito.sum()
+    usado = compensado(problema, fracoes)
+    return pd.DataFrame({
+        "indice": problema.indices,
+        "uc": problema.ucs,
+        "percentual": fracoes * 100,
+        "consumo": consumo,
+        "credito_recebido": recebido,
+        "compensado": usado,
+        "nao_compensado": consumo - usado,
+        "credito_sobrando": recebido - usado,
+    })
+
+
+def comparar(problema, cenarios: dict) -> pd.DataFrame:
+    """Totais de cada cenário ({nome: frações}) lado a lado."""
+    linhas = []
+    for nome, fracoes in cenarios.items():
+        if fracoes is None:
+            continue
+        resultado = avaliar(problema, fracoes)
+        linhas.append({
+            "cenario": nome,
+            "compensado": resultado["compensado"].sum(),
+            "nao_compensado": resultado["nao_compensado"].sum(),
+            "credito_sobrando": resultado["credito_sobrando"].sum(),
+        })
+    return pd.DataFrame(linhas)
@@ -0,0 +1,193 @@
+"""
+Registros tipados das faturas (no lugar dos dicts livres devolvidos pelos mappers).
+
+- FaturaB / FaturaA: __slots__ com os mesmos campos dos dicts antigos. Campo com nome
+  errado falha na hora (FaturaB(saldo_kwh=0) -> TypeError, fatura.saldo_kwh -> AttributeError).
+- Historico: uma série float (array 'd') por grandeza, indexada pela posição do mês.
+- Os dois continuam aceitando o acesso de dict (fatura["uc"], fatura.get("mes"), iterar o
+  histórico como lista de dicts) para quem ainda usa os registros como antes.
+- Cache e banco guardam JSON: para_dict() na ida, como_fatura() na volta.
+"""
+from array import array
+
+MESES = ["JAN", "FEV", "MAR", "ABR", "MAI", "JUN", "JUL", "AGO", "SET", "OUT", "NOV", "DEZ"]
+
+
+class Historico:
+    """Histórico de consumo compacto: meses/anos em arrays de inteiros e uma série por grandeza."""
+    __slots__ = ("grandezas", "ano_texto", "_meses", "_anos", "_series")
+
+    def __init__(self, grandezas, ano_texto=False):
+        self.grandezas = tuple(grandezas)
+        # Grupo A traz o ano como texto de 2 dígitos ("25"); Grupo B como inteiro
+        self.ano_texto = ano_texto
+        self._meses = array("b")
+        self._anos = array("h")
+        self._series = {nome: array("d") for nome in self.grandezas}
+
+    def adicionar(self, mes, ano, **valores):
+        self._meses.append(MESES.index(mes))
+        self._anos.append(int(ano))
+        for nome in self.grandezas:
+            self._series[nome].append(valores[nome])
+
+    def serie(self, nome) -> array:
+        return self._series[nome]
+
+    def mes(self, i) -> str:
+        return MESES[self._meses[i]]
+
+    def ano(self, i):
+        return f"{self._anos[i]:02d}" if self.ano_texto else self._anos[i]
+
+    def competencias(self):
+        """(ano como gravado, mês 1-12) de cada posição, sem passar pelas siglas."""
+        return zip(self._anos, [m + 1 for m in self._meses])
+
+    def __len__(self):
+        return len(self._meses)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[k] for k in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        item = {"mes": self.mes(i), "ano": self.ano(i)}
+        for nome in self.grandezas:
+            item[nome] = self._series[nome][i]
+        return item
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __eq__(self, outro):
+        if isinstance(outro, (Historico, list)):
+            return self.para_lista() == list(outro)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Historico({self.para_lista()!r})"
+
+    def para_lista(self) -> list:
+        return list(self)
+
+    @classmethod
+    def de_lista(cls, itens, grandezas, ano_texto=False):
+        historico = cls(grandezas, ano_texto)
+        for item in itens or []:
+            historico.adicionar(item["mes"], item["ano"], **{nome: item.get(nome, 0.0) for nome in grandezas})
+        return historico
+
+
+class _Fatura:
+    """Base com o acesso de dict; as subclasses definem CAMPOS (nome -> padrão) e __slots__."""
+    __slots__ = ()
+    CAMPOS = {}
+    GRANDEZAS_HISTORICO = ()
+    ANO_TEXTO = False
+
+    def __init__(self, **campos):
+        desconhecidos = set(campos) - set(self.CAMPOS)
+        if desconhecidos:
+            raise TypeError(f"{type(self).__name__}: campos desconhecidos {sorted(desconhecidos)}")
+        for nome, padrao in self.CAMPOS.items():
+            setattr(self, nome, campos.get(nome, padrao))
+        if not isinstance(self.historico, Historico):
+            self.historico = Historico.de_lista(self.historico, self.GRANDEZAS_HISTORICO, self.ANO_TEXTO)
+
+    # --- acesso de dict ---
+    def __getitem__(self, chave):
+        if chave not in self.CAMPOS:
+            raise KeyError(chave)
+        return getattr(self, chave)
+
+    def __setitem__(self, chave, valor):
+        if chave not in self.CAMPOS:
+            raise KeyError(chave)
+        setattr(self, chave, valor)
+
+    def get(self, chave, padrao=None):
+        return getattr(self, chave) if chave in self.CAMPOS else padrao
+
+    def __contains__(self, chave):
+        return chave in self.CAMPOS
+
+    def __iter__(self):
+        return iter(self.CAMPOS)
+
+    def __len__(self):
+        return len(self.CAMPOS)
+
+    def keys(self):
+        return self.CAMPOS.keys()
+
+    def values(self):
+        return [getattr(self, nome) for nome in self.CAMPOS]
+
+    def items(self):
+        return [(nome, getattr(self, nome)) for nome in self.CAMPOS]
+
+    def __eq__(self, outro):
+        if isinstance(outro, (_Fatura, dict)):
+            return self.para_dict() == dict(outro.para_dict() if isinstance(outro, _Fatura) else outro)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.para_dict()!r})"
+
+    def __getstate__(self):
+        return self.para_dict()
+
+    def __setstate__(self, estado):
+        type(self).__init__(self, **estado)
+
+    def para_dict(self) -> dict:
+        dados = {nome: getattr(self, nome) for nome in self.CAMPOS}
+        dados["historico"] = self.historico.para_lista()
+        return dados
+
+    @classmethod
+    def de_dict(cls, dados: dict):
+        """Aceita dicts antigos (cache, banco); chaves fora do registro são ignoradas."""
+        return cls(**{nome: valor for nome, valor in dados.items() if nome in cls.CAMPOS})
+
+
+class FaturaB(_Fatura):
+    CAMPOS = {
+        "uc": "", "mes": "", "ano": 0, "endereco": "", "titular": "", "documento": "",
+        "data_leitura_anterior": "", "data_leitura_atual": "",
+        "medidor": "", "leitura_anterior": 0, "leitura_atual": 0,
+        "energia_ativa": 0.0, "energia_gerada": 0.0, "credito_recebido": 0.0, "saldo": 0.0,
+        "valor_fatura": 0.0, "historico": (),
+    }
+    __slots__ = tuple(CAMPOS)
+    GRANDEZAS_HISTORICO = ("consumo",)
+
+
+class FaturaA(_Fatura):
+    CAMPOS = {
+        "uc": "", "mes": "", "ano": "00", "endereco": "", "titular": "", "documento": "",
+        "data_leitura_anterior": "", "data_leitura_atual": "",
+        "c_p": 0.0, "c_fp": 0.0, "c_hr": 0.0, "d_p": 0.0, "d_fp": 0.0, "d_hr": 0.0,
+        "energia_gerada": 0.0, "credito_recebido": 0.0, "saldo": 0.0, "valor_fatura": 0.0,
+        "historico": (),
+    }
+    __slots__ = tuple(CAMPOS)
+    GRANDEZAS_HISTORICO = ("d_p", "d_fp", "d_hr", "c_p", "c_fp", "c_hr")
+    ANO_TEXTO = True
+
+
+def como_fatura(dados, tipo):
+    """Devolve o registro do tipo pedido, convertendo dicts vindos do cache ou do banco."""
+    return dados if isinstance(dados, tipo) else tipo.de_dict(dados)
+
+
+def serializar(obj):
+    """default= para json.dump: registros e históricos viram dicts/listas."""
+    if isinstance(obj, _Fatura):
+        return obj.para_dict()
+    if isinstance(obj, Historico):
+        return obj.para_lista()
+    raise TypeError(f"Objeto do tipo {type(obj).__name__} não é serializável em JSON")
@@ -0,0 +1,635 @@
+"""
+Motor de saída alternativo ao openpyxl: trata o .xlsx como zip e só reescreve
+as partes que mudam (abas com células novas, abas clonadas, workbook.xml e
+suas relações). Todas as outras partes (estilos, temas, gráficos, strings
+compartilhadas...) são copiadas byte a byte, então fórmulas e formatação do
+modelo ficam intactas.
+
+PlanilhaXML imita a parte da API do openpyxl usada por preparar_planilha e
+pelos writers (sheetnames, wb[nome], copy_worksheet, ws[coord], ws.title,
+merged_cells.ranges, save), então os mesmos writers funcionam nos dois motores.
+"""
+import datetime
+import io
+import re
+import shutil
+import zipfile
+import posixpath
+from math import isinf, isnan
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape, quoteattr, unescape
+
+from openpyxl.compat.numbers import NUMERIC_TYPES
+from openpyxl.formula.translate import Translator
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+from openpyxl.utils.cell import coordinate_from_string, column_index_from_string, get_column_letter
+from openpyxl.utils.datetime import from_excel, to_excel
+from openpyxl.worksheet.cell_range import CellRange
+
+NS = {
+    "m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "pr": "http://schemas.openxmlformats.org/package/2006/relationships",
+}
+TIPO_ABA = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"
+TIPO_CALCCHAIN = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/calcChain"
+CONTENT_TYPE_ABA = "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"
+# Relações que não são clonadas junto com a aba (o openpyxl também não copia)
+TIPOS_NAO_CLONADOS = ("/drawing", "/vmlDrawing", "/table", "/comments", "/threadedComment", "/pivotTable")
+
+RE_SHEETDATA = re.compile(r"<sheetData\s*/>|<sheetData>(.*?)</sheetData>", re.S)
+RE_ROW = re.compile(r"<row\b([^>]*?)(?:/>|>(.*?)</row>)", re.S)
+RE_CELL = re.compile(r"<c\b([^>]*?)(?:/>|>(.*?)</c>)", re.S)
+RE_ATTR_R = re.compile(r'\br="([A-Z]*)(\d+)"')
+# <row>/<c> sem r= (opcional no formato; LibreOffice e outros geradores omitem)
+RE_SEM_REF = re.compile(r"<(?:row|c)\b(?![^>]*\br=)")
+RE_SEM_REF_BYTES = re.compile(RE_SEM_REF.pattern.encode())
+RE_ATTR_S = re.compile(r'\bs="(\d+)"')
+RE_F_COMPARTILHADA = re.compile(r'<f\b([^>]*\bt="shared"[^>]*?)(?:/>|>(.*?)</f>)', re.S)
+RE_ATTR_SI = re.compile(r'\bsi="(\d+)"')
+
+
+def _parte_relativa(base, alvo):
+    if alvo.startswith("/"):
+        return alvo[1:]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base), alvo))
+
+
+def _rels_de(parte):
+    return posixpath.join(posixpath.dirname(parte), "_rels", posixpath.basename(parte) + ".rels")
+
+
+class CelulaXML:
+    """Célula vista pelos writers: ler .value devolve o valor atual, gravar registra a escrita."""
+    __slots__ = ("aba", "coordinate")
+
+    def __init__(self, aba, coordinate):
+        self.aba = aba
+        self.coordinate = coordinate
+
+    @property
+    def value(self):
+        return self.aba._valor(self.coordinate)
+
+    @value.setter
+    def value(self, valor):
+        self.aba[self.coordinate] = valor
+
+
+class _Mesclagens:
+    def __init__(self, refs):
+        self.ranges = [CellRange(ref) for ref in refs]
+
+
+class _FormulaCompartilhada:
+    """Dependente de uma fórmula compartilhada: transladada a partir do mestre só quando lida."""
+    __slots__ = ("origem", "texto")
+
+    def __init__(self, origem, texto):
+        self.origem = origem
+        self.texto = texto
+
+    def transladar(self, coord):
+        return Translator(self.texto, origin=self.origem).translate_formula(coord)
+
+
+class AbaXML:
+    def __init__(self, planilha, titulo, parte, valores=None, mesclagens=None, origem=None):
+        self.parent = planilha
+        self._titulo = titulo
+        self.parte = parte              # caminho da parte original (ou do modelo, se clonada)
+        self.origem = origem            # aba modelo quando clonada
+        # leitura: coordenada -> valor do modelo; None = a parte só é lida na primeira consulta,
+        # então abas que não são lidas nem escritas não custam nada além da cópia no save
+        self._lidos = valores
+        self._mesclagens = _Mesclagens(mesclagens) if mesclagens is not None else None
+        self.escritas = {}              # coordenada -> valor a injetar
+
+    def _carregar(self):
+        valores, mesclagens = self.parent._ler_parte(self.parte)
+        self._lidos = valores
+        if self._mesclagens is None:
+            self._mesclagens = _Mesclagens(mesclagens)
+
+    @property
+    def _valores(self):
+        if self._lidos is None:
+            self._carregar()
+        return self._lidos
+
+    @property
+    def merged_cells(self):
+        if self._mesclagens is None:
+            self._carregar()
+        return self._mesclagens
+
+    @property
+    def title(self):
+        return self._titulo
+
+    @title.setter
+    def title(self, novo):
+        self.parent._renomear(self, novo)
+
+    def _valor(self, coord):
+        if coord in self.escritas:
+            return self.escritas[coord]
+        valor = self._valores.get(coord)
+        if isinstance(valor, _FormulaCompartilhada):
+            valor = self._valores[coord] = valor.transladar(coord)
+        return valor
+
+    def __getitem__(self, coord):
+        return CelulaXML(self, coord)
+
+    def __setitem__(self, coord, valor):
+        self.escritas[coord.upper()] = valor
+
+    def cell(self, row, column, value=None):
+        coord = f"{get_column_letter(column)}{row}"
+        if value is not None:
+            self[coord] = value
+        return self[coord]
+
+
+class PlanilhaXML:
+    def __init__(self, origem):
+        if isinstance(origem, (bytes, bytearray)):
+            self._conteudo = bytes(origem)
+        elif hasattr(origem, "read"):
+            if hasattr(origem, "seek"):
+                origem.seek(0)
+            self._conteudo = origem.read()
+        else:
+            with open(origem, "rb") as f:
+                self._conteudo = f.read()
+
+        self._abas = []
+        self._proxima_parte = 1
+        self._leitor = None  # zip aberto na primeira leitura de aba (ver AbaXML._carregar)
+        with zipfile.ZipFile(io.BytesIO(self._conteudo)) as z:
+            self._nomes_partes = set(z.namelist())
+            self._parte_workbook = self._achar_workbook(z)
+            self._compartilhadas = self._ler_strings(z)
+            self._formatos_data = self._ler_formatos_data(z)
+            rels = self._ler_rels(z, self._parte_workbook)
+            raiz = ET.fromstring(z.read(self._parte_workbook))
+            for sheet in raiz.find("m:sheets", NS):
+                rid = sheet.get(f"{{{NS['r']}}}id")
+                parte = _parte_relativa(self._parte_workbook, rels[rid][1])
+                aba = AbaXML(self, sheet.get("name"), parte)
+                aba.rid = rid
+                self._abas.append(aba)
+        for nome in self._nomes_partes:
+            m = re.match(r"xl/worksheets/sheet(\d+)\.xml$", nome)
+            if m:
+                self._proxima_parte = max(self._proxima_parte, int(m.group(1)) + 1)
+
+    # ---------- leitura ----------
+    @staticmethod
+    def _achar_workbook(z):
+        raiz = ET.fromstring(z.read("_rels/.rels"))
+        for rel in raiz:
+            if rel.get("Type", "").endswith("/officeDocument"):
+                return rel.get("Target").lstrip("/")
+        return "xl/workbook.xml"
+
+    @staticmethod
+    def _ler_rels(z, parte):
+        caminho = _rels_de(parte)
+        if caminho not in z.namelist():
+            return {}
+        raiz = ET.fromstring(z.read(caminho))
+        return {rel.get("Id"): (rel.get("Type"), rel.get("Target")) for rel in raiz}
+
+    def _ler_strings(self, z):
+        parte = posixpath.join(posixpath.dirname(self._parte_workbook), "sharedStrings.xml")
+        if parte not in self._nomes_partes:
+            return []
+        raiz = ET.fromstring(z.read(parte))
+        return ["".join(t.text or "" for t in si.iter(f"{{{NS['m']}}}t")) for si in raiz.findall("m:si", NS)]
+
+    def _ler_formatos_data(self, z):
+        """Índices de estilo (s=) cujo formato numérico é de data."""
+        parte = posixpath.join(posixpath.dirname(self._parte_workbook), "styles.xml")
+        if parte not in self._nomes_partes:
+            return set()
+        raiz = ET.fromstring(z.read(parte))
+        formatos = dict(BUILTIN_FORMATS)
+        num_fmts = raiz.find("m:numFmts", NS)
+        if num_fmts is not None:
+            for fmt in num_fmts:
+                formatos[int(fmt.get("numFmtId"))] = fmt.get("formatCode")
+        cell_xfs = raiz.find("m:cellXfs", NS)
+        datas = set()
+        if cell_xfs is not None:
+            for i, xf in enumerate(cell_xfs):
+                codigo = formatos.get(int(xf.get("numFmtId", 0)))
+                if codigo and is_date_format(codigo):
+                    datas.add(i)
+        return datas
+
+    def _ler_parte(self, parte):
+        if self._leitor is None:
+            self._leitor = zipfile.ZipFile(io.BytesIO(self._conteudo))
+        return self._ler_aba(self._leitor.read(parte))
+
+    def _ler_aba(self, xml):
+        if RE_SEM_REF_BYTES.search(xml):
+            xml = _completar_referencias(xml.decode("utf-8")).encode("utf-8")
+        valores = {}
+        mesclagens = []
+        mestres = {}    # si da fórmula compartilhada -> (coordenada, fórmula)
+        m_tag = f"{{{NS['m']}}}"
+        for _, elem in ET.iterparse(io.BytesIO(xml)):
+            if elem.tag == f"{m_tag}c":
+                valor = self._valor_celula(elem)
+                formula = elem.find(f"{m_tag}f")
+                if formula is not None and formula.get("t") == "shared":
+                    # Como o openpyxl: dependentes recebem a fórmula do mestre transladada (ao serem lidos)
+                    si = formula.get("si")
+                    if formula.text:
+                        mestres[si] = _FormulaCompartilhada(elem.get("r"), valor)
+                    elif si in mestres:
+                        valor = mestres[si]
+                if valor is not None:
+                    valores[elem.get("r")] = valor
+                elem.clear()
+            elif elem.tag == f"{m_tag}mergeCell":
+                mesclagens.append(elem.get("ref"))
+        return valores, mesclagens
+
+    def _valor_celula(self, elem):
+        m_tag = f"{{{NS['m']}}}"
+        tipo = elem.get("t", "n")
+        formula = elem.find(f"{m_tag}f")
+        if formula is not None:
+            return "=" + (formula.text or "")
+        v = elem.find(f"{m_tag}v")
+        if tipo == "inlineStr":
+            return "".join(t.text or "" for t in elem.iter(f"{m_tag}t"))
+        if v is None or v.text is None:
+            return None
+        if tipo == "s":
+            return self._compartilhadas[int(v.text)]
+        if tipo in ("str", "e"):
+            return v.text
+        if tipo == "b":
+            return v.text == "1"
+        numero = float(v.text)
+        if int(elem.get("s", 0)) in self._formatos_data:
+            return from_excel(numero)
+        return int(numero) if numero.is_integer() and "." not in v.text and "E" not in v.text.upper() else numero
+
+    # ---------- API parecida com a do openpyxl ----------
+    @property
+    def sheetnames(self):
+        return [aba.title for aba in self._abas]
+
+    @property
+    def worksheets(self):
+        return list(self._abas)
+
+    def __getitem__(self, nome):
+        for aba in self._abas:
+            if aba.title == nome:
+                return aba
+        raise KeyError(f"Worksheet {nome} does not exist.")
+
+    def __contains__(self, nome):
+        return nome in self.sheetnames
+
+    def _renomear(self, aba, novo):
+        if novo != aba.title and novo in self.sheetnames:
+            raise ValueError(f"Já existe uma aba chamada {novo}")
+        aba._titulo = novo
+
+    def copy_worksheet(self, aba):
+        modelo = aba.origem or aba
+        nova = AbaXML(self, f"{aba.title} Copy", modelo.parte, aba._valores,
+                      [str(r) for r in aba.merged_cells.ranges], origem=modelo)
+        # Escritas já feitas na aba de origem também vão para a cópia
+        nova.escritas = dict(aba.escritas)
+        nova.parte = f"xl/worksheets/sheet{self._proxima_parte}.xml"
+        nova.parte_modelo = modelo.parte
+        self._proxima_parte += 1
+        nova.rid = None
+        self._abas.append(nova)
+        return nova
+
+    # ---------- escrita ----------
+    def save(self, destino):
+        clones = [a for a in self._abas if a.origem is not None]
+        partes_novas = {}
+        formula_sobrescrita = False
+        modelos_clone = {}  # parte do modelo -> (xml limpo, rels), montados uma vez para todas as cópias
+
+        with zipfile.ZipFile(io.BytesIO(self._conteudo)) as zin:
+            # Abas clonadas e abas com escritas
+            for aba in self._abas:
+                if aba.origem is None and not aba.escritas:
+                    continue
+                if aba.origem is not None:
+                    parte_xml = aba.parte_modelo
+                    if parte_xml not in modelos_clone:
+                        modelos_clone[parte_xml] = (self._limpar_clone(zin.read(parte_xml).decode("utf-8")),
+                                                    self._rels_clone(zin, parte_xml))
+                    xml, rels = modelos_clone[parte_xml]
+                    if rels:
+                        partes_novas[_rels_de(aba.parte)] = rels
+                else:
+                    xml = zin.read(aba.parte).decode("utf-8")
+                if aba.escritas:
+                    xml, sobrescreveu = injetar_celulas(xml, aba.escritas)
+                    formula_sobrescrita = formula_sobrescrita or sobrescreveu
+                partes_novas[aba.parte] = xml.encode("utf-8")
+
+            rels_wb = _rels_de(self._parte_workbook)
+            partes_novas[self._parte_workbook], partes_novas[rels_wb], remover_calc = \
+                self._workbook_atualizado(zin, clones, formula_sobrescrita)
+            partes_novas["[Content_Types].xml"] = self._content_types(zin, clones, remover_calc)
+
+            fechar = False
+            if isinstance(destino, (str, bytes)) or hasattr(destino, "__fspath__"):
+                destino = open(destino, "wb")
+                fechar = True
+            try:
+                with zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED) as zout:
+                    for info in zin.infolist():
+                        if info.filename in remover_calc:
+                            continue
+                        if info.filename in partes_novas:
+                            zout.writestr(info.filename, partes_novas.pop(info.filename))
+                            continue
+                        # Parte inalterada: conteúdo copiado byte a byte
+                        with zin.open(info) as src, zout.open(info, "w") as dst:
+                            shutil.copyfileobj(src, dst)
+                    for nome, conteudo in partes_novas.items():
+                        zout.writestr(nome, conteudo)
+            finally:
+                if fechar:
+                    destino.close()
+
+    @staticmethod
+    def _limpar_clone(xml):
+        # A cópia não herda desenhos/tabelas/comentários nem a seleção de aba
+        xml = re.sub(r"<drawing\b[^>]*/>|<legacyDrawing\b[^>]*/>|<legacyDrawingHF\b[^>]*/>", "", xml)
+        xml = re.sub(r"<tableParts\b.*?</tableParts>|<tableParts\b[^>]*/>", "", xml, flags=re.S)
+        xml = re.sub(r'\s(?:tabSelected="1"|xr:uid="[^"]*")', "", xml)
+        return xml
+
+    def _rels_clone(self, zin, parte_modelo):
+        caminho = _rels_de(parte_modelo)
+        if caminho not in self._nomes_partes:
+            return None
+        raiz = ET.fromstring(zin.read(caminho))
+        mantidas = [rel for rel in raiz if not rel.get("Type", "").endswith(TIPOS_NAO_CLONADOS)]
+        if not mantidas:
+            return None
+        linhas = "".join(
+            "<Relationship " + " ".join(f"{k}={quoteattr(v)}" for k, v in rel.attrib.items()) + "/>"
+            for rel in mantidas
+        )
+        return ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                f'<Relationships xmlns="{NS["pr"]}">{linhas}</Relationships>').encode("utf-8")
+
+    def _workbook_atualizado(self, zin, clones, formula_sobrescrita):
+        xml = zin.read(self._parte_workbook).decode("utf-8")
+        rels_caminho = _rels_de(self._parte_workbook)
+        rels_xml = zin.read(rels_caminho).decode("utf-8")
+
+        ids_existentes = set(re.findall(r'\bId="([^"]+)"', rels_xml))
+        sheet_ids = [int(x) for x in re.findall(r'<sheet\b[^>]*\bsheetId="(\d+)"', xml)]
+        proximo_sheet_id = max(sheet_ids, default=0) + 1
+
+        novas_rels = []
+        for n, aba in enumerate(clones, start=1):
+            rid = f"rIdXml{n}"
+            while rid in ids_existentes:
+                rid += "x"
+            aba.rid = rid
+            alvo = posixpath.relpath(aba.parte, posixpath.dirname(self._parte_workbook))
+            novas_rels.append(f'<Relationship Id="{rid}" Type="{TIPO_ABA}" Target="{alvo}"/>')
+
+        # Lista <sheets> na ordem atual, com os nomes atuais
+        sheets_originais = {m.group(1): m.group(0) for m in
+                            re.finditer(r'<sheet\b[^>]*\br:id="([^"]+)"[^>]*/>', xml)}
+        novas_sheets = []
+        for aba in self._abas:
+            if aba.origem is None:
+                tag = sheets_originais[aba.rid]
+                tag = re.sub(r'\bname="[^"]*"', f"name={quoteattr(aba.title)}", tag, count=1)
+            else:
+                tag = f'<sheet name={quoteattr(aba.title)} sheetId="{proximo_sheet_id}" r:id="{aba.rid}"/>'
+                proximo_sheet_id += 1
+            novas_sheets.append(tag)
+        xml = re.sub(r"<sheets>.*?</sheets>", lambda _: "<sheets>" + "".join(novas_sheets) + "</sheets>",
+                     xml, count=1, flags=re.S)
+
+        # Fórmulas recalculadas na abertura (os valores em cache ficaram desatualizados)
+        if re.search(r"<calcPr\b", xml):
+            xml = re.sub(r"<calcPr\b(?![^>]*fullCalcOnLoad)", '<calcPr fullCalcOnLoad="1"', xml, count=1)
+        else:
+            # calcPr vem logo depois de <sheets> (ou de <definedNames>, se existir)
+            ancora = "</definedNames>" if "</definedNames>" in xml else "</sheets>"
+            xml = xml.replace(ancora, ancora + '<calcPr fullCalcOnLoad="1"/>', 1)
+
+        # calcChain só é removido se alguma fórmula foi trocada por valor
+        remover = set()
+        if formula_sobrescrita:
+            m = re.search(r'<Relationship\b[^>]*Type="%s"[^>]*/>' % re.escape(TIPO_CALCCHAIN), rels_xml)
+            if m:
+                alvo = re.search(r'Target="([^"]+)"', m.group(0)).group(1)
+                remover.add(_parte_relativa(self._parte_workbook, alvo))
+                rels_xml = rels_xml.replace(m.group(0), "")
+
+        rels_xml = rels_xml.replace("</Relationships>", "".join(novas_rels) + "</Relationships>")
+        return xml.encode("utf-8"), rels_xml.encode("utf-8"), remover
+
+    @staticmethod
+    def _content_types(zin, clones, remover):
+        xml = zin.read("[Content_Types].xml").decode("utf-8")
+        for parte in remover:
+            xml = re.sub(r'<Override PartName="/%s"[^>]*/>' % re.escape(parte), "", xml)
+        novos = "".join(f'<Override PartName="/{aba.parte}" ContentType="{CONTENT_TYPE_ABA}"/>' for aba in clones)
+        return xml.replace("</Types>", novos + "</Types>").encode("utf-8")
+
+
+def _indice_coluna(coord):
+    coluna, linha = coordinate_from_string(coord)
+    return column_index_from_string(coluna), linha
+
+
+def _numero(valor):
+    """Número como o openpyxl grava (%.16g); NaN e infinito viram célula vazia (None)."""
+    if isnan(valor) or isinf(valor):
+        return None
+    return "%.16g" % valor
+
+
+def _xml_celula(coord, estilo, valor):
+    s = f' s="{estilo}"' if estilo else ""
+    if isinstance(valor, bool):
+        return f'<c r="{coord}"{s} t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, NUMERIC_TYPES):
+        valor = _numero(valor)
+        if valor is not None:
+            return f'<c r="{coord}"{s}><v>{valor}</v></c>'
+    elif isinstance(valor, (datetime.datetime, datetime.date)):
+        return f'<c r="{coord}"{s}><v>{_numero(to_excel(valor))}</v></c>'
+    if valor is None:
+        return f'<c r="{coord}"{s}/>'
+    texto = str(valor)
+    if texto.startswith("="):
+        return f'<c r="{coord}"{s}><f>{escape(texto[1:])}</f></c>'
+    return f'<c r="{coord}"{s} t="inlineStr"><is><t xml:space="preserve">{escape(texto)}</t></is></c>'
+
+
+def injetar_celulas(xml: str, escritas: dict):
+    """
+    Injeta os valores em <sheetData>, preservando o estilo (s=) de cada célula.
+    Retorna (xml, True se alguma fórmula foi sobrescrita).
+    """
+    por_linha = {}
+    for coord, valor in escritas.items():
+        col, linha = _indice_coluna(coord)
+        por_linha.setdefault(linha, {})[col] = (coord, valor)
+
+    m_dados = RE_SHEETDATA.search(xml)
+    conteudo = _expandir_compartilhadas(_completar_referencias(m_dados.group(1) or ""), escritas)
+    sobrescreveu = False
+
+    partes = []
+    pos = 0
+    for m_row in RE_ROW.finditer(conteudo):
+        num = int(re.search(r'\br="(\d+)"', m_row.group(1)).group(1))
+        # Linhas novas que vêm antes desta
+        for nova in sorted(n for n in por_linha if n < num):
+            partes.append(conteudo[pos:m_row.start()])
+            pos = m_row.start()
+            partes.append(_nova_linha(nova, por_linha.pop(nova)))
+        if num not in por_linha:
+            continue
+        celulas = por_linha.pop(num)
+        atributos = re.sub(r'\sspans="[^"]*"', "", m_row.group(1))
+        interior, sobrescreveu_linha = _injetar_linha(m_row.group(2) or "", celulas)
+        sobrescreveu = sobrescreveu or sobrescreveu_linha
+        partes.append(conteudo[pos:m_row.start()])
+        partes.append(f"<row{atributos}>{interior}</row>")
+        pos = m_row.end()
+    partes.append(conteudo[pos:])
+    for nova in sorted(por_linha):
+        partes.append(_nova_linha(nova, por_linha[nova]))
+
+    novo = "<sheetData>" + "".join(partes) + "</sheetData>"
+    return xml[:m_dados.start()] + novo + xml[m_dados.end():], sobrescreveu
+
+
+def _completar_referencias(conteudo):
+    """
+    Põe r= nas linhas e células que não o têm, como o leitor do openpyxl as numera:
+    linha sem r é a anterior + 1 e célula sem r é a coluna seguinte à anterior da linha.
+    """
+    if not RE_SEM_REF.search(conteudo):
+        return conteudo
+    linha = 0
+
+    def completar_linha(m_row):
+        nonlocal linha
+        atributos = m_row.group(1)
+        m_num = re.search(r'\br="(\d+)"', atributos)
+        if m_num:
+            linha = int(m_num.group(1))
+        else:
+            linha += 1
+            atributos = f' r="{linha}"' + atributos
+        if m_row.group(2) is None:
+            return f"<row{atributos}/>"
+        coluna = 0
+
+        def completar_celula(m_c):
+            nonlocal coluna
+            m_r = RE_ATTR_R.search(m_c.group(1))
+            if m_r:
+                coluna = column_index_from_string(m_r.group(1))
+                return m_c.group(0)
+            coluna += 1
+            return f'<c r="{get_column_letter(coluna)}{linha}"' + m_c.group(0)[2:]
+
+        return f"<row{atributos}>{RE_CELL.sub(completar_celula, m_row.group(2))}</row>"
+
+    return RE_ROW.sub(completar_linha, conteudo)
+
+
+def _expandir_compartilhadas(conteudo, escritas):
+    """
+    Fórmulas compartilhadas guardam o texto só na célula mestre; se alguma célula
+    do grupo vai ser sobrescrita, o grupo inteiro vira fórmulas comuns (como o
+    openpyxl grava), senão os dependentes perderiam a fórmula junto com o mestre.
+    """
+    if 't="shared"' not in conteudo:
+        return conteudo
+    mestres = {}
+    grupos_afetados = set()
+    for m_c in RE_CELL.finditer(conteudo):
+        interior = m_c.group(2) or ""
+        m_f = RE_F_COMPARTILHADA.search(interior)
+        if not m_f:
+            continue
+        m_r = RE_ATTR_R.search(m_c.group(1))
+        coord = m_r.group(1) + m_r.group(2)
+        si = RE_ATTR_SI.search(m_f.group(1)).group(1)
+        if m_f.group(2):
+            mestres[si] = (coord, "=" + unescape(m_f.group(2)))
+        if coord in escritas:
+            grupos_afetados.add(si)
+    if not grupos_afetados:
+        return conteudo
+    tradutores = {si: Translator(texto, origin=origem) for si, (origem, texto) in mestres.items()}
+
+    def trocar(m_c):
+        interior = m_c.group(2) or ""
+        m_f = RE_F_COMPARTILHADA.search(interior)
+        if not m_f:
+            return m_c.group(0)
+        si = RE_ATTR_SI.search(m_f.group(1)).group(1)
+        if si not in grupos_afetados or si not in mestres:
+            return m_c.group(0)
+        m_r = RE_ATTR_R.search(m_c.group(1))
+        formula = tradutores[si].translate_formula(m_r.group(1) + m_r.group(2))
+        interior = interior[:m_f.start()] + f"<f>{escape(formula[1:])}</f>" + interior[m_f.end():]
+        return f"<c{m_c.group(1)}>{interior}</c>"
+
+    return RE_CELL.sub(trocar, conteudo)
+
+
+def _nova_linha(num, celulas):
+    return f'<row r="{num}">' + "".join(_xml_celula(c, None, v) for _, (c, v) in sorted(celulas.items())) + "</row>"
+
+
+def _injetar_linha(interior, celulas):
+    partes = []
+    pos = 0
+    sobrescreveu = False
+    for m_c in RE_CELL.finditer(interior):
+        m_r = RE_ATTR_R.search(m_c.group(1))
+        col = column_index_from_string(m_r.group(1))
+        for nova_col in sorted(c for c in celulas if c < col):
+            coord, valor = celulas.pop(nova_col)
+            partes.append(interior[pos:m_c.start()])
+            pos = m_c.start()
+            partes.append(_xml_celula(coord, None, valor))
+        if col not in celulas:
+            continue
+        coord, valor = celulas.pop(col)
+        m_s = RE_ATTR_S.search(m_c.group(1))
+        if m_c.group(2) and "<f" in m_c.group(2):
+            sobrescreveu = True
+        partes.append(interior[pos:m_c.start()])
+        partes.append(_xml_celula(coord, m_s.group(1) if m_s else None, valor))
+        pos = m_c.end()
+    partes.append(interior[pos:])
+    for nova_col in sorted(celulas):
+        coord, valor = celulas[nova_col]
+        partes.append(_xml_celula(coord, None, valor))
+    return "".join(partes), sobrescreveu
@@ -0,0 +1,44 @@
+import io
+
+import openpyxl
+
+from benchmarks.gerador_faturas import MODELO, textos_carteira
+from services.atualizacao import atualizar_planilha
+from services.pipeline import gerar_planilha, mapear_texto
+
+
+def estrutura(ucs):
+    return [{'tipo': 'geradora' if i == 0 else 'beneficiaria', 'indice': max(i, 1), 'dados': faturas}
+            for i, faturas in enumerate(ucs)]
+
+
+def gravar(wb):
+    saida = io.BytesIO()
+    wb.save(saida)
+    return saida.getvalue()
+
+
+def valores(conteudo):
+    wb = openpyxl.load_workbook(io.BytesIO(conteudo))
+    return {ws.title: {c.coordinate: c.value for linha in ws.iter_rows() for c in linha if c.value is not None}
+            for ws in wb.worksheets}
+
+
+# 3 UCs x 12 meses; a planilha anterior tem só 2 UCs até novembro
+ucs = [[mapear_texto(texto, "B") for texto in uc] for uc in textos_carteira("B", 3, meses=12, semente=11)]
+completa = valores(gravar(gerar_planilha(MODELO, "B", estrutura(ucs), 1, 2)))
+anterior = gravar(gerar_planilha(MODELO, "B", estrutura([faturas[:11] for faturas in ucs[:2]]), 1, 1))
+
+# Faturas novas: dezembro das duas UCs já na planilha e uma UC nova (ida e volta pelo RESUMO)
+novas = [ucs[0][11], ucs[1][11]] + ucs[2]
+for motor in ("openpyxl", "xml"):
+    wb, relatorio = atualizar_planilha(anterior, "B", novas, motor=motor)
+    print(motor, relatorio)
+    assert relatorio["atualizadas"] == [ucs[0][0].uc, ucs[1][0].uc]
+    assert relatorio["novas"] == [(ucs[2][0].uc, "UC BENEF. 2")]
+    # Atualizar só com as faturas novas dá a mesma planilha que gerar tudo de novo
+    atualizada = valores(gravar(wb))
+    assert atualizada.keys() == completa.keys()
+    for aba, celulas in completa.items():
+        assert atualizada[aba] == celulas, aba
+print("atualização = geração completa")
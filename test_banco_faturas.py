@@ -0,0 +1,28 @@
+import os
+import tempfile
+
+from services.banco_faturas import BancoFaturas
+
+banco = BancoFaturas(os.path.join(tempfile.mkdtemp(), "faturas.db"))
+
+
+def fatura(uc, mes, ano, titular, documento):
+    return {"uc": uc, "mes": mes, "ano": ano, "titular": titular, "documento": documento}
+
+
+# Mesma UC nos dois grupos: cada grupo tem o seu titular, nenhum trocou
+banco.salvar_varias([fatura("1234567", mes, 2025, "MARIA", "111.111.111-11") for mes in ("JAN", "FEV", "MAR")], "B")
+banco.salvar_varias([fatura("1234567", mes, "25", "EMPRESA X", "22.222.222/0001-22") for mes in ("JAN", "FEV", "MAR")],
+                    "A")
+# Troca de verdade só no Grupo A, em abril
+banco.salvar(fatura("1234567", "ABR", "25", "EMPRESA Y", "33.333.333/0001-33"), "A")
+
+trocas = banco.trocas_de_titularidade()
+print([(t["grupo"], t["mes"], t["documento_anterior"], t["documento"]) for t in trocas])
+assert [(t["grupo"], t["mes"]) for t in trocas] == [("A", 4)]
+assert banco.trocas_de_titularidade("B") == []
+
+periodos = banco.historico_titulares("1234567")
+print([(p["grupo"], p["documento"], p["faturas"]) for p in periodos])
+assert [(p["grupo"], p["faturas"]) for p in periodos] == [("A", 3), ("A", 1), ("B", 3)]
+assert [p["documento"] for p in banco.historico_titulares("1234567", "B")] == ["111.111.111-11"]
@@ -0,0 +1,25 @@
+import random
+
+from benchmarks.gerador_faturas import texto_fatura_a
+from services.classificacao import classificar_texto
+
+with open("texto.txt", "r", encoding="utf-8") as f:
+    texto = f.read()
+
+# Fatura real do Grupo B: linha de medição "ENERGIA ATIVA - KWH ÚNICO"
+print("texto.txt:", classificar_texto(texto))
+assert classificar_texto(texto) == "B"
+
+# Fatura sintética do Grupo A: medição por posto (ponta / fora ponta)
+assert classificar_texto(texto_fatura_a("10000000", 0, 2025, random.Random(1))) == "A"
+
+# Sem as linhas de medição (ex.: só a primeira página lida), decide a linha de classificação
+assert classificar_texto("Classificação: B B1 RESIDENCIAL") == "B"
+assert classificar_texto("CLASSIFICAÇÃO: A4 INDUSTRIAL") == "A"
+
+# As duas medições no texto: vale a que aparece primeiro
+assert classificar_texto("ENERGIA ATIVA - KWH PONTA 10 ... ENERGIA ATIVA - KWH ÚNICO 20") == "A"
+
+# Sem nenhum sinal o grupo fica indefinido
+assert classificar_texto("") is None and classificar_texto(None) is None
+print("classificação ok")
@@ -1,21 +1,89 @@
-from services.excel_writer import escrever_uc_geradora
-
-dados = {
-    "mes": "JAN",
-    "data_leitura_anterior": "21/12/2024",
-    "data_leitura_atual": "21/01/2025",
-    "energia_gerada": 456.0,
-    "credito_recebido": 436.0,
-    "energia_ativa": 536,
-    "valor_fatura": 154.04,
-    "saldo_kwh": 0.0,
-    "medidor": "13119425-9",
-    "leitura_anterior": 15604,
-    "leitura_atual": 16140,
-}
-
-escrever_uc_geradora(
-    "BALANÇO E COMPENSAÇÃO.xlsx",
-    dados
+from services.excel_writer import preparar_planilha, salvar_dados_multiplos
+from services.registros import FaturaB
+
+# Registro tipado: um campo com nome errado (ex.: saldo_kwh) gera TypeError aqui
+dados = FaturaB(
+    uc="16676257",
+    mes="JAN",
+    data_leitura_anterior="21/12/2024",
+    data_leitura_atual="21/01/2025",
+    energia_gerada=456.0,
+    credito_recebido=436.0,
+    energia_ativa=536,
+    valor_fatura=154.04,
+    saldo=0.0,
+    medidor="13119425-9",
+    leitura_anterior=15604,
+    leitura_atual=16140,
 )
 
+wb = preparar_planilha("BALANÇO E COMPENSAÇÃO.xlsx", 1, 0)
+wb = salvar_dados_multiplos(wb, [{'tipo': 'geradora', 'indice': 1, 'dados': [dados]}])
+
+ws = wb["UC GERADORA"]
+print([ws[f"{col}5"].value for col in "BCIJKNPRST"])
+
+# --- Golden: os dois motores gravam os mesmos valores a partir dos mesmos registros ---
+import io
+
+import openpyxl
+
+from benchmarks.gerador_faturas import MODELO, modelo_grupo_a, textos_carteira
+from services.pipeline import gerar_planilha, mapear_texto
+
+
+def valores(wb_gerado):
+    saida = io.BytesIO()
+    wb_gerado.save(saida)
+    lido = openpyxl.load_workbook(saida)
+    return {ws.title: {c.coordinate: c.value for linha in ws.iter_rows() for c in linha if c.value is not None}
+            for ws in lido.worksheets}
+
+
+for grupo, modelo in (("B", MODELO), ("A", modelo_grupo_a())):
+    ucs = [[mapear_texto(texto, grupo) for texto in uc] for uc in textos_carteira(grupo, 3, semente=7)]
+    # Floats que o repr() grava diferente do openpyxl, e valores não finitos
+    ucs[0][0].valor_fatura = 0.1 * 3
+    ucs[0][1].valor_fatura = 464.59000000000003
+    ucs[1][0].valor_fatura = float("nan")
+    ucs[1][1].valor_fatura = float("inf")
+    estrutura = [{'tipo': 'geradora' if i == 0 else 'beneficiaria', 'indice': max(i, 1), 'dados': faturas}
+                 for i, faturas in enumerate(ucs)]
+    saidas = {motor: valores(gerar_planilha(io.BytesIO(modelo) if isinstance(modelo, bytes) else modelo,
+                                            grupo, estrutura, 1, 2, motor=motor))
+              for motor in ("openpyxl", "xml")}
+    diferentes = [(aba, coord, saidas["openpyxl"][aba].get(coord), saidas["xml"][aba].get(coord))
+                  for aba in saidas["openpyxl"]
+                  for coord in sorted(saidas["openpyxl"][aba].keys() | saidas["xml"][aba].keys())
+                  if saidas["openpyxl"][aba].get(coord) != saidas["xml"][aba].get(coord)]
+    print(f"Grupo {grupo}: motores iguais = {not diferentes}", diferentes[:5])
+    assert not diferentes
+
+# --- Motor xml com linhas e células sem r= (LibreOffice e outros geradores omitem) ---
+import re
+import zipfile
+
+from services.xlsx_patch import PlanilhaXML
+
+wb_sem_ref = openpyxl.Workbook()
+ws_sem_ref = wb_sem_ref.active
+for linha in ([1, 2, 3], ["a", "b", "c"], [4.5, 6, "=A1+B1"]):
+    ws_sem_ref.append(linha)
+modelo_sem_ref = io.BytesIO()
+wb_sem_ref.save(modelo_sem_ref)
+saida_sem_ref = io.BytesIO()
+with zipfile.ZipFile(modelo_sem_ref) as zin, zipfile.ZipFile(saida_sem_ref, "w") as zout:
+    for item in zin.infolist():
+        conteudo = zin.read(item.filename)
+        if item.filename == "xl/worksheets/sheet1.xml":
+            conteudo = re.sub(rb'(<(?:row|c)\b[^>]*?)\sr="[A-Z]*\d+"', rb"\1", conteudo)
+        zout.writestr(item, conteudo)
+
+wb_xml = PlanilhaXML(saida_sem_ref.getvalue())
+lidos = [wb_xml["Sheet"][coord].value for coord in ("A1", "C2", "A3", "C3")]
+wb_xml["Sheet"]["B2"] = "novo"
+wb_xml["Sheet"]["D3"] = 7
+relido = valores(wb_xml)["Sheet"]
+print("Sem r=:", lidos, relido)
+assert lidos == [1, "c", 4.5, "=A1+B1"]
+assert relido == {"A1": 1, "B1": 2, "C1": 3, "A2": "a", "B2": "novo", "C2": "c", "A3": 4.5, "B3": 6, "C3": "=A1+B1", "D3": 7}
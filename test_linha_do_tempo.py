@@ -0,0 +1,38 @@
+from services.linha_do_tempo import LinhaDoTempo
+from services.registros import FaturaB
+
+
+def fatura(mes, ano, consumo, historico):
+    return FaturaB(uc="16676257", mes=mes, ano=ano, energia_ativa=consumo,
+                   historico=[{"mes": m, "ano": a, "consumo": c} for m, a, c in historico])
+
+
+faturas = [
+    # JAN/2025: o histórico dela diz 999 para o próprio mês e 50 para DEZ/2024
+    fatura("JAN", 2025, 100.0, [("JAN", 2025, 999.0), ("DEZ", 2024, 50.0), ("NOV", 2024, 40.0)]),
+    # FEV/2025: histórico mais novo para JAN/2025 e DEZ/2024
+    fatura("FEV", 2025, 200.0, [("JAN", 2025, 777.0), ("DEZ", 2024, 60.0)]),
+    # Segunda fatura de JAN/2025 (reenviada): vence a primeira por vir depois na lista
+    fatura("JAN", 2025, 110.0, []),
+    # DEZ/2023: mesmo mês do ano que DEZ/2024, ano mais antigo
+    fatura("DEZ", 2023, 30.0, []),
+]
+linha = LinhaDoTempo.de_faturas(faturas, FaturaB)
+print(sorted(linha.meses.items()))
+
+# A fatura do próprio mês vence o histórico de qualquer outra fatura
+assert linha.meses[(2025, 1)].fatura.energia_ativa == 110.0 and linha.meses[(2025, 1)].posicao == 2
+assert linha.meses[(2025, 2)].fatura.energia_ativa == 200.0
+# Entre históricos, vence o da fatura de competência mais nova
+assert linha.meses[(2024, 12)].fatura is None and linha.meses[(2024, 12)].valores == {"consumo": 60.0}
+assert linha.meses[(2024, 11)].valores == {"consumo": 40.0}
+assert linha.meses[(2023, 12)].fatura.energia_ativa == 30.0
+
+# Uma linha por mês do ano, com o ano mais recente de cada mês
+por_mes = linha.por_mes_do_ano()
+assert list(por_mes) == [1, 2, 11, 12]
+assert (por_mes[12].ano, por_mes[12].valores) == (2024, {"consumo": 60.0})
+
+# Sem histórico: só os meses com fatura
+assert sorted(LinhaDoTempo.de_faturas(faturas, FaturaB, com_historico=False).meses) == [(2023, 12), (2025, 1), (2025, 2)]
+print("linha do tempo: precedência ok")
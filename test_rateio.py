@@ -0,0 +1,49 @@
+import itertools
+
+import numpy as np
+
+from benchmarks.gerador_faturas import textos_carteira
+from services.pipeline import mapear_texto
+from services.rateio import ProblemaRateio, arredondar, compensado, montar_problema, otimizar
+
+# Instância pequena: 3 beneficiárias, 4 meses, com crédito que sobra em alguns meses
+problema = ProblemaRateio(
+    meses=[(2025, m) for m in range(1, 5)],
+    credito=[120.0, 0.0, 80.0, 40.0],
+    demanda=[[50.0, 30.0, 10.0, 0.0],
+             [0.0, 0.0, 90.0, 60.0],
+             [20.0, 20.0, 20.0, 20.0]],
+    ucs=["1", "2", "3"],
+    indices=[1, 2, 3],
+)
+fracoes = otimizar(problema)
+melhor = compensado(problema, fracoes).sum()
+
+# Força bruta: todas as frações da grade de 0,5% que somam 1
+passos = 200
+forca_bruta = max(
+    compensado(problema, np.array([i, j, passos - i - j]) / passos).sum()
+    for i, j in itertools.product(range(passos + 1), repeat=2) if i + j <= passos
+)
+print("otimizar:", np.round(fracoes, 4), round(melhor, 6), "força bruta:", round(forca_bruta, 6))
+assert abs(fracoes.sum() - 1) < 1e-12
+assert melhor >= forca_bruta - 1e-9
+
+# Percentuais arredondados sempre somam 100
+rng = np.random.default_rng(0)
+for casas in (0, 1, 2, 4):
+    for n in (1, 3, 7, 50):
+        bruto = rng.random(n)
+        percentuais = arredondar(bruto / bruto.sum(), casas)
+        assert round(percentuais.sum(), casas) == 100, (casas, n, percentuais.sum())
+print("arredondar: somas = 100")
+
+# Problema montado a partir de faturas: período das geradoras e uma linha por beneficiária
+ucs = [[mapear_texto(texto, "B") for texto in uc] for uc in textos_carteira("B", 3, meses=6, semente=5)]
+estrutura = [{'tipo': 'geradora' if i == 0 else 'beneficiaria', 'indice': max(i, 1), 'dados': faturas}
+             for i, faturas in enumerate(ucs)]
+montado = montar_problema(estrutura, "B")
+print("montar_problema:", len(montado), "beneficiárias,", len(montado.meses), "meses")
+assert len(montado) == 2 and len(montado.meses) == 6
+assert montado.demanda.shape == (2, 6) and (montado.demanda >= 0).all()
+assert abs(otimizar(montado).sum() - 1) < 1e-12
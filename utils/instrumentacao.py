@@ -0,0 +1,91 @@
+"""
+Medição leve das etapas do processamento (tempo de parede, tempo de CPU e pico de memória).
+
+    instr = Instrumentacao()
+    with instr.etapa("mapper", pdf="fatura.pdf"):
+        ...
+    instr.como_csv()
+
+As funções do pipeline recebem instrumentacao=None; com None, medir() não custa nada.
+"""
+import csv
+import io
+import json
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+CAMPOS = ["etapa", "pdf", "parede_s", "cpu_s", "rss_pico_mb", "rss_aumento_mb"]
+
+
+def rss_pico_mb():
+    """Pico de memória residente do processo até agora (None onde não há resource)."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return round(pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024, 1)
+
+
+class Instrumentacao:
+    def __init__(self):
+        self.registros = []
+
+    @contextmanager
+    def etapa(self, nome, pdf=None):
+        rss_antes = rss_pico_mb()
+        parede, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            rss_depois = rss_pico_mb()
+            self.registros.append({
+                "etapa": nome,
+                "pdf": pdf,
+                "parede_s": round(time.perf_counter() - parede, 6),
+                "cpu_s": round(time.process_time() - cpu, 6),
+                "rss_pico_mb": rss_depois,
+                "rss_aumento_mb": round(rss_depois - rss_antes, 1) if rss_depois is not None else None,
+            })
+
+    def incorporar(self, registros, pdf=None):
+        """Junta medições feitas em outro processo (ex.: workers da extração)."""
+        for registro in registros:
+            self.registros.append({**registro, "pdf": pdf if pdf is not None else registro.get("pdf")})
+
+    def resumo_por_etapa(self) -> list:
+        """Totais por etapa, do mais demorado para o mais rápido."""
+        totais = {}
+        for r in self.registros:
+            t = totais.setdefault(r["etapa"], {"etapa": r["etapa"], "chamadas": 0, "parede_s": 0.0,
+                                                "cpu_s": 0.0, "rss_pico_mb": None})
+            t["chamadas"] += 1
+            t["parede_s"] += r["parede_s"]
+            t["cpu_s"] += r["cpu_s"]
+            if r["rss_pico_mb"] is not None:
+                t["rss_pico_mb"] = max(t["rss_pico_mb"] or 0, r["rss_pico_mb"])
+        for t in totais.values():
+            t["parede_s"] = round(t["parede_s"], 6)
+            t["cpu_s"] = round(t["cpu_s"], 6)
+        return sorted(totais.values(), key=lambda t: t["parede_s"], reverse=True)
+
+    def como_json(self) -> str:
+        return json.dumps({"resumo": self.resumo_por_etapa(), "registros": self.registros},
+                          ensure_ascii=False, indent=2)
+
+    def como_csv(self) -> str:
+        saida = io.StringIO()
+        escritor = csv.DictWriter(saida, fieldnames=CAMPOS, extrasaction="ignore")
+        escritor.writeheader()
+        escritor.writerows(self.registros)
+        return saida.getvalue()
+
+
+def medir(instrumentacao, nome, pdf=None):
+    """Contexto de medição que não faz nada quando instrumentacao é None."""
+    return instrumentacao.etapa(nome, pdf) if instrumentacao is not None else nullcontext()